@@ -1,20 +1,141 @@
 from crewai import Agent
 from TravelTools import SearchTools
-from langchain_openai import ChatOpenAI
+from TravelCache import get_llm_cache
+from TravelLLM import get_llm
+from TravelRouting import RoutingPolicy
+from TravelTracing import tracing_enabled
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
 import os
+import threading
+
+class AgentPool:
+    """Process-wide pool of idle agents, keyed by role, model and API key.
+    
+    Agents carry per-run state (crew, executor, tool results), so each one is leased to a
+    single plan at a time and returned to the pool when the plan finishes.
+    """
+    
+    def __init__(self, max_idle_per_key: int = 8):
+        self.max_idle_per_key = max_idle_per_key
+        self._idle: Dict[Tuple[str, str, str], List[Agent]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+    
+    def acquire(self, key: Tuple[str, str, str], factory: Callable[[], Agent]) -> Agent:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+        return factory()
+    
+    def release(self, key: Tuple[str, str, str], agent: Agent) -> None:
+        agent.crew = None
+        agent.tools_results = []
+        # crewai counts failed executions per agent against max_retry_limit; start the next lease afresh
+        agent._times_executed = 0
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(agent)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "idle": sum(len(idle) for idle in self._idle.values()),
+            }
+
+agent_pool = AgentPool()
 
 class TravelAgents:
-    def __init__(self, model_name="gpt-4o-mini"):
+    def __init__(self, model_name="gpt-4o-mini", use_cache=True, llm=None, search_tools=None,
+                 routing: Optional[RoutingPolicy] = None, max_iterations: Optional[int] = None,
+                 api_key: Optional[str] = None):
         self.model_name = model_name
-        self.search_tools = SearchTools()
+        # Reasoning/tool-use steps an agent may take before it has to answer (TRAVEL_AGENT_MAX_ITER, default 10)
+        self.max_iterations = max_iterations or int(os.getenv("TRAVEL_AGENT_MAX_ITER", 10))
+        # Which model each role uses and the per-stage budgets; by default every role uses model_name
+        self.routing = routing or RoutingPolicy.single(model_name)
+        self.use_cache = use_cache
+        self.search_tools = search_tools or (SearchTools() if use_cache else SearchTools(use_cache=False, use_index=False))
+        self.llm_cache = get_llm_cache() if use_cache else None
+        # The key of the user the plan runs for; the server's own OPENAI_API_KEY when they did not give one
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self._api_key_hash = hashlib.sha256((api_key or "").encode()).hexdigest()
+        self._leased: Dict[Tuple[str, int], Agent] = {}
+        self._lease_lock = threading.Lock()
         
-        # Configure OpenAI LLM
-        self.llm = ChatOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            model_name=model_name
-        )
+        # Shared OpenAI LLM clients (pooled per model and key); identical prompts are answered from the response cache.
+        # A ready-made llm can be injected instead, e.g. a local stand-in for benchmarks, and then serves every role.
+        self.llm = llm or get_llm(model_name, api_key=api_key, cache=self.llm_cache)
+        self._llms = {} if llm else {
+            role: get_llm(self.routing.model_for(role), api_key=api_key, cache=self.llm_cache)
+            for role in ("research", "planning", "local_expert", "budget", "comparison")
+        }
+    
+    def llm_for(self, role: str):
+        """Returns the LLM client the routing policy assigns to a role."""
+        return self._llms.get(role, self.llm)
+    
+    def model_for(self, role: str) -> str:
+        """Returns the model name the agent for a role runs on."""
+        return self.llm_for(role).model
+    
+    def _lease(self, role: str, factory: Callable[[], Agent], instance: int = 0) -> Agent:
+        """Return this plan's agent for a role, leasing one from the shared pool on first use.
+        
+        Tasks that run concurrently for the same role ask for different instances, so each gets its own agent.
+        """
+        with self._lease_lock:
+            if (role, instance) not in self._leased:
+                self._leased[(role, instance)] = agent_pool.acquire(self._pool_key(role), factory)
+            return self._leased[(role, instance)]
+    
+    def _pool_key(self, role: str) -> Tuple[str, str, str]:
+        # Pooled agents are bound to their llm and search tool, so those (and the tool's settings) are part of the key
+        search = self.search_tools.duckduckgo_search
+        return (role, self.model_for(role),
+                f"{self._api_key_hash}:{id(self.llm_for(role))}:{search.use_cache}:{id(search.backend)}:"
+                f"{search.deep}:{id(search.fetcher)}:{search.use_index}:{id(search.index)}:{tracing_enabled()}:"
+                f"{self.max_iterations}")
+    
+    def release_agents(self, discard=()):
+        """Return every agent leased by this plan to the shared pool.
+        
+        Agents of the roles in `discard` are dropped instead, e.g. because an abandoned stage may still be using them.
+        """
+        with self._lease_lock:
+            leased, self._leased = self._leased, {}
+        for (role, _), agent in leased.items():
+            if role not in discard:
+                agent_pool.release(self._pool_key(role), agent)
     
     def create_research_agent(self):
+        """Returns the research agent focused on gathering travel data."""
+        return self._lease("research", self._build_research_agent)
+    
+    def create_planning_agent(self, instance=0):
+        """Returns the planning agent focused on creating itineraries (one per instance number)."""
+        return self._lease("planning", self._build_planning_agent, instance)
+    
+    def create_local_expert_agent(self):
+        """Returns the local expert agent with deep knowledge of local attractions."""
+        return self._lease("local_expert", self._build_local_expert_agent)
+    
+    def create_budget_optimization_agent(self):
+        """Returns the agent focused on optimizing travel costs."""
+        return self._lease("budget", self._build_budget_optimization_agent)
+    
+    def create_comparison_agent(self):
+        """Returns the agent that compares finished plans for several destinations."""
+        return self._lease("comparison", self._build_comparison_agent)
+    
+    def _build_research_agent(self):
         """Creates a research agent focused on gathering travel data."""
         return Agent(
             role="Travel Data Researcher",
@@ -23,12 +144,13 @@ class TravelAgents:
             global destinations. You excel at finding detailed information about
             attractions, accommodations, local customs, and travel requirements.""",
             tools=[self.search_tools.duckduckgo_search],
-            verbose=True,
-            allow_delegation=True,
-            llm=self.llm
+            verbose=not tracing_enabled(),
+            allow_delegation=False,
+            max_iter=self.max_iterations,
+            llm=self.llm_for("research")
         )
     
-    def create_planning_agent(self):
+    def _build_planning_agent(self):
         """Creates a planning agent focused on creating itineraries."""
         return Agent(
             role="Travel Itinerary Planner",
@@ -37,12 +159,13 @@ class TravelAgents:
             creating optimal itineraries. You have a talent for balancing sightseeing,
             relaxation, and local experiences while considering budget and time constraints.""",
             tools=[self.search_tools.duckduckgo_search],
-            verbose=True,
-            allow_delegation=True,
-            llm=self.llm
+            verbose=not tracing_enabled(),
+            allow_delegation=False,
+            max_iter=self.max_iterations,
+            llm=self.llm_for("planning")
         )
     
-    def create_local_expert_agent(self):
+    def _build_local_expert_agent(self):
         """Creates a local expert agent with deep knowledge of local attractions."""
         return Agent(
             role="Local Travel Guide Expert",
@@ -51,12 +174,13 @@ class TravelAgents:
             cultures, hidden gems, and authentic experiences. You know how to help
             travelers experience destinations like a local rather than a tourist.""",
             tools=[self.search_tools.duckduckgo_search],
-            verbose=True,
-            allow_delegation=True,
-            llm=self.llm
+            verbose=not tracing_enabled(),
+            allow_delegation=False,
+            max_iter=self.max_iterations,
+            llm=self.llm_for("local_expert")
         )
     
-    def create_budget_optimization_agent(self):
+    def _build_budget_optimization_agent(self):
         """Creates an agent focused on optimizing travel costs."""
         return Agent(
             role="Travel Budget Optimizer",
@@ -65,7 +189,23 @@ class TravelAgents:
             maximize value while minimizing costs. You excel at finding deals on
             flights, accommodations, and activities without sacrificing quality.""",
             tools=[self.search_tools.duckduckgo_search],
-            verbose=True,
-            allow_delegation=True,
-            llm=self.llm
+            verbose=not tracing_enabled(),
+            allow_delegation=False,
+            max_iter=self.max_iterations,
+            llm=self.llm_for("budget")
+        )
+    
+    def _build_comparison_agent(self):
+        """Creates an agent that compares destinations from their finished plans, without searching."""
+        return Agent(
+            role="Travel Destination Analyst",
+            goal="Compare candidate destinations side by side so travelers can choose between them",
+            backstory="""You are a seasoned travel advisor who helps travelers choose between
+            destinations. You weigh cost, travel time and experiences against the traveler's
+            interests and explain the trade-offs clearly and briefly.""",
+            tools=[],
+            verbose=not tracing_enabled(),
+            allow_delegation=False,
+            max_iter=self.max_iterations,
+            llm=self.llm_for("comparison")
         )
\ No newline at end of file
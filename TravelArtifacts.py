@@ -0,0 +1,220 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+DEFAULT_ARTIFACT_DIR = os.getenv("TRAVEL_ARTIFACT_DIR", ".travel_artifacts")
+
+
+def new_run_id() -> str:
+    """Return a fresh plan (run) identifier."""
+    return uuid.uuid4().hex
+
+
+class ArtifactRef:
+    """Lazy handle to one stored stage output; the content is only read when requested."""
+
+    def __init__(self, store: "ArtifactStore", run_id: str, name: str):
+        self.store = store
+        self.run_id = run_id
+        self.name = name
+
+    def read(self) -> str:
+        return self.store.read(self.run_id, self.name)
+
+    def __repr__(self) -> str:
+        return f"ArtifactRef(run_id={self.run_id!r}, name={self.name!r})"
+
+
+class ArtifactStore:
+    """Run-scoped, content-addressed store for stage outputs.
+
+    Outputs are gzip-compressed and stored once per distinct content under
+    `blobs/<digest[:2]>/<digest>.gz`; each run has a small JSON manifest under `runs/`
+    mapping artifact names to digests. Writes happen on a background thread so they never
+    block a stage, and retention is bounded by run age and total blob size.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_age: float = 7 * 24 * 3600,
+                 max_total_bytes: int = 200 * 2 ** 20):
+        """
+        Args:
+            root: Directory of the store; defaults to TRAVEL_ARTIFACT_DIR or `.travel_artifacts`.
+            max_age: Seconds a run's artifacts are kept.
+            max_total_bytes: Upper bound on the compressed size of all stored blobs.
+        """
+        self.root = root or DEFAULT_ARTIFACT_DIR
+        self.max_age = max_age
+        self.max_total_bytes = max_total_bytes
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="travel-artifacts")
+        self._pending: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "runs"), exist_ok=True)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.gz")
+
+    def _manifest_path(self, run_id: str) -> str:
+        return os.path.join(self.root, "runs", f"{run_id}.json")
+
+    def put(self, run_id: str, name: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> ArtifactRef:
+        """
+        Queue a stage output for storage and return a lazy handle to it.
+
+        Args:
+            run_id: The plan the output belongs to.
+            name: Artifact name within the run (e.g. the stage name).
+            content: The output text.
+            metadata: Extra run-level fields recorded in the manifest (e.g. the trip).
+
+        Returns:
+            A handle whose `read()` waits for the write if it is still pending.
+        """
+        with self._lock:
+            future = self._writer.submit(self._write, run_id, name, content, metadata or {})
+            self._pending[(run_id, name)] = future
+        future.add_done_callback(lambda _: self._forget(run_id, name, future))
+        return ArtifactRef(self, run_id, name)
+
+    def _forget(self, run_id: str, name: str, future: Future) -> None:
+        with self._lock:
+            if self._pending.get((run_id, name)) is future:
+                del self._pending[(run_id, name)]
+
+    def _write(self, run_id: str, name: str, content: str, metadata: Dict[str, Any]) -> str:
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            # Identical output already stored; refresh its age so retention keeps it
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with gzip.open(temp_path, "wb") as handle:
+                handle.write(data)
+            os.replace(temp_path, path)
+
+        manifest = self.manifest(run_id) or {"run_id": run_id, "created_at": time.time(), "artifacts": {}}
+        manifest.update(metadata)
+        manifest["artifacts"][name] = {"digest": digest, "size": len(data)}
+        temp_path = f"{self._manifest_path(run_id)}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, default=str)
+        os.replace(temp_path, self._manifest_path(run_id))
+        return digest
+
+    def manifest(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Return a run's manifest, or None if nothing has been stored for it."""
+        try:
+            with open(self._manifest_path(run_id), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def read(self, run_id: str, name: str) -> str:
+        """
+        Read and decompress one artifact.
+
+        Raises:
+            KeyError: If the run has no artifact with that name (or it was pruned).
+        """
+        with self._lock:
+            pending = self._pending.get((run_id, name))
+        if pending is not None:
+            pending.result()
+        manifest = self.manifest(run_id)
+        if manifest is None or name not in manifest["artifacts"]:
+            raise KeyError(f"No artifact {name!r} for run {run_id}")
+        try:
+            with gzip.open(self._blob_path(manifest["artifacts"][name]["digest"]), "rb") as handle:
+                return handle.read().decode("utf-8")
+        except FileNotFoundError:
+            raise KeyError(f"Artifact {name!r} for run {run_id} has been pruned")
+
+    def flush(self) -> None:
+        """Wait for all queued writes to finish."""
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.result()
+
+    def prune(self) -> Dict[str, int]:
+        """
+        Apply the retention policy: drop runs older than `max_age`, then the oldest runs until the
+        blobs fit in `max_total_bytes`, and finally delete blobs no remaining run references.
+
+        Returns:
+            Counts of removed runs and blobs.
+        """
+        now = time.time()
+        runs: List[Dict[str, Any]] = []
+        removed_runs = 0
+        runs_dir = os.path.join(self.root, "runs")
+        for file_name in os.listdir(runs_dir):
+            if not file_name.endswith(".json"):
+                continue
+            manifest = self.manifest(file_name[:-len(".json")])
+            if manifest is None:
+                continue
+            if now - manifest.get("created_at", 0) > self.max_age:
+                os.remove(os.path.join(runs_dir, file_name))
+                removed_runs += 1
+            else:
+                runs.append(manifest)
+
+        blob_sizes = {}
+        for directory, _, files in os.walk(os.path.join(self.root, "blobs")):
+            for file_name in files:
+                if file_name.endswith(".gz"):
+                    blob_sizes[file_name[:-len(".gz")]] = os.path.getsize(os.path.join(directory, file_name))
+
+        def referenced(manifests: List[Dict[str, Any]]) -> set:
+            return {artifact["digest"] for manifest in manifests for artifact in manifest["artifacts"].values()}
+
+        runs.sort(key=lambda manifest: manifest.get("created_at", 0))
+        while runs and sum(blob_sizes.get(digest, 0) for digest in referenced(runs)) > self.max_total_bytes:
+            oldest = runs.pop(0)
+            os.remove(self._manifest_path(oldest["run_id"]))
+            removed_runs += 1
+
+        with self._lock:
+            # Blobs being written right now have no manifest entry yet
+            busy = bool(self._pending)
+        keep = referenced(runs)
+        removed_blobs = 0
+        if not busy:
+            for digest in set(blob_sizes) - keep:
+                os.remove(self._blob_path(digest))
+                removed_blobs += 1
+        return {"runs": removed_runs, "blobs": removed_blobs}
+
+    def prune_async(self) -> Future:
+        """Run `prune` on the background writer, after any queued writes."""
+        return self._writer.submit(self.prune)
+
+
+_artifact_store: Optional[ArtifactStore] = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """
+    Return the process-wide artifact store, creating it on first use.
+
+    Retention can be tuned with TRAVEL_ARTIFACT_MAX_AGE (seconds) and TRAVEL_ARTIFACT_MAX_BYTES.
+    """
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore(
+                max_age=float(os.getenv("TRAVEL_ARTIFACT_MAX_AGE", 7 * 24 * 3600)),
+                max_total_bytes=int(os.getenv("TRAVEL_ARTIFACT_MAX_BYTES", 200 * 2 ** 20)),
+            )
+        return _artifact_store
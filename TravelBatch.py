@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from dotenv import load_dotenv
+from TravelPipeline import TripSpec, plan_trip
+from TravelRateLimit import set_provider_rate_limit
+from TravelRouting import RoutingPolicy
+
+
+def trip_id(record: Dict[str, Any]) -> str:
+    """Return the record's `id`, or a stable hash of its trip fields."""
+    if record.get("id"):
+        return str(record["id"])
+    fields = {k: v for k, v in record.items() if k != "id"}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def load_trip_specs(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Read trip specs from a JSONL file, one JSON object per line.
+
+    Each object uses the sidebar fields: starting_point, destination, dates (or start_date/end_date),
+    interests, budget_level, travel_style and model, plus an optional id.
+
+    Args:
+        path: Input file path, or "-" for stdin.
+
+    Yields:
+        (trip id, raw record) pairs; blank lines are skipped.
+    """
+    handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in handle:
+            if line.strip():
+                record = json.loads(line)
+                yield trip_id(record), record
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def completed_trip_ids(output_path: str) -> Set[str]:
+    """Return the ids of trips that already have a successful record in the output file."""
+    done: Set[str] = set()
+    if output_path == "-" or not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def _stage_data(data: Any) -> Any:
+    # Structured stage output (Pydantic models, BudgetBreakdown) as plain JSON values
+    if hasattr(data, "model_dump"):
+        return data.model_dump()
+    if hasattr(data, "to_dict"):
+        return data.to_dict()
+    return data
+
+
+def plan_record(trip_key: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Plan one trip and build its output record; failures are reported in the record.
+
+    Args:
+        trip_key: The trip id.
+        record: The raw trip spec.
+
+    Returns:
+        The result record written to the output file.
+    """
+    started_at = time.time()
+    try:
+        trip = TripSpec.from_dict(record)
+        # "routing": "tiered" keeps the trip's model for the itinerary and uses a faster one for the other stages
+        routing = RoutingPolicy.tiered(trip.model_name) if record.get("routing") == "tiered" else None
+        results = plan_trip(trip, routing=routing)
+    except Exception as e:
+        return {"id": trip_key, "spec": record, "status": "error", "error": str(e),
+                "duration": time.time() - started_at}
+
+    errors = {name: result.error for name, result in results.items() if result.error}
+    # Stages abandoned at their deadline have no error, but the trip still needs planning again
+    degraded = [name for name, result in results.items() if result.metrics.get("degraded")]
+    return {
+        "id": trip_key,
+        "spec": trip.to_dict(),
+        "status": "error" if errors else "degraded" if degraded else "ok",
+        "error": "; ".join(f"{name}: {error}" for name, error in errors.items()) or None,
+        "degraded_stages": degraded,
+        "duration": time.time() - started_at,
+        "stages": {
+            name: {
+                "output": result.output,
+                "error": result.error,
+                "duration": result.duration,
+                "metrics": result.metrics,
+                "data": _stage_data(result.data),
+            }
+            for name, result in results.items()
+        },
+    }
+
+
+def run_batch(input_path: str, output_path: str, workers: int = 4,
+              rate_limits: Optional[Dict[str, float]] = None, resume: bool = True) -> Dict[str, int]:
+    """
+    Plan every trip in a JSONL file, writing one record per trip as soon as it finishes.
+
+    The output file doubles as the checkpoint: with `resume`, trips that already have a
+    successful record are skipped, so an interrupted batch can simply be re-run.
+
+    Args:
+        input_path: JSONL file of trip specs ("-" for stdin).
+        output_path: JSONL file that result records are appended to ("-" for stdout).
+        workers: Number of trips planned concurrently.
+        rate_limits: Maximum LLM requests per minute, keyed by provider (e.g. {"openai": 500}).
+        resume: Skip trips already completed in `output_path`.
+
+    Returns:
+        Counts of planned ("ok"), failed, degraded and skipped trips.
+    """
+    for provider, requests_per_minute in (rate_limits or {}).items():
+        set_provider_rate_limit(provider, requests_per_minute)
+
+    done = completed_trip_ids(output_path) if resume else set()
+    pending: List[Tuple[str, Dict[str, Any]]] = []
+    skipped = 0
+    for key, record in load_trip_specs(input_path):
+        if key in done:
+            skipped += 1
+        else:
+            pending.append((key, record))
+            done.add(key)  # Duplicate specs in the input are only planned once
+
+    counts = {"ok": 0, "error": 0, "degraded": 0, "skipped": skipped}
+    write_lock = threading.Lock()
+    output: TextIO = sys.stdout if output_path == "-" else open(output_path, "a", encoding="utf-8")
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="travel-batch") as executor:
+            futures = [executor.submit(plan_record, key, record) for key, record in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                with write_lock:
+                    output.write(json.dumps(result, default=str) + "\n")
+                    output.flush()
+                    if output is not sys.stdout:
+                        os.fsync(output.fileno())
+                    counts[result["status"]] += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return counts
+
+
+def _parse_rate_limits(values: List[str]) -> Dict[str, float]:
+    limits = {}
+    for value in values:
+        provider, _, rate = value.partition("=")
+        if not rate:
+            raise argparse.ArgumentTypeError(f"Expected PROVIDER=REQUESTS_PER_MINUTE, got {value!r}")
+        limits[provider] = float(rate)
+    return limits
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate travel plans for a JSONL file of trip specs.")
+    parser.add_argument("input", help="JSONL file of trip specs, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file to append results to, or - for stdout")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Trips planned concurrently")
+    parser.add_argument("--rate-limit", action="append", default=[], metavar="PROVIDER=RPM",
+                        help="Maximum LLM requests per minute for a provider (repeatable)")
+    parser.add_argument("--no-resume", action="store_true", help="Re-plan trips already in the output file")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    counts = run_batch(args.input, args.output, workers=args.workers,
+                       rate_limits=_parse_rate_limits(args.rate_limit), resume=not args.no_resume)
+    print(f"Planned {counts['ok']} trips, {counts['error']} failed, {counts['degraded']} cut short by deadlines, "
+          f"{counts['skipped']} skipped", file=sys.stderr)
+    return 1 if counts["error"] or counts["degraded"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
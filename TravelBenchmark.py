@@ -0,0 +1,466 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Union
+
+# Keep the benchmark hermetic: no telemetry, and caches and artifacts in a throwaway directory
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("TRAVEL_CACHE_DIR", tempfile.mkdtemp(prefix="travel-bench-"))
+# The stand-in search backend is never throttled, so don't rate limit it either
+os.environ.setdefault("TRAVEL_SEARCH_RATE", "1000")
+os.environ.setdefault("TRAVEL_ARTIFACT_DIR", os.path.join(os.environ["TRAVEL_CACHE_DIR"], "artifacts"))
+
+from crewai import LLM
+from TravelAgents import TravelAgents
+from TravelCache import get_page_cache
+from TravelFetch import PageFetcher
+from TravelPipeline import PlanningPipeline, StageResult, TripSpec
+from TravelTools import SearchTools
+
+_WORDS = ("temple", "market", "museum", "ramen", "garden", "station", "ferry", "district", "festival",
+          "gallery", "harbor", "noodles", "castle", "shrine", "alley", "tram", "bakery", "viewpoint")
+_SECTIONS = ("Main Attractions", "Local Customs and Culture", "Typical Weather", "Transportation Options",
+             "Safety Considerations", "Estimated Costs")
+
+
+class FakeLLM(LLM):
+    """Deterministic local stand-in for the OpenAI model.
+
+    Each task first issues `tool_calls` searches through the agent's tool, then returns a
+    sectioned final answer, or valid Itinerary / ItineraryOutline JSON when the prompt asks for
+    that format, so the structured itinerary, budget engine and chunked paths are exercised.
+    Latency and answer length are configurable; answers grow with the trip length found in the
+    prompt, like real itineraries do.
+    """
+
+    def __init__(self, latency: float = 0.05, tokens_per_second: float = 2000.0, output_tokens: int = 300,
+                 tokens_per_day: int = 60, tool_calls: int = 1):
+        super().__init__(model="fake/benchmark")
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.tokens_per_day = tokens_per_day
+        self.tool_calls = tool_calls
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 128000
+
+    def call(self, messages: Union[str, List[Dict[str, str]]], tools: Optional[List[dict]] = None,
+             callbacks: Optional[List[Any]] = None, available_functions: Optional[Dict[str, Any]] = None) -> str:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        transcript = "\n".join(str(message.get("content", "")) for message in messages)
+        seed = int(hashlib.sha256(transcript.encode()).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+
+        # crewai appends each tool result to the transcript as an assistant message ending in an Observation
+        observations = sum(str(message.get("content", "")).count("Observation:")
+                           for message in messages if message.get("role") == "assistant")
+        if observations < self.tool_calls:
+            time.sleep(self.latency)
+            query = " ".join(rng.sample(_WORDS, 3))
+            return (f"Thought: I need more information.\nAction: duckduckgo_search\n"
+                    f"Action Input: {json.dumps({'query': query})}")
+
+        days = re.search(r"(\d+)[- ]day", transcript)
+        tokens = self.output_tokens + self.tokens_per_day * (int(days.group(1)) if days else 0)
+        time.sleep(self.latency + tokens / self.tokens_per_second)
+        body = self._structured_answer(transcript, int(days.group(1)) if days else 1, rng)
+        if body is None:
+            words_per_section = max(1, tokens // len(_SECTIONS))
+            body = "\n\n".join(
+                f"## {section}\n" + " ".join(rng.choice(_WORDS) for _ in range(words_per_section))
+                for section in _SECTIONS
+            )
+        elif "Final Answer" not in transcript:
+            # A conversion request rather than an agent step: answer with the bare JSON
+            return body
+        return f"Thought: I now know the final answer\nFinal Answer: {body}"
+
+    @staticmethod
+    def _structured_answer(transcript: str, duration: int, rng: random.Random) -> Optional[str]:
+        # Tasks with a Pydantic output list the model's fields in their prompt
+        block = re.search(r"Plan days (\d+) to (\d+)", transcript)
+        first, last = (int(block.group(1)), int(block.group(2))) if block else (1, duration)
+        if '"region"' in transcript:
+            return json.dumps({"days": [
+                {"day": day, "region": f"{rng.choice(_WORDS).title()} district", "theme": rng.choice(_WORDS),
+                 "highlights": rng.sample(_WORDS, 2)}
+                for day in range(1, duration + 1)
+            ]})
+        if '"estimated_cost"' in transcript:
+            destination = re.search(r"\d+-day trip to ([^\n]+)", transcript)
+            slots = (("transport", "morning"), ("activity", "morning"), ("activity", "afternoon"),
+                     ("meal", "evening"), ("accommodation", "night"))
+            return json.dumps({
+                "destination": destination.group(1).strip() if destination else "Tokyo, Japan",
+                "currency": "USD",
+                "overview": " ".join(rng.choice(_WORDS) for _ in range(20)),
+                "days": [
+                    {"day": day, "title": f"{rng.choice(_WORDS).title()} day",
+                     "items": [{"category": category, "time_of_day": time_of_day,
+                                "name": f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS)}",
+                                "details": " ".join(rng.choice(_WORDS) for _ in range(8)),
+                                "estimated_cost": rng.randrange(5, 200)}
+                               for category, time_of_day in slots]}
+                    for day in range(first, last + 1)
+                ],
+            })
+        return None
+
+
+class FakeDDGS:
+    """Deterministic local stand-in for duckduckgo_search.DDGS."""
+
+    latency = 0.02
+    # Base URL of a FakePageServer; result links point there when set
+    page_base: Optional[str] = None
+
+    def __enter__(self) -> "FakeDDGS":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+        time.sleep(self.latency)
+        rng = random.Random(query)
+        return [
+            {
+                "title": f"{query.title()} guide {i}",
+                "href": f"{self.page_base or 'https://example.invalid'}/{rng.randrange(10 ** 6)}",
+                "body": " ".join(rng.choice(_WORDS) for _ in range(30)),
+            }
+            for i in range(1, max_results + 1)
+        ]
+
+
+class FakePageServer:
+    """Local HTTP stand-in for result pages, serving deterministic articles with ETags.
+
+    Requests carrying a matching If-None-Match get a 304, like a real server would for an unchanged page.
+    """
+
+    def __init__(self, latency: float = 0.05, paragraphs: int = 12):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                time.sleep(server.latency)
+                etag = f'"{hashlib.sha256(self.path.encode()).hexdigest()[:16]}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                body = server.page(self.path).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def page(self, path: str) -> str:
+        rng = random.Random(path)
+        paragraphs = "\n".join(f"<p>{' '.join(rng.choice(_WORDS) for _ in range(40))}</p>"
+                                for _ in range(self.paragraphs))
+        return (f"<html><head><title>Guide {path.strip('/')}</title><script>var x = 1;</script></head>"
+                f"<body><nav><a href='/'>Home</a></nav><article>{paragraphs}</article>"
+                f"<footer>Copyright</footer></body></html>")
+
+    def __enter__(self) -> "FakePageServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _trip(duration: int) -> TripSpec:
+    start = date(2025, 6, 1)
+    return TripSpec(
+        starting_point="New York, USA",
+        destination="Tokyo, Japan",
+        start_date=start,
+        end_date=start + timedelta(days=duration),
+        interests=["Food", "Culture"],
+    )
+
+
+def _pipeline(llm: FakeLLM, search_tools: SearchTools, use_cache: bool, max_workers: Optional[int] = None
+              ) -> PlanningPipeline:
+    agents = TravelAgents(model_name=llm.model, use_cache=use_cache, llm=llm, search_tools=search_tools)
+    return PlanningPipeline(agents, max_workers=max_workers, reuse_results=use_cache)
+
+
+def profile_stage_memory(llm: FakeLLM, search_tools: SearchTools, duration: int, use_cache: bool) -> Dict[str, float]:
+    """
+    Measure each stage's peak traced memory (MiB) by running the stages one at a time.
+
+    Returns:
+        Peak memory keyed by stage name.
+    """
+    pipeline = _pipeline(llm, search_tools, use_cache, max_workers=1)
+    peaks: Dict[str, float] = {}
+    run_stage = pipeline.run_stage
+
+    def traced_run_stage(stage, *args, **kwargs):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = run_stage(stage, *args, **kwargs)
+        peaks[stage.name] = (tracemalloc.get_traced_memory()[1] - baseline) / 2 ** 20
+        return result
+
+    pipeline.run_stage = traced_run_stage
+    tracemalloc.start()
+    try:
+        pipeline.run(_trip(duration))
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def run_benchmark(durations: List[int], concurrency_levels: List[int], plans_per_worker: int = 2,
+                  llm_options: Optional[Dict[str, Any]] = None, search_latency: float = 0.02,
+                  use_cache: bool = False, deep: bool = False, page_latency: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    Run the four planning stages end to end against the local stand-ins.
+
+    Args:
+        durations: Trip lengths (days) to benchmark.
+        concurrency_levels: Numbers of plans run at the same time.
+        plans_per_worker: Plans per concurrent worker in each cell.
+        llm_options: FakeLLM settings (latency, tokens_per_second, output_tokens, tokens_per_day, tool_calls).
+        search_latency: Seconds each fake search takes.
+        use_cache: Keep the search/LLM caches and stage memo enabled.
+        deep: Use deep search, fetching result pages from a local FakePageServer.
+        page_latency: Seconds each fake page takes to serve.
+
+    Returns:
+        One report row per (duration, concurrency) cell.
+    """
+    if deep:
+        with FakePageServer(latency=page_latency) as pages:
+            FakeDDGS.page_base = pages.url
+            try:
+                return run_benchmark(durations, concurrency_levels, plans_per_worker, llm_options, search_latency,
+                                     use_cache)
+            finally:
+                FakeDDGS.page_base = None
+
+    FakeDDGS.latency = search_latency
+    llm = FakeLLM(**(llm_options or {}))
+    search_options: Dict[str, Any] = {}
+    if FakeDDGS.page_base:
+        search_options = {"deep": True, "fetcher": PageFetcher(cache=get_page_cache() if use_cache else None)}
+    search_tools = SearchTools(use_cache=use_cache, use_index=use_cache, backend=FakeDDGS, **search_options)
+    rows = []
+    for duration in durations:
+        memory = profile_stage_memory(llm, search_tools, duration, use_cache)
+        for concurrency in concurrency_levels:
+            plan_latencies: List[float] = []
+            stage_latencies: Dict[str, List[float]] = {}
+            errors = 0
+
+            def plan(_: int) -> Dict[str, StageResult]:
+                started = time.perf_counter()
+                results = _pipeline(llm, search_tools, use_cache).run(_trip(duration))
+                plan_latencies.append(time.perf_counter() - started)
+                return results
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for results in executor.map(plan, range(concurrency * plans_per_worker)):
+                    for name, result in results.items():
+                        stage_latencies.setdefault(name, []).append(result.duration)
+                        errors += result.error is not None
+            wall_time = time.perf_counter() - started
+
+            rows.append({
+                "duration_days": duration,
+                "concurrency": concurrency,
+                "plans": len(plan_latencies),
+                "errors": errors,
+                "throughput_plans_per_s": len(plan_latencies) / wall_time,
+                "plan_p50_s": _percentile(plan_latencies, 50),
+                "plan_p95_s": _percentile(plan_latencies, 95),
+                "stages": {
+                    name: {
+                        "p50_s": _percentile(latencies, 50),
+                        "p95_s": _percentile(latencies, 95),
+                        "peak_mib": memory.get(name, 0.0),
+                    }
+                    for name, latencies in stage_latencies.items()
+                },
+            })
+    return rows
+
+
+# Runs in a fresh interpreter so nothing is already imported; prints one JSON object
+_STARTUP_PROBE = """
+import json, sys, time
+timings = {}
+started = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+timings["streamlit_import_s"] = time.perf_counter() - started
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+started = time.perf_counter()
+app.run()
+timings["first_render_s"] = time.perf_counter() - started
+started = time.perf_counter()
+app.sidebar.multiselect[0].select("Art").run()
+timings["sidebar_rerun_s"] = time.perf_counter() - started
+timings["planner_imported_at_startup"] = "crewai" in sys.modules
+started = time.perf_counter()
+import TravelPipeline
+timings["planner_import_s"] = time.perf_counter() - started
+timings["errors"] = [str(error.value) for error in app.exception]
+print(json.dumps(timings))
+"""
+
+
+def measure_startup(app_path: str = "app.py", runs: int = 3) -> Dict[str, Any]:
+    """
+    Measure the Streamlit app's cold start in fresh interpreters.
+
+    Each run imports Streamlit, renders the app once (time to first render), changes a sidebar
+    widget (a rerun) and finally imports the planning pipeline, which the app defers until a
+    plan is requested.
+
+    Args:
+        app_path: The Streamlit script.
+        runs: Fresh interpreters to start; the median of each timing is reported.
+
+    Returns:
+        Median timings in seconds, and whether crewai was imported before a plan was requested.
+    """
+    samples = []
+    directory = os.path.dirname(os.path.abspath(app_path))
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, os.path.abspath(app_path)], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    report: Dict[str, Any] = {
+        key: _percentile([sample[key] for sample in samples], 50)
+        for key in ("streamlit_import_s", "first_render_s", "sidebar_rerun_s", "planner_import_s")
+    }
+    report["planner_imported_at_startup"] = any(sample["planner_imported_at_startup"] for sample in samples)
+    report["errors"] = sorted({error for sample in samples for error in sample["errors"]})
+    return report
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    lines = []
+    for row in rows:
+        lines.append(
+            f"duration={row['duration_days']}d concurrency={row['concurrency']} plans={row['plans']} "
+            f"errors={row['errors']} throughput={row['throughput_plans_per_s']:.2f}/s "
+            f"p50={row['plan_p50_s']:.2f}s p95={row['plan_p95_s']:.2f}s"
+        )
+        for name, stage in row["stages"].items():
+            lines.append(f"    {name:<16} p50={stage['p50_s']:.3f}s p95={stage['p95_s']:.3f}s "
+                         f"peak={stage['peak_mib']:.2f}MiB")
+    return "\n".join(lines)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the planning pipeline with local LLM and search stand-ins.")
+    parser.add_argument("--durations", type=_int_list, default=[3, 7, 14], help="Trip lengths in days, e.g. 3,7,14")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4], help="Concurrent plans, e.g. 1,4,8")
+    parser.add_argument("--plans-per-worker", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds of fixed latency per LLM call")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--output-tokens", type=int, default=300, help="Base tokens per final answer")
+    parser.add_argument("--tokens-per-day", type=int, default=60, help="Extra answer tokens per trip day")
+    parser.add_argument("--tool-calls", type=int, default=1, help="Searches each agent makes per task")
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--deep", action="store_true", help="Use deep search against a local page server")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="Seconds each fake page takes to serve")
+    parser.add_argument("--with-cache", action="store_true", help="Keep search/LLM caches and stage reuse enabled")
+    parser.add_argument("--startup", action="store_true",
+                        help="Only measure the Streamlit app's import time and time to first render")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report rows as JSON")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        report = measure_startup()
+        print(" ".join(f"{key}={value:.3f}s" for key, value in report.items() if key.endswith("_s")))
+        print(f"planner_imported_at_startup={report['planner_imported_at_startup']}")
+        for error in report["errors"]:
+            print(f"error: {error}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as handle:
+                json.dump(report, handle, indent=2)
+        return 0
+
+    rows = run_benchmark(
+        args.durations,
+        args.concurrency,
+        plans_per_worker=args.plans_per_worker,
+        llm_options={
+            "latency": args.llm_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "output_tokens": args.output_tokens,
+            "tokens_per_day": args.tokens_per_day,
+            "tool_calls": args.tool_calls,
+        },
+        search_latency=args.search_latency,
+        use_cache=args.with_cache,
+        deep=args.deep,
+        page_latency=args.page_latency,
+    )
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(rows, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+from TravelItinerary import COST_CATEGORIES, Itinerary
+
+BUDGET_LEVELS = ("Budget", "Moderate", "Luxury")
+
+# Price of each category at each budget level relative to Moderate (rows: BUDGET_LEVELS, columns: COST_CATEGORIES)
+LEVEL_PRICE_FACTORS = np.array([
+    # transport, accommodation, activity, meal, other
+    [0.7, 0.45, 0.7, 0.55, 0.7],
+    [1.0, 1.0, 1.0, 1.0, 1.0],
+    [1.8, 3.0, 1.6, 2.2, 1.5],
+])
+
+
+@dataclass
+class BudgetBreakdown:
+    """Deterministic cost totals of an itinerary."""
+
+    currency: str
+    budget_level: str
+    total: float
+    by_category: Dict[str, float]
+    by_day: Dict[int, float]
+    # Estimated total of the same itinerary at each budget level
+    by_level: Dict[str, float]
+    # The most expensive items, as (day, name, cost)
+    top_items: List[tuple]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "currency": self.currency,
+            "budget_level": self.budget_level,
+            "total": self.total,
+            "by_category": self.by_category,
+            "by_day": self.by_day,
+            "by_level": self.by_level,
+            "top_items": [list(item) for item in self.top_items],
+        }
+
+    def summary(self) -> str:
+        """Compact plain-text summary handed to the LLM that writes the savings tips."""
+        lines = [f"Total per traveler: {self.total:,.0f} {self.currency} ({self.budget_level})"]
+        lines += [f"{category}: {amount:,.0f}" for category, amount in self.by_category.items() if amount]
+        lines.append("Most expensive items: " + "; ".join(
+            f"day {day} {name} ({cost:,.0f})" for day, name, cost in self.top_items))
+        return "\n".join(lines)
+
+    def to_markdown(self) -> str:
+        """Render the breakdown as Markdown tables."""
+        lines = ["## Budget Breakdown", "",
+                 f"Estimated total per traveler: **{self.total:,.0f} {self.currency}** ({self.budget_level} level)", "",
+                 "| Category | Cost | Share |", "|---|---:|---:|"]
+        for category, amount in self.by_category.items():
+            if amount:
+                share = amount / self.total if self.total else 0.0
+                lines.append(f"| {category.title()} | {amount:,.0f} | {share:.0%} |")
+        lines += ["", "| Day | Cost |", "|---|---:|"]
+        lines += [f"| {day} | {amount:,.0f} |" for day, amount in self.by_day.items()]
+        lines += ["", "| Budget level | Estimated total |", "|---|---:|"]
+        lines += [f"| {level} | {amount:,.0f} |" for level, amount in self.by_level.items()]
+        return "\n".join(lines) + "\n"
+
+
+class BudgetEngine:
+    """Aggregates itinerary cost estimates locally instead of asking the LLM to do the arithmetic."""
+
+    def __init__(self, price_factors: np.ndarray = LEVEL_PRICE_FACTORS, top_items: int = 5):
+        """
+        Args:
+            price_factors: Relative category prices per budget level, shaped (levels, categories).
+            top_items: Number of most expensive items listed in the breakdown.
+        """
+        self.price_factors = price_factors
+        self.top_items = top_items
+
+    def breakdown(self, itinerary: Itinerary, budget_level: str = "Moderate") -> BudgetBreakdown:
+        """
+        Total an itinerary's costs by category, day and budget level.
+
+        Args:
+            itinerary: The structured itinerary; its costs are estimates at `budget_level`.
+            budget_level: The level the itinerary was planned at.
+
+        Returns:
+            The breakdown.
+        """
+        items = [(day.day, item) for day in itinerary.days for item in day.items]
+        costs = np.array([item.estimated_cost for _, item in items], dtype=float)
+        categories = np.array([COST_CATEGORIES.index(item.category) for _, item in items], dtype=int)
+        day_numbers = np.array([day for day, _ in items], dtype=int)
+
+        by_category = np.bincount(categories, weights=costs, minlength=len(COST_CATEGORIES))
+        days = np.unique(day_numbers)
+        by_day = np.bincount(np.searchsorted(days, day_numbers), weights=costs, minlength=len(days))
+
+        # Rescale each category from the planned level to every other level
+        level = BUDGET_LEVELS.index(budget_level) if budget_level in BUDGET_LEVELS else 1
+        by_level = (self.price_factors / self.price_factors[level]) @ by_category
+
+        top = np.argsort(-costs, kind="stable")[:self.top_items]
+        return BudgetBreakdown(
+            currency=itinerary.currency,
+            budget_level=BUDGET_LEVELS[level],
+            total=float(by_category.sum()),
+            by_category={category: float(amount) for category, amount in zip(COST_CATEGORIES, by_category)},
+            by_day={int(day): float(amount) for day, amount in zip(days, by_day)},
+            by_level={name: float(amount) for name, amount in zip(BUDGET_LEVELS, by_level)},
+            top_items=[(items[i][0], items[i][1].name, float(costs[i])) for i in top if costs[i] > 0],
+        )
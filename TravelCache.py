@@ -0,0 +1,485 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_CACHE_DIR = os.getenv("TRAVEL_CACHE_DIR", ".travel_cache")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query; the one rule by which searches are compared.
+
+    The search cache, in-flight search coalescing and the search index all key on it. Word order
+    is kept, since "paris to tokyo" is not "tokyo to paris".
+
+    Args:
+        query: The raw search query.
+
+    Returns:
+        The query lower-cased with surrounding and repeated whitespace collapsed.
+    """
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class PersistentLRUCache:
+    """SQLite-backed key/value cache with per-entry TTL and size-bounded LRU eviction."""
+
+    def __init__(self, path: str, table: str = "cache", max_entries: int = 5000,
+                 default_ttl: Optional[float] = None, keep_expired: bool = False):
+        """
+        Open (or create) a persistent cache.
+
+        Args:
+            path: Location of the SQLite database file.
+            table: Table holding the entries, so several caches can share one file.
+            max_entries: Maximum number of entries kept before the least recently used are evicted.
+            default_ttl: Lifetime in seconds applied when `set` is called without a TTL (None = never expires).
+            keep_expired: Keep expired entries (readable with `allow_expired`) until LRU eviction removes them,
+                instead of deleting them whenever the cache is written.
+        """
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.keep_expired = keep_expired
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+
+    def get(self, key: str, allow_expired: bool = False) -> Optional[str]:
+        """
+        Look up a value and mark it as recently used.
+
+        Args:
+            key: The cache key.
+            allow_expired: Return the value even if its TTL has passed.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (not allow_expired and row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Store a value, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+            ttl: Lifetime in seconds; falls back to the cache's default TTL.
+        """
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, expires_at, now),
+            )
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        """Remove a single entry."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness.
+
+        Returns:
+            Hit/miss/eviction counters, hit rate and current size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+        }
+
+    def _evict(self) -> None:
+        # Expired rows go first, then the least recently used until we are back under the limit.
+        expired = 0
+        if not self.keep_expired:
+            expired = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+        self.evictions += max(expired, 0) + max(overflow, 0)
+
+
+class MemoryLRUCache:
+    """Thread-safe in-process LRU cache."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SearchCache:
+    """Persistent cache of raw web search results keyed on the normalized query."""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 3600, max_entries: int = 5000):
+        """
+        Args:
+            path: SQLite file for the cache; defaults to `<TRAVEL_CACHE_DIR>/search_cache.sqlite`.
+            ttl: Seconds a search result stays fresh.
+            max_entries: Maximum number of cached queries.
+        """
+        self.store = PersistentLRUCache(
+            path or os.path.join(DEFAULT_CACHE_DIR, "search_cache.sqlite"),
+            table="search_results",
+            max_entries=max_entries,
+            default_ttl=ttl,
+        )
+
+    @staticmethod
+    def make_key(query: str, max_results: int) -> str:
+        return f"{max_results}:{normalize_query(query)}"
+
+    def get(self, query: str, max_results: int, allow_expired: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetch cached results for a query.
+
+        Args:
+            query: The search query.
+            max_results: Number of results the search was run with.
+            allow_expired: Return results whose TTL has passed.
+
+        Returns:
+            The list of result dicts, or None on a miss.
+        """
+        value = self.store.get(self.make_key(query, max_results), allow_expired=allow_expired)
+        return json.loads(value) if value is not None else None
+
+    def set(self, query: str, max_results: int, results: List[Dict[str, Any]], ttl: Optional[float] = None) -> None:
+        """Store the results of a search."""
+        self.store.set(self.make_key(query, max_results), json.dumps(results), ttl=ttl)
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """
+    Return the process-wide search cache, creating it on first use.
+
+    The TTL and size can be tuned with the TRAVEL_SEARCH_CACHE_TTL and
+    TRAVEL_SEARCH_CACHE_MAX_ENTRIES environment variables.
+    """
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(
+                ttl=float(os.getenv("TRAVEL_SEARCH_CACHE_TTL", 24 * 3600)),
+                max_entries=int(os.getenv("TRAVEL_SEARCH_CACHE_MAX_ENTRIES", 5000)),
+            )
+        return _search_cache
+
+
+class PageCache:
+    """Persistent cache of extracted web page text keyed on the URL, with the validators needed to revalidate it."""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 3600, max_entries: int = 2000):
+        """
+        Args:
+            path: SQLite file for the cache; defaults to `<TRAVEL_CACHE_DIR>/page_cache.sqlite`.
+            ttl: Seconds an extracted page is used without revalidating it.
+            max_entries: Maximum number of cached pages.
+        """
+        self.store = PersistentLRUCache(
+            path or os.path.join(DEFAULT_CACHE_DIR, "page_cache.sqlite"),
+            table="pages",
+            max_entries=max_entries,
+            default_ttl=ttl,
+            # Expired pages are revalidated with their ETag or Last-Modified date rather than fetched again
+            keep_expired=True,
+        )
+
+    def get(self, url: str, allow_expired: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a cached page.
+
+        Args:
+            url: The page URL.
+            allow_expired: Return pages whose TTL has passed (e.g. to revalidate them by ETag).
+
+        Returns:
+            A dict with "title", "text", "etag" and "last_modified", or None on a miss.
+        """
+        value = self.store.get(url, allow_expired=allow_expired)
+        return json.loads(value) if value is not None else None
+
+    def set(self, url: str, page: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Store an extracted page."""
+        self.store.set(url, json.dumps(page), ttl=ttl)
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """
+    Return the process-wide page cache, creating it on first use.
+
+    The TTL and size can be tuned with the TRAVEL_PAGE_CACHE_TTL and
+    TRAVEL_PAGE_CACHE_MAX_ENTRIES environment variables.
+    """
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache(
+                ttl=float(os.getenv("TRAVEL_PAGE_CACHE_TTL", 24 * 3600)),
+                max_entries=int(os.getenv("TRAVEL_PAGE_CACHE_MAX_ENTRIES", 2000)),
+            )
+        return _page_cache
+
+
+# Sampling parameters that change what a model returns for the same messages
+LLM_SAMPLING_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens", "presence_penalty",
+    "frequency_penalty", "logit_bias", "seed", "logprobs", "top_logprobs", "reasoning_effort",
+)
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of LLM completions."""
+
+    def __init__(self, path: Optional[str] = None, memory_entries: int = 256, max_entries: int = 10000,
+                 ttl: Optional[float] = 7 * 24 * 3600, disabled_models: Iterable[str] = ()):
+        """
+        Args:
+            path: SQLite file for the disk tier; defaults to `<TRAVEL_CACHE_DIR>/llm_cache.sqlite`.
+            memory_entries: Size of the in-memory tier.
+            max_entries: Size of the disk tier.
+            ttl: Seconds a cached completion stays valid (None = never expires).
+            disabled_models: Models whose calls always bypass the cache.
+        """
+        self.memory = MemoryLRUCache(memory_entries)
+        self.disk = PersistentLRUCache(
+            path or os.path.join(DEFAULT_CACHE_DIR, "llm_cache.sqlite"),
+            table="llm_responses",
+            max_entries=max_entries,
+            default_ttl=ttl,
+        )
+        self.disabled_models = set(disabled_models)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def is_enabled(self, model: str) -> bool:
+        return model not in self.disabled_models
+
+    def enable(self, model: str) -> None:
+        self.disabled_models.discard(model)
+
+    def disable(self, model: str) -> None:
+        self.disabled_models.add(model)
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+        """
+        Build the cache key for a completion request.
+
+        Args:
+            model: The model name.
+            messages: The chat messages sent to the model.
+            params: Sampling parameters; unset (None) values are ignored.
+
+        Returns:
+            A hex digest identifying the request.
+        """
+        sampling = {k: v for k, v in params.items() if k in LLM_SAMPLING_PARAMS and v is not None}
+        messages_hash = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()
+        sampling_hash = hashlib.sha256(json.dumps(sampling, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{model}:{messages_hash}:{sampling_hash[:16]}"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a completion, promoting disk hits into the memory tier.
+
+        Returns:
+            The cached response text, or None on a miss.
+        """
+        entry = self.memory.get(key)
+        tier = "memory"
+        if entry is None:
+            raw = self.disk.get(key)
+            entry = json.loads(raw) if raw is not None else None
+            tier = "disk"
+            if entry is not None:
+                self.memory.set(key, entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            self.tokens_saved += entry.get("tokens", 0)
+        return entry["response"]
+
+    def set(self, key: str, response: str, tokens: int = 0) -> None:
+        """
+        Store a completion in both tiers.
+
+        Args:
+            key: Key from `make_key`.
+            response: The response text.
+            tokens: Prompt plus completion tokens the original call cost.
+        """
+        entry = {"response": response, "tokens": tokens}
+        self.memory.set(key, entry)
+        self.disk.set(key, json.dumps(entry))
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk.clear()
+        with self._lock:
+            self.memory_hits = self.disk_hits = self.misses = self.tokens_saved = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness.
+
+        Returns:
+            Hits per tier, misses, hit rate, tokens saved and tier sizes.
+        """
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk),
+            "disabled_models": sorted(self.disabled_models),
+        }
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Return the process-wide LLM response cache, creating it on first use.
+
+    TRAVEL_LLM_CACHE_DISABLED_MODELS takes a comma-separated list of models to never cache.
+    """
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            disabled = os.getenv("TRAVEL_LLM_CACHE_DISABLED_MODELS", "")
+            _llm_cache = LLMResponseCache(
+                memory_entries=int(os.getenv("TRAVEL_LLM_CACHE_MEMORY_ENTRIES", 256)),
+                max_entries=int(os.getenv("TRAVEL_LLM_CACHE_MAX_ENTRIES", 10000)),
+                disabled_models=[model.strip() for model in disabled.split(",") if model.strip()],
+            )
+        return _llm_cache
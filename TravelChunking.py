@@ -0,0 +1,210 @@
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from crewai import Crew, Task
+from TravelItinerary import Itinerary, ItineraryOutline
+from TravelStreaming import current_sink
+from TravelTasks import TravelTasks
+from TravelTracing import tracer, tracing_enabled
+
+
+@dataclass
+class ChunkedItinerary:
+    """An itinerary assembled from independently planned blocks of days."""
+
+    itinerary: Itinerary
+    outline: ItineraryOutline
+    chunks: List[Tuple[int, int]]
+    # Attractions that more than one block planned, as (day removed from, name); only the first is kept
+    duplicates: List[Tuple[int, str]] = field(default_factory=list)
+    # Blocks whose first answer did not cover their days and were planned again
+    retried: List[Tuple[int, int]] = field(default_factory=list)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"chunks": len(self.chunks), "duplicate_attractions": [name for _, name in self.duplicates],
+                "retried_chunks": len(self.retried)}
+
+
+def chunk_ranges(duration: int, chunk_days: int) -> List[Tuple[int, int]]:
+    """Split days 1..duration into consecutive (first, last) blocks of at most `chunk_days` days."""
+    return [(first, min(first + chunk_days - 1, duration)) for first in range(1, duration + 1, chunk_days)]
+
+
+def _attraction_key(name: str) -> str:
+    # "Visit the Senso-ji Temple" and "Senso-ji temple" are the same attraction
+    words = re.findall(r"[a-z0-9]+", name.lower())
+    return " ".join(word for word in words if word not in ("visit", "the", "a", "an", "explore", "tour", "of"))
+
+
+def fit_block(block: Itinerary, first_day: int, last_day: int) -> Optional[Itinerary]:
+    """
+    Check that a block covers exactly days first_day..last_day.
+
+    A block with one entry per day but the wrong numbers (models often restart at day 1) is
+    renumbered in order; a block with missing or extra days is rejected.
+
+    Args:
+        block: The block as planned.
+        first_day: First day the block was asked for.
+        last_day: Last day the block was asked for.
+
+    Returns:
+        The block numbered first_day..last_day, or None if it does not have one entry per day.
+    """
+    expected = list(range(first_day, last_day + 1))
+    if len(block.days) != len(expected):
+        return None
+    days = sorted(block.days, key=lambda day: day.day)
+    if [day.day for day in days] == expected:
+        return block
+    return block.model_copy(update={"days": [day.model_copy(update={"day": number})
+                                             for day, number in zip(days, expected)]})
+
+
+def fit_outline(outline: ItineraryOutline, duration: int) -> Optional[ItineraryOutline]:
+    """Check that an outline has one entry per day of the trip, renumbering it like `fit_block` does."""
+    if len(outline.days) != duration:
+        return None
+    days = sorted(outline.days, key=lambda day: day.day)
+    return outline.model_copy(update={"days": [day.model_copy(update={"day": number})
+                                               for number, day in enumerate(days, start=1)]})
+
+
+def merge_chunks(destination: str, parts: List[Itinerary], ranges: List[Tuple[int, int]]
+                 ) -> Tuple[Itinerary, List[Tuple[int, str]]]:
+    """
+    Merge blocks of days into one itinerary, dropping activities already planned by an earlier block.
+
+    Args:
+        destination: The trip destination.
+        parts: The blocks, in day order.
+        ranges: The (first, last) days each block was asked for.
+
+    Returns:
+        The merged itinerary and the removed duplicates as (day, name).
+
+    Raises:
+        ValueError: If a block does not cover exactly its range of days (see `fit_block`).
+    """
+    seen = set()
+    duplicates: List[Tuple[int, str]] = []
+    days = []
+    for part, (first_day, last_day) in zip(parts, ranges, strict=True):
+        fitted = fit_block(part, first_day, last_day)
+        if fitted is None:
+            raise ValueError(f"Block for days {first_day}-{last_day} has {len(part.days)} days")
+        part = fitted
+        block_keys = set()
+        for day in sorted(part.days, key=lambda day: day.day):
+            items = []
+            for item in day.items:
+                key = _attraction_key(item.name) if item.category == "activity" else ""
+                if key and key in seen:
+                    duplicates.append((day.day, item.name))
+                    continue
+                if key:
+                    block_keys.add(key)
+                items.append(item)
+            days.append(day.model_copy(update={"items": items}))
+        seen |= block_keys
+    merged = Itinerary(
+        destination=destination,
+        currency=parts[0].currency if parts else "USD",
+        overview=" ".join(part.overview for part in parts if part.overview),
+        days=days,
+        notes="\n".join(part.notes for part in parts if part.notes) or None,
+    )
+    return merged, duplicates
+
+
+def _kickoff(task: Task) -> Any:
+    crew = Crew(agents=[task.agent], tasks=[task], verbose=not tracing_enabled())
+    return crew.kickoff()
+
+
+def run_chunked_itinerary(tasks: TravelTasks, trip: Any, outputs: Dict[str, str], chunk_days: int
+                          ) -> Optional[ChunkedItinerary]:
+    """
+    Plan a long trip as an outline followed by blocks of days generated in parallel.
+
+    The outline fixes each day's region, theme and highlights, so the blocks can be planned
+    independently and still fit together; the blocks are then merged and checked for
+    attractions planned twice.
+
+    Args:
+        tasks: Task factory of the plan.
+        trip: The trip being planned.
+        outputs: Upstream outputs; must contain "research".
+        chunk_days: Days per block.
+
+    Blocks that do not cover exactly their days are planned once more, with a prompt that says
+    what was wrong; the blocks that were fine are kept.
+
+    Returns:
+        The merged itinerary, or None if the outline does not cover the trip or a block still does
+        not fit after its retry, in which case the caller should plan the trip in one generation instead.
+    """
+    with tracer.span("chunk", "outline"):
+        outline = getattr(_kickoff(tasks.itinerary_outline_task(
+            destination=trip.destination,
+            starting_point=trip.starting_point,
+            interests=trip.interests,
+            duration=trip.duration,
+            travel_style=trip.travel_style,
+            travel_date_info=trip.travel_date_info,
+            research_report=outputs["research"]
+        )), "pydantic", None)
+    if not isinstance(outline, ItineraryOutline):
+        return None
+    outline = fit_outline(outline, trip.duration)
+    if outline is None:
+        return None
+
+    ranges = chunk_ranges(trip.duration, chunk_days)
+    outline_text = outline.to_text()
+    # Blocks finish out of order, so their tokens are not streamed into the stage's output
+    sink = current_sink.get()
+
+    def plan_block(instance: int, first_day: int, last_day: int, retry: bool) -> Optional[Itinerary]:
+        current_sink.set(None)
+        with tracer.span("chunk", f"days {first_day}-{last_day}" + (" (retry)" if retry else "")):
+            output = _kickoff(tasks.itinerary_chunk_task(
+                destination=trip.destination,
+                starting_point=trip.starting_point,
+                interests=trip.interests,
+                duration=trip.duration,
+                budget_level=trip.budget_level,
+                travel_style=trip.travel_style,
+                outline=outline_text,
+                first_day=first_day,
+                last_day=last_day,
+                instance=instance,
+                retry=retry
+            ))
+        block = getattr(output, "pydantic", None)
+        block = fit_block(block, first_day, last_day) if isinstance(block, Itinerary) else None
+        if sink is not None and block is not None:
+            sink.emit("tool_call", f"Planned days {first_day}-{last_day}")
+        return block
+
+    parts: List[Optional[Itinerary]] = [None] * len(ranges)
+    retried: List[Tuple[int, int]] = []
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="travel-chunk") as executor:
+        for retry in (False, True):
+            pending = [index for index, part in enumerate(parts) if part is None]
+            if not pending:
+                break
+            if retry:
+                retried = [ranges[index] for index in pending]
+            futures = {index: executor.submit(contextvars.copy_context().run, plan_block, index, *ranges[index], retry)
+                       for index in pending}
+            for index, future in futures.items():
+                parts[index] = future.result()
+    if any(part is None for part in parts):
+        return None
+
+    itinerary, duplicates = merge_chunks(trip.destination, parts, ranges)
+    return ChunkedItinerary(itinerary, outline, ranges, duplicates, retried)
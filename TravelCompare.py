@@ -0,0 +1,209 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional
+
+from TravelAgents import TravelAgents
+from TravelArtifacts import get_artifact_store, new_run_id
+from TravelBudget import BudgetBreakdown, BudgetEngine
+from TravelHandoff import ContextBudget
+from TravelItinerary import DestinationComparison, Itinerary
+from TravelPipeline import PlanningPipeline, PlanningStage, StageResult, TripSpec
+from TravelRouting import RoutingPolicy
+from TravelStreaming import StageEvent
+from TravelTasks import TravelTasks
+from TravelTracing import tracer
+
+MAX_DESTINATIONS = 5
+
+# Destination plans running at once across every comparison in the process (TRAVEL_COMPARE_MAX_PLANS).
+# The plans share the process-wide search cache, LLM response cache and in-flight search coalescing,
+# so only identical searches and LLM prompts are shared between destinations; stage memo keys
+# include the destination, so no stage result is.
+_plan_slots = threading.BoundedSemaphore(int(os.getenv("TRAVEL_COMPARE_MAX_PLANS", 3)))
+
+
+@dataclass
+class DestinationDigest:
+    """The parts of one destination's plan the comparison is built from, extracted without an LLM."""
+
+    destination: str
+    cost: Optional[float] = None
+    currency: str = ""
+    day_titles: List[str] = field(default_factory=list)
+    getting_there: str = ""
+
+    def to_text(self) -> str:
+        lines = [f"## {self.destination}"]
+        if self.cost is not None:
+            lines.append(f"Estimated cost per traveler: {self.cost:,.0f} {self.currency}")
+        if self.day_titles:
+            lines.append("Itinerary: " + "; ".join(self.day_titles))
+        if self.getting_there:
+            lines.append(self.getting_there)
+        return "\n".join(lines)
+
+
+@dataclass
+class Comparison:
+    """Plans for several candidate destinations and the side-by-side summary of them."""
+
+    destinations: List[str]
+    # Stage results of each destination's plan, keyed by destination and stage name
+    plans: Dict[str, Dict[str, StageResult]]
+    digests: Dict[str, DestinationDigest]
+    result: StageResult
+
+
+def destination_digest(destination: str, results: Dict[str, StageResult], budget_level: str = "Moderate",
+                       context_budget: Optional[ContextBudget] = None) -> DestinationDigest:
+    """
+    Summarize one destination's finished plan for the comparison stage.
+
+    The cost comes from the budget engine's totals and the itinerary from its day titles; the
+    research report is cut down to its travel and entry sections.
+
+    Args:
+        destination: The destination.
+        results: The plan's stage results.
+        budget_level: Level the itinerary is costed at when the budget stage has no totals.
+        context_budget: Compacts the research report; without one it is left out.
+
+    Returns:
+        The digest; fields whose stage failed or had no structured output are left empty.
+    """
+    digest = DestinationDigest(destination)
+    breakdown = results["budget"].data if "budget" in results else None
+    itinerary = results["itinerary"].data if "itinerary" in results else None
+    if not isinstance(breakdown, BudgetBreakdown) and isinstance(itinerary, Itinerary):
+        breakdown = BudgetEngine().breakdown(itinerary, budget_level)
+    if isinstance(breakdown, BudgetBreakdown):
+        digest.cost, digest.currency = breakdown.total, breakdown.currency
+    if isinstance(itinerary, Itinerary):
+        digest.day_titles = [day.title for day in sorted(itinerary.days, key=lambda day: day.day)]
+    research = results.get("research")
+    if context_budget is not None and research is not None and not research.error:
+        digest.getting_there = context_budget.compact("comparison", "research", research.output).text
+    return digest
+
+
+def _comparison_task(tasks: TravelTasks, trip: TripSpec, outputs: Dict[str, str], data: Dict[str, Any]):
+    return tasks.destination_comparison_task(
+        starting_point=trip.starting_point,
+        interests=trip.interests,
+        duration=trip.duration,
+        budget_level=trip.budget_level,
+        travel_date_info=trip.travel_date_info,
+        plan_summaries=outputs["summaries"]
+    )
+
+
+def comparison_table(destinations: List[str], digests: Dict[str, DestinationDigest],
+                     comparison: Optional[DestinationComparison]) -> str:
+    """
+    Render the side-by-side comparison as Markdown.
+
+    Costs always come from the digests; when the comparison stage produced no usable output
+    the table only has the locally known columns.
+    """
+    rows = {row.destination.strip().lower(): row for row in (comparison.destinations if comparison else [])}
+    lines = ["## Destination Comparison", "",
+             "| Destination | Est. cost | Travel time | Highlights | Best for | Drawbacks |",
+             "|---|---:|---|---|---|---|"]
+    for index, destination in enumerate(destinations):
+        digest = digests[destination]
+        # The model may reword a destination's name; fall back to its position in the list
+        row = rows.get(destination.lower())
+        if row is None and comparison and index < len(comparison.destinations):
+            row = comparison.destinations[index]
+        cost = f"{digest.cost:,.0f} {digest.currency}" if digest.cost is not None else "-"
+        highlights = "; ".join(row.highlights) if row else "; ".join(digest.day_titles[:3])
+        cells = [destination, cost, row.travel_time if row else "-", highlights or "-",
+                 row.best_for if row and row.best_for else "-", row.drawbacks if row and row.drawbacks else "-"]
+        lines.append("| " + " | ".join(cell.replace("|", "/").replace("\n", " ") for cell in cells) + " |")
+    if comparison and comparison.recommendation:
+        lines += ["", f"**Recommendation:** {comparison.recommendation}"]
+    return "\n".join(lines) + "\n"
+
+
+COMPARISON_STAGE = PlanningStage("comparison", "Comparing destinations...", (), _comparison_task,
+                                 "Error occurred while comparing destinations. Please try again.",
+                                 inputs=("starting_point", "interests", "duration", "budget_level",
+                                         "travel_date_info"),
+                                 role="comparison")
+
+
+def compare_destinations(trip: TripSpec, destinations: List[str], routing: Optional[RoutingPolicy] = None,
+                         on_stage_complete: Optional[Callable[[str, PlanningStage, StageResult], None]] = None,
+                         on_event: Optional[Callable[[str, StageEvent], None]] = None,
+                         run_id: Optional[str] = None, api_key: Optional[str] = None,
+                         **pipeline_options: Any) -> Comparison:
+    """
+    Plan a trip to each of several destinations concurrently, then compare them side by side.
+
+    Every destination gets a full plan of its own; at most TRAVEL_COMPARE_MAX_PLANS of them run
+    at once across the process. One extra lightweight stage then reads a compact digest of each
+    plan and writes the travel time, highlights, best fit and drawbacks of each destination.
+
+    Args:
+        trip: The trip; its destination is replaced by each of `destinations` in turn.
+        destinations: The candidate destinations, at most MAX_DESTINATIONS.
+        routing: Per-role models and stage budgets; by default every stage uses the trip's model.
+        on_stage_complete: Called with the destination (or "comparison"), the stage and its result
+            as each stage finishes, from the thread that ran the destination's plan.
+        on_event: Enables streaming; called with the destination and each event of its plan.
+        run_id: Identifies the comparison in the artifact store; destination `i` is stored as
+            run `<run_id>-<i>`.
+        api_key: OpenAI API key to plan with; defaults to OPENAI_API_KEY.
+        **pipeline_options: Passed to each destination's PlanningPipeline.
+
+    Returns:
+        The plans and the comparison.
+    """
+    destinations = list(dict.fromkeys(destination.strip() for destination in destinations if destination.strip()))
+    if not 2 <= len(destinations) <= MAX_DESTINATIONS:
+        raise ValueError(f"Compare between 2 and {MAX_DESTINATIONS} destinations")
+    run_id = run_id or new_run_id()
+
+    def plan(index: int, destination: str) -> Dict[str, StageResult]:
+        with _plan_slots:
+            agents = TravelAgents(model_name=trip.model_name, routing=routing, api_key=api_key)
+            return PlanningPipeline(agents, **pipeline_options).run(
+                replace(trip, destination=destination),
+                on_stage_complete=((lambda stage, result, completed, total:
+                                    on_stage_complete(destination, stage, result)) if on_stage_complete else None),
+                on_event=(lambda event: on_event(destination, event)) if on_event else None,
+                run_id=f"{run_id}-{index}",
+            )
+
+    with tracer.span("compare", trip.starting_point, destinations=len(destinations)):
+        with ThreadPoolExecutor(max_workers=len(destinations), thread_name_prefix="travel-compare") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, plan, index, destination)
+                       for index, destination in enumerate(destinations)]
+            plans = {destination: future.result() for destination, future in zip(destinations, futures)}
+
+        agents = TravelAgents(model_name=trip.model_name, routing=routing, api_key=api_key)
+        pipeline = PlanningPipeline(agents, compact_handoffs=False)
+        context_budget = ContextBudget(model_name=trip.model_name)
+        digests = {destination: destination_digest(destination, plans[destination], trip.budget_level, context_budget)
+                   for destination in destinations}
+        summaries = "\n\n".join(digests[destination].to_text() for destination in destinations)
+        comparison_trip = replace(trip, destination=", ".join(destinations))
+        try:
+            result = pipeline.run_stage(COMPARISON_STAGE, comparison_trip, {"summaries": summaries})
+        finally:
+            agents.release_agents()
+
+    structured = result.data if isinstance(result.data, DestinationComparison) else None
+    output = comparison_table(destinations, digests, structured)
+    if result.error:
+        output += f"\n_{COMPARISON_STAGE.error_message}_\n"
+    result = StageResult(result.name, output, result.started_at, result.finished_at, error=result.error,
+                         metrics=result.metrics, data=structured)
+    result.artifact = get_artifact_store().put(run_id, COMPARISON_STAGE.name, output,
+                                               {"trip": comparison_trip.to_dict(), "destinations": destinations})
+    if on_stage_complete:
+        on_stage_complete("comparison", COMPARISON_STAGE, result)
+    return Comparison(destinations, plans, digests, result)
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Share of the plan SLO each stage may use; stages on the same path add up, and the longest
+# path (research -> itinerary -> budget) is scaled to the whole SLO
+STAGE_SHARES: Dict[str, float] = {
+    "research": 0.3,
+    "itinerary": 0.45,
+    "recommendations": 0.3,
+    "budget": 0.25,
+}
+
+# Appended to an agent's next LLM call once its stage has to wrap up
+FINALIZE_PROMPT = ("Time is up for this task. Do not use any more tools. Respond now with "
+                   "'Final Answer:' followed by the best complete answer you can give from the "
+                   "information you already have.")
+
+
+class StageCancelledError(RuntimeError):
+    """Raised by an LLM call of a stage the plan has abandoned, so the stage stops spending tokens."""
+
+
+@dataclass
+class DeadlinePolicy:
+    """Per-plan latency SLO and how it is split into stage deadlines."""
+
+    # Wall-clock seconds for the whole plan (None = no deadlines)
+    slo_seconds: Optional[float] = 300.0
+    # Stage name -> share of the SLO; stages not listed get the smallest listed share
+    shares: Dict[str, float] = field(default_factory=lambda: dict(STAGE_SHARES))
+    # Fraction of a stage's time after which its agent is told to give its final answer
+    finalize_at: float = 0.8
+    # Web searches a stage may run before further searches are refused (None = unlimited); answers
+    # from the search cache or index are not counted
+    max_tool_calls: Optional[int] = 8
+
+    @classmethod
+    def from_env(cls) -> "DeadlinePolicy":
+        """Build the policy from TRAVEL_PLAN_SLO (seconds; "off" disables) and TRAVEL_STAGE_MAX_TOOL_CALLS."""
+        slo = os.getenv("TRAVEL_PLAN_SLO", "300").lower()
+        tool_calls = os.getenv("TRAVEL_STAGE_MAX_TOOL_CALLS", "8").lower()
+        return cls(
+            slo_seconds=None if slo in ("", "0", "off", "none") else float(slo),
+            max_tool_calls=None if tool_calls in ("", "0", "off", "none") else int(tool_calls),
+        )
+
+    def stage_offsets(self, stages: Iterable[Any]) -> Dict[str, float]:
+        """
+        Split the SLO into per-stage deadlines along the stage graph.
+
+        Each stage's deadline is the end of the longest chain of shares leading up to and
+        including it, so a stage inherits whatever time its dependencies did not use.
+
+        Args:
+            stages: The planning stages, each with `name` and `depends_on`, in dependency order.
+
+        Returns:
+            Seconds after the start of the plan by which each stage must finish; empty when the
+            policy has no SLO.
+        """
+        if self.slo_seconds is None:
+            return {}
+        default_share = min(self.shares.values()) if self.shares else 1.0
+        ends: Dict[str, float] = {}
+        for stage in stages:
+            start = max((ends[dep] for dep in stage.depends_on), default=0.0)
+            ends[stage.name] = start + self.shares.get(stage.name, default_share)
+        critical_path = max(ends.values(), default=1.0)
+        return {name: self.slo_seconds * end / critical_path for name, end in ends.items()}
+
+
+class StageDeadline:
+    """Tracks one running stage against its deadline and tool-call allowance."""
+
+    def __init__(self, policy: DeadlinePolicy, deadline: Optional[float], started: Optional[float] = None):
+        """
+        Args:
+            policy: Provides the finalize point and the tool-call limit.
+            deadline: `time.monotonic()` value by which the stage must finish; None leaves it unbounded.
+            started: When the stage started; defaults to now.
+        """
+        self.policy = policy
+        self.started = time.monotonic() if started is None else started
+        self.deadline = deadline
+        self.finalize_after = (None if deadline is None
+                               else self.started + (deadline - self.started) * policy.finalize_at)
+        self.tool_calls = 0
+        self.tool_calls_refused = 0
+        self.forced_finalize = False
+        self.missed = False
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None if the stage has none."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def should_finalize(self) -> bool:
+        """Whether the stage's agent must stop working and answer with what it has."""
+        if self.missed or (self.finalize_after is not None and time.monotonic() >= self.finalize_after):
+            with self._lock:
+                self.forced_finalize = True
+            return True
+        return False
+
+    def refuse_tool_call(self) -> bool:
+        """Whether any tool call must be refused because the stage has to finalize; counts the refusal."""
+        if self.should_finalize():
+            with self._lock:
+                self.tool_calls_refused += 1
+            return True
+        return False
+
+    def allow_tool_call(self) -> bool:
+        """Count a web search, refusing it once the stage must finalize or has used its allowance."""
+        if self.refuse_tool_call():
+            return False
+        with self._lock:
+            limit = self.policy.max_tool_calls
+            if limit is not None and self.tool_calls >= limit:
+                self.tool_calls_refused += 1
+                return False
+            self.tool_calls += 1
+            return True
+
+    def miss(self) -> None:
+        """Mark the stage as abandoned: its tool calls are refused and its next LLM call raises StageCancelledError."""
+        self.missed = True
+
+    def check_cancelled(self) -> None:
+        """Raise StageCancelledError if the stage has been abandoned."""
+        if self.missed:
+            raise StageCancelledError("The stage missed its deadline and was abandoned")
+
+    @property
+    def hit(self) -> Optional[str]:
+        """"missed" if the stage was abandoned, "finalize" if it was made to answer early, else None."""
+        if self.missed:
+            return "missed"
+        return "finalize" if self.forced_finalize else None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the stage's time allowance, whether and how its deadline was hit, and refused tool calls."""
+        metrics: Dict[str, Any] = {"deadline_hit": self.hit, "tool_calls_refused": self.tool_calls_refused}
+        if self.deadline is not None:
+            metrics["deadline_seconds"] = round(self.deadline - self.started, 1)
+        return metrics
+
+
+def deadline_summary(results: Dict[str, Any]) -> Dict[str, Tuple[str, ...]]:
+    """Group the stages of a finished plan by the kind of deadline hit they had ("finalize" or "missed")."""
+    summary: Dict[str, Tuple[str, ...]] = {}
+    for name, result in results.items():
+        hit = result.metrics.get("deadline_hit")
+        if hit:
+            summary[hit] = summary.get(hit, ()) + (name,)
+    return summary
+
+
+# Deadline of the stage running on the current thread, if any
+current_deadline: ContextVar[Optional[StageDeadline]] = ContextVar("current_deadline", default=None)
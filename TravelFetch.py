@@ -0,0 +1,280 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from TravelCache import PageCache, get_page_cache
+from TravelTracing import tracer
+
+# Elements whose text is page chrome or code rather than content
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form",
+                "button", "iframe", "select"}
+# Elements that end a block of text
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th", "br",
+              "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt"}
+# Blocks shorter than this are usually menus, bylines or buttons
+MIN_BLOCK_CHARS = 40
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"the", "a", "an", "and", "or", "of", "in", "on", "for", "to", "with", "at", "by", "is", "are",
+              "what", "how", "best", "top"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks: List[str] = []
+        self._current: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._current.append(data)
+
+    def _flush(self) -> None:
+        text = re.sub(r"\s+", " ", "".join(self._current)).strip()
+        self._current = []
+        if len(text) >= MIN_BLOCK_CHARS:
+            self.blocks.append(text)
+
+
+def extract_main_text(html: str) -> Tuple[str, str]:
+    """
+    Extract a page's title and main text.
+
+    Navigation, headers, footers, scripts and other chrome are dropped, as are short
+    fragments such as menu items; the remaining blocks are joined with blank lines.
+
+    Args:
+        html: The page's HTML.
+
+    Returns:
+        The title and the main text.
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    parser._flush()
+    return re.sub(r"\s+", " ", parser.title).strip(), "\n\n".join(parser.blocks)
+
+
+def _terms(text: str) -> set:
+    return {word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS}
+
+
+@dataclass
+class Page:
+    """Extracted text of one fetched result page."""
+
+    url: str
+    title: str
+    text: str
+    cached: bool = False
+
+
+class PageFetcher:
+    """Fetches result pages concurrently over a pooled HTTP client and turns them into a compact digest.
+
+    Extracted pages are cached by URL; once a cached page expires it is revalidated with its ETag
+    (or Last-Modified date), so unchanged pages are not downloaded or parsed again.
+    """
+
+    def __init__(self, client: Optional[httpx.Client] = None, cache: Optional[PageCache] = None,
+                 timeout: float = 4.0, max_workers: int = 8, max_bytes: int = 1_000_000,
+                 max_chars_per_page: int = 1500, max_digest_chars: int = 4000):
+        """
+        Args:
+            client: HTTP client for page requests; a pooled client with `timeout` is created if omitted.
+            cache: Page cache; None disables caching.
+            timeout: Seconds allowed per page, covering the whole request; slower pages are left out.
+            max_workers: Pages fetched at the same time.
+            max_bytes: Pages larger than this are truncated before extraction.
+            max_chars_per_page: Most text taken from a single page.
+            max_digest_chars: Length cap of the whole digest.
+        """
+        self.client = client or httpx.Client(
+            limits=httpx.Limits(max_connections=max_workers * 2, max_keepalive_connections=max_workers),
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 2.0)),
+            follow_redirects=True,
+            headers={"User-Agent": "Mozilla/5.0 (compatible; TravelPlanner/1.0)"},
+        )
+        self.cache = cache
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars_per_page = max_chars_per_page
+        self.max_digest_chars = max_digest_chars
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="travel-fetch")
+
+    def fetch(self, url: str, deadline: Optional[float] = None) -> Optional[Page]:
+        """
+        Fetch and extract one page, using the cache where possible.
+
+        Args:
+            url: The page to fetch.
+            deadline: `time.monotonic()` value by which the page must have been read; defaults to
+                `timeout` seconds from now.
+
+        Returns:
+            The page, or None if it could not be fetched in time or is not HTML.
+        """
+        deadline = time.monotonic() + self.timeout if deadline is None else deadline
+        if time.monotonic() >= deadline:
+            return None
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None:
+            return Page(url, cached["title"], cached["text"], cached=True)
+
+        stale = self.cache.get(url, allow_expired=True) if self.cache is not None else None
+        headers = {}
+        if stale is not None:
+            if stale.get("etag"):
+                headers["If-None-Match"] = stale["etag"]
+            if stale.get("last_modified"):
+                headers["If-Modified-Since"] = stale["last_modified"]
+
+        with tracer.span("fetch", "page", url=url) as span:
+            try:
+                # httpx applies its timeout to each network operation; the loop below bounds the whole page
+                with self.client.stream("GET", url, headers=headers,
+                                        timeout=max(deadline - time.monotonic(), 0.01)) as response:
+                    if response.status_code == 304 and stale is not None:
+                        if span is not None:
+                            span.attributes["revalidated"] = True
+                        self.cache.set(url, stale)
+                        return Page(url, stale["title"], stale["text"], cached=True)
+                    content_type = response.headers.get("content-type", "")
+                    if response.status_code != 200 or "html" not in content_type:
+                        return None
+                    body = b""
+                    for chunk in response.iter_bytes():
+                        if time.monotonic() >= deadline:
+                            if span is not None:
+                                span.error = "deadline exceeded"
+                            return None
+                        body += chunk
+                        if len(body) >= self.max_bytes:
+                            break
+                    encoding = response.encoding or "utf-8"
+                    etag = response.headers.get("etag")
+                    last_modified = response.headers.get("last-modified")
+            except (httpx.HTTPError, UnicodeError) as e:
+                if span is not None:
+                    span.error = str(e)
+                return None
+
+        title, text = extract_main_text(body[:self.max_bytes].decode(encoding, errors="replace"))
+        if self.cache is not None and text:
+            self.cache.set(url, {"title": title, "text": text, "etag": etag, "last_modified": last_modified})
+        return Page(url, title, text)
+
+    def fetch_many(self, urls: List[str]) -> List[Page]:
+        """
+        Fetch pages concurrently; pages that fail or miss the per-page deadline are left out.
+
+        Returns:
+            The fetched pages, in the order of `urls`.
+        """
+        # Pages are fetched in parallel against one shared deadline, which bounds the whole batch
+        deadline = time.monotonic() + self.timeout
+        futures = [self._executor.submit(self.fetch, url, deadline) for url in urls]
+        done, not_done = wait(futures, timeout=self.timeout + 0.5)
+        for future in not_done:
+            # Fetches still queued behind other plans' pages are dropped instead of running for nobody
+            future.cancel()
+        return [future.result() for future in futures
+                if future in done and future.exception() is None and future.result() is not None]
+
+    def digest(self, query: str, results: List[Dict[str, Any]]) -> str:
+        """
+        Fetch the pages behind search results and summarize the passages most relevant to the query.
+
+        Passages are ranked by how many query terms they contain, with earlier search results and
+        earlier passages preferred on ties; each page contributes at most `max_chars_per_page`
+        characters and the digest at most `max_digest_chars`.
+
+        Args:
+            query: The search query.
+            results: Search result dicts with an "href".
+
+        Returns:
+            The digest, or an empty string if no page could be read.
+        """
+        urls = [result["href"] for result in results if str(result.get("href", "")).startswith(("http://", "https://"))]
+        pages = self.fetch_many(urls)
+        query_terms = _terms(query)
+        scored = []
+        for rank, page in enumerate(pages):
+            for position, passage in enumerate(page.text.split("\n\n")):
+                overlap = len(query_terms & _terms(passage))
+                scored.append((-overlap, rank, position, page, passage))
+        scored.sort(key=lambda item: item[:3])
+
+        used: Dict[str, int] = {}
+        selected: Dict[str, List[Tuple[int, str]]] = {}
+        total = 0
+        for _, _, position, page, passage in scored:
+            room = min(self.max_chars_per_page - used.get(page.url, 0), self.max_digest_chars - total)
+            if room <= 0:
+                continue
+            passage = passage if len(passage) <= room else passage[:room].rsplit(" ", 1)[0] + "..."
+            selected.setdefault(page.url, []).append((position, passage))
+            used[page.url] = used.get(page.url, 0) + len(passage)
+            total += len(passage)
+            if total >= self.max_digest_chars:
+                break
+
+        sections = []
+        for page in pages:
+            if page.url in selected:
+                # Keep each page's passages in reading order
+                passages = [passage for _, passage in sorted(selected[page.url])]
+                sections.append(f"Source: {page.title or page.url}\n   Link: {page.url}\n   " + "\n   ".join(passages))
+        return "\n\n".join(sections)
+
+
+_page_fetcher: Optional[PageFetcher] = None
+_page_fetcher_lock = threading.Lock()
+
+
+def get_page_fetcher() -> PageFetcher:
+    """
+    Return the process-wide page fetcher, creating it on first use.
+
+    The per-page timeout and digest length can be tuned with TRAVEL_FETCH_TIMEOUT and
+    TRAVEL_FETCH_DIGEST_CHARS, and the page cache turned off with TRAVEL_SEARCH_CACHE=off.
+    """
+    global _page_fetcher
+    with _page_fetcher_lock:
+        if _page_fetcher is None:
+            use_cache = os.getenv("TRAVEL_SEARCH_CACHE", "on").lower() not in ("0", "off", "false")
+            _page_fetcher = PageFetcher(
+                cache=get_page_cache() if use_cache else None,
+                timeout=float(os.getenv("TRAVEL_FETCH_TIMEOUT", 4.0)),
+                max_digest_chars=int(os.getenv("TRAVEL_FETCH_DIGEST_CHARS", 4000)),
+            )
+        return _page_fetcher
@@ -0,0 +1,154 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import litellm
+
+# Which upstream sections each downstream stage needs, matched against section headings.
+# An empty keyword tuple keeps every section and only applies the token cap.
+HANDOFF_PROFILES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "itinerary": {
+        "research": ("transport", "getting there", "getting around", "flight", "weather", "climate", "season"),
+    },
+    "recommendations": {
+        "research": ("attraction", "points of interest", "sight", "culture", "custom", "etiquette", "cuisine", "food"),
+    },
+    "budget": {
+        "itinerary": (),
+    },
+    # Comparing destinations only needs how to get to each one
+    "comparison": {
+        "research": ("transport", "getting there", "flight", "visa", "entry"),
+    },
+}
+
+DEFAULT_STAGE_BUDGETS: Dict[str, int] = {
+    "itinerary": 1200,
+    "recommendations": 1200,
+    "budget": 2500,
+    "comparison": 300,
+}
+
+# Section headings: Markdown headings and the numbered headings of the research report template.
+# A bold line without a number, e.g. "**Trains:**", is a sub-heading and stays in its section.
+_HEADING = re.compile(
+    r"^(?:\s*#{1,6}\s+(?P<md>.+?)\s*#*"                 # ## Markdown heading
+    r"|\d+\.\s*\*\*(?P<numbered>[^*]+?)\*\*:?"          # 1. **Numbered heading:**
+    r"|\*\*\d+\.\s*(?P<bold_numbered>[^*]+?)\*\*:?"     # **1. Numbered heading**
+    r")\s*$"
+)
+
+
+@dataclass
+class HandoffResult:
+    """Compacted upstream context for one downstream stage."""
+
+    text: str
+    tokens_before: int
+    tokens_after: int
+    sections: List[str]
+
+
+def split_sections(report: str) -> List[Tuple[str, str]]:
+    """
+    Split a report into (heading, text) sections on Markdown or numbered headings.
+
+    Args:
+        report: The upstream stage output.
+
+    Returns:
+        Sections in document order; text before the first heading has an empty heading.
+    """
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    for line in report.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            heading = match.group("md") or match.group("numbered") or match.group("bold_numbered")
+            sections.append((heading.strip(), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(heading, "\n".join(lines).strip()) for heading, lines in sections if "\n".join(lines).strip()]
+
+
+class ContextBudget:
+    """Selects and caps the upstream context handed to each downstream stage."""
+
+    def __init__(self, model_name: str = "gpt-4o-mini", stage_budgets: Optional[Dict[str, int]] = None,
+                 profiles: Optional[Dict[str, Dict[str, Tuple[str, ...]]]] = None):
+        """
+        Args:
+            model_name: Model whose tokenizer is used for counting.
+            stage_budgets: Maximum handoff tokens per downstream stage.
+            profiles: Relevant section keywords per downstream stage and upstream input.
+        """
+        self.model_name = model_name
+        self.stage_budgets = dict(DEFAULT_STAGE_BUDGETS)
+        if os.getenv("TRAVEL_HANDOFF_TOKENS"):
+            self.stage_budgets = {stage: int(os.environ["TRAVEL_HANDOFF_TOKENS"]) for stage in self.stage_budgets}
+        self.stage_budgets.update(stage_budgets or {})
+        self.profiles = profiles if profiles is not None else HANDOFF_PROFILES
+
+    def count_tokens(self, text: str) -> int:
+        return len(litellm.encode(model=self.model_name, text=text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = litellm.encode(model=self.model_name, text=text)
+        if len(tokens) <= max_tokens:
+            return text
+        return litellm.decode(model=self.model_name, tokens=tokens[:max_tokens]).rstrip() + "\n[...truncated]"
+
+    def compact(self, stage: str, source: str, text: str) -> HandoffResult:
+        """
+        Keep only the sections of `text` that `stage` needs, within its token budget.
+
+        Args:
+            stage: The downstream stage name.
+            source: The upstream stage that produced `text`.
+            text: The upstream output.
+
+        Returns:
+            The compacted context with token counts before and after.
+        """
+        tokens_before = self.count_tokens(text)
+        keywords = self.profiles.get(stage, {}).get(source)
+        budget = self.stage_budgets.get(stage)
+        if keywords is None or budget is None:
+            return HandoffResult(text, tokens_before, tokens_before, [])
+
+        sections = split_sections(text)
+        if keywords:
+            selected = [(heading, body) for heading, body in sections
+                        if any(keyword in heading.lower() for keyword in keywords)]
+            # Unstructured output has no usable headings; fall back to capping the whole text
+            if not selected:
+                selected = sections
+        else:
+            selected = sections
+
+        parts: List[str] = []
+        kept: List[str] = []
+        remaining = budget
+        for heading, body in selected:
+            if remaining <= 0:
+                break
+            body_tokens = self.count_tokens(body)
+            parts.append(body if body_tokens <= remaining else self.truncate(body, remaining))
+            kept.append(heading)
+            remaining -= body_tokens
+        compacted = "\n\n".join(parts)
+        return HandoffResult(compacted, tokens_before, self.count_tokens(compacted), kept)
+
+    def compact_inputs(self, stage: str, outputs: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, HandoffResult]]:
+        """
+        Compact every upstream output a stage consumes.
+
+        Args:
+            stage: The downstream stage name.
+            outputs: Upstream outputs keyed by stage name.
+
+        Returns:
+            The compacted outputs and the per-input handoff results.
+        """
+        results = {source: self.compact(stage, source, text) for source, text in outputs.items()}
+        return {source: result.text for source, result in results.items()}, results
@@ -0,0 +1,290 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from TravelCache import DEFAULT_CACHE_DIR, normalize_query
+from TravelTracing import tracer
+
+# Words that do not change what a search returns
+QUERY_STOPWORDS = frozenset(("a", "an", "the", "in", "on", "at", "of", "for", "from", "and", "or", "with",
+                             "is", "are", "what", "which", "best", "top"))
+# Query words shorter than this ("to", "do", "go") say little on their own and are not matched
+MIN_TERM_LENGTH = 3
+
+
+def query_terms(query: str) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    Split a search query into the words a relevant result must contain.
+
+    Args:
+        query: The search query.
+
+    Returns:
+        The query's distinct content words in order, and its routes as (origin, destination)
+        pairs, e.g. ("tokyo", "kyoto") for "tokyo to kyoto train".
+    """
+    words = re.findall(r"\w+", normalize_query(query))
+    terms = list(dict.fromkeys(word for word in words
+                               if len(word) >= MIN_TERM_LENGTH and word not in QUERY_STOPWORDS))
+    routes = [(words[i - 1], words[i + 1]) for i in range(1, len(words) - 1)
+              if words[i] == "to" and words[i - 1] in terms and words[i + 1] in terms]
+    return terms, routes
+
+
+def _covers(term: str, word: str) -> bool:
+    # A cheap stand-in for the index's stemming: "museums" is covered by "museum"; shorter
+    # words only match themselves, so "art" is not covered by "artisan"
+    if len(term) < 5:
+        return word == term
+    return word.startswith(term[:max(4, len(term) - 2)])
+
+
+class SearchIndex:
+    """Local full-text index of every web search result the planner has seen.
+
+    Each result's title, link and snippet are stored with the time it was retrieved and indexed
+    with SQLite FTS5, so later plans can answer a search from the index (ranked by BM25) instead
+    of going to the web. A lookup only counts as a hit when enough fresh results contain every
+    content word of the query, with routes in the query's direction; otherwise the caller searches
+    the web and adds what it finds.
+    """
+
+    def __init__(self, path: str, max_age: float = 30 * 24 * 3600, max_documents: int = 50000,
+                 min_results: int = 3, min_coverage: float = 1.0):
+        """
+        Open (or create) an index.
+
+        Args:
+            path: Location of the SQLite database file.
+            max_age: Seconds a result is used after it was retrieved; older results are ignored and pruned.
+            max_documents: Maximum number of results kept; the oldest are removed first.
+            min_results: Relevant results a lookup needs to be answered locally.
+            min_coverage: Share of the query's content words a result must contain to be relevant.
+        """
+        self.path = path
+        self.max_age = max_age
+        self.max_documents = max_documents
+        self.min_results = min_results
+        self.min_coverage = min_coverage
+        self.hits = 0
+        self.misses = 0
+        # Seconds taken by recent lookups, for the latency percentiles
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                url TEXT UNIQUE NOT NULL,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                query TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_fetched_at ON documents (fetched_at)")
+        # The FTS table holds only the index; the text itself is read from `documents`
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            "title, body, content='documents', content_rowid='id', tokenize='porter unicode61')"
+        )
+        self._conn.executescript(
+            """CREATE TRIGGER IF NOT EXISTS documents_insert AFTER INSERT ON documents BEGIN
+                INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_delete AFTER DELETE ON documents BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, title, body)
+                VALUES ('delete', old.id, old.title, old.body);
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_update AFTER UPDATE ON documents BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, title, body)
+                VALUES ('delete', old.id, old.title, old.body);
+                INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+            END;"""
+        )
+        with self._lock:
+            self._prune()
+
+    def add(self, query: str, results: List[Dict[str, Any]]) -> int:
+        """
+        Index the results of a web search, replacing earlier copies of the same links.
+
+        Args:
+            query: The search the results were returned for.
+            results: Raw result dicts with "title", "href" and "body".
+
+        Returns:
+            The number of results indexed.
+        """
+        now = time.time()
+        rows = [(result["href"], result.get("title") or "", result.get("body") or "", query, now)
+                for result in results if isinstance(result, dict) and result.get("href") and "error" not in result]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO documents (url, title, body, query, fetched_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (url) DO UPDATE SET title = excluded.title, body = excluded.body, "
+                    "query = excluded.query, fetched_at = excluded.fetched_at",
+                    rows,
+                )
+                self._prune()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return the fresh indexed results most relevant to a query, best first.
+
+        Args:
+            query: The search query.
+            limit: Maximum number of results.
+
+        Returns:
+            Result dicts in the web search format ("title", "href", "body") plus "fetched_at" and
+            "coverage", the share of the query's content words the result contains; only results
+            reaching `min_coverage` that name the query's routes in the same direction are returned.
+        """
+        terms, routes = query_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.url, d.title, d.body, d.fetched_at FROM documents_fts "
+                "JOIN documents d ON d.id = documents_fts.rowid "
+                # Title matches weigh more than snippet matches
+                "WHERE documents_fts MATCH ? AND d.fetched_at >= ? "
+                "ORDER BY bm25(documents_fts, 4.0, 1.0) LIMIT ?",
+                (match, time.time() - self.max_age, limit * 4),
+            ).fetchall()
+        results = []
+        for url, title, body, fetched_at in rows:
+            words = re.findall(r"\w+", f"{title} {body}".lower())
+            positions = {term: [i for i, word in enumerate(words) if _covers(term, word)] for term in terms}
+            coverage = sum(bool(found) for found in positions.values()) / len(terms)
+            # Results that name "kyoto" before "tokyo" do not answer "tokyo to kyoto"
+            forward = all(not (positions[origin] and positions[destination])
+                          or positions[origin][0] < positions[destination][0] for origin, destination in routes)
+            if coverage >= self.min_coverage and forward:
+                results.append({"title": title, "href": url, "body": body, "fetched_at": fetched_at,
+                                "coverage": coverage})
+        return results[:limit]
+
+    def lookup(self, query: str, limit: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """
+        Answer a search from the index if it covers the query well enough.
+
+        Args:
+            query: The search query.
+            limit: Results wanted, as for a web search.
+
+        Returns:
+            The results, or None on a miss (fewer than `min_results` relevant fresh results).
+        """
+        started = time.perf_counter()
+        results = self.search(query, limit)
+        hit = len(results) >= min(self.min_results, limit)
+        with self._lock:
+            self.latencies.append(time.perf_counter() - started)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        tracer.count("travel_search_index_lookups_total", result="hit" if hit else "miss")
+        return results if hit else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        """Size of the index database, including its write-ahead log."""
+        return sum(os.path.getsize(path) for path in (self.path, f"{self.path}-wal") if os.path.exists(path))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the index size, local hit rate and lookup latency.
+
+        Returns:
+            Document count and file size, hit/miss counters and hit rate, and the mean and p95
+            latency of the last 1000 lookups.
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "documents": len(self),
+            "size_bytes": self.size_bytes(),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "latency_mean_s": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95_s": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+        }
+
+    def gauges(self) -> Dict[str, float]:
+        """The index's stats as Prometheus gauge values."""
+        stats = self.stats()
+        return {
+            "travel_search_index_documents": stats["documents"],
+            "travel_search_index_bytes": stats["size_bytes"],
+            "travel_search_index_hit_rate": stats["hit_rate"],
+            "travel_search_index_lookup_p95_seconds": stats["latency_p95_s"],
+        }
+
+    def clear(self) -> None:
+        """Remove every document and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self.hits = self.misses = 0
+            self.latencies.clear()
+
+    def _prune(self) -> None:
+        # Stale results go first, then the oldest until the index is back under its size limit
+        self._conn.execute("DELETE FROM documents WHERE fetched_at < ?", (time.time() - self.max_age,))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] - self.max_documents
+        if overflow > 0:
+            self._conn.execute("DELETE FROM documents WHERE id IN "
+                               "(SELECT id FROM documents ORDER BY fetched_at ASC LIMIT ?)", (overflow,))
+
+
+_search_index: Optional[SearchIndex] = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """
+    Return the process-wide search index, creating it on first use.
+
+    The file, freshness window and size can be set with TRAVEL_SEARCH_INDEX_DB,
+    TRAVEL_SEARCH_INDEX_MAX_AGE and TRAVEL_SEARCH_INDEX_MAX_DOCUMENTS, and what counts as a
+    local hit with TRAVEL_SEARCH_INDEX_MIN_RESULTS and TRAVEL_SEARCH_INDEX_MIN_COVERAGE.
+    """
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex(
+                os.getenv("TRAVEL_SEARCH_INDEX_DB", os.path.join(DEFAULT_CACHE_DIR, "search_index.sqlite")),
+                max_age=float(os.getenv("TRAVEL_SEARCH_INDEX_MAX_AGE", 30 * 24 * 3600)),
+                max_documents=int(os.getenv("TRAVEL_SEARCH_INDEX_MAX_DOCUMENTS", 50000)),
+                min_results=int(os.getenv("TRAVEL_SEARCH_INDEX_MIN_RESULTS", 3)),
+                min_coverage=float(os.getenv("TRAVEL_SEARCH_INDEX_MIN_COVERAGE", 1.0)),
+            )
+            tracer.add_gauges(_search_index.gauges)
+        return _search_index
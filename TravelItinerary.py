@@ -0,0 +1,93 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+COST_CATEGORIES = ("transport", "accommodation", "activity", "meal", "other")
+
+
+class ItineraryItem(BaseModel):
+    """One activity, meal, transfer or stay in the itinerary."""
+
+    category: Literal["transport", "accommodation", "activity", "meal", "other"] = Field(
+        description="What kind of item this is")
+    time_of_day: Literal["morning", "afternoon", "evening", "night", "all day"] = Field(
+        default="all day", description="When in the day it happens")
+    name: str = Field(description="Short name, e.g. 'Senso-ji Temple' or 'Shinkansen to Kyoto'")
+    details: str = Field(default="", description="One or two sentences of practical detail")
+    estimated_cost: float = Field(default=0.0, ge=0, description="Estimated cost per traveler in the trip currency")
+
+
+class ItineraryDay(BaseModel):
+    """A single day of the trip."""
+
+    day: int = Field(ge=1, description="Day number, starting at 1")
+    title: str = Field(description="Theme of the day, e.g. 'Arrival and Shinjuku'")
+    items: List[ItineraryItem] = Field(description="The day's transport, accommodation, activities and meals in order")
+
+
+class Itinerary(BaseModel):
+    """Day-by-day itinerary with per-item cost estimates."""
+
+    destination: str
+    currency: str = Field(default="USD", description="ISO currency code of every estimated_cost")
+    overview: str = Field(default="", description="A short paragraph summarizing the trip")
+    days: List[ItineraryDay]
+    notes: Optional[str] = Field(default=None, description="Practical notes that apply to the whole trip")
+
+    def to_markdown(self) -> str:
+        """Render the itinerary as the Markdown shown in the app and downloads."""
+        lines = [f"# {self.destination} - {len(self.days)} Day Itinerary", ""]
+        if self.overview:
+            lines += [self.overview, ""]
+        for day in sorted(self.days, key=lambda day: day.day):
+            lines.append(f"## Day {day.day}: {day.title}")
+            for item in day.items:
+                cost = f" (~{item.estimated_cost:,.0f} {self.currency})" if item.estimated_cost else ""
+                details = f": {item.details}" if item.details else ""
+                lines.append(f"- **{item.time_of_day.title()}** - {item.name}{cost}{details}")
+            lines.append("")
+        if self.notes:
+            lines += ["## Notes", self.notes, ""]
+        return "\n".join(lines).rstrip() + "\n"
+
+
+class OutlineDay(BaseModel):
+    """Where a day is spent and what it is about, decided before the day is planned in detail."""
+
+    day: int = Field(ge=1, description="Day number, starting at 1")
+    region: str = Field(description="City, district or area the day is spent in")
+    theme: str = Field(description="Theme of the day, e.g. 'Temples and old town'")
+    highlights: List[str] = Field(default_factory=list,
+                                  description="The main attractions of the day; no attraction appears on two days")
+
+
+class ItineraryOutline(BaseModel):
+    """One line per day for the whole trip, used to plan blocks of days independently."""
+
+    days: List[OutlineDay]
+
+    def to_text(self) -> str:
+        return "\n".join(
+            f"Day {day.day}: {day.region} - {day.theme}"
+            + (f" (highlights: {', '.join(day.highlights)})" if day.highlights else "")
+            for day in sorted(self.days, key=lambda day: day.day)
+        )
+
+
+class DestinationSummary(BaseModel):
+    """One destination's row in a comparison of candidate destinations."""
+
+    destination: str
+    travel_time: str = Field(description="Typical travel time from the starting point, e.g. '14 h by air, one stop'")
+    highlights: List[str] = Field(default_factory=list,
+                                  description="The three most distinctive experiences in the destination's plan")
+    best_for: str = Field(default="", description="The kind of traveler or interest the destination suits best")
+    drawbacks: str = Field(default="", description="The main downside compared with the other destinations")
+
+
+class DestinationComparison(BaseModel):
+    """Side-by-side comparison of several planned destinations; costs are added locally."""
+
+    destinations: List[DestinationSummary]
+    recommendation: str = Field(default="",
+                                description="Which destination suits the traveler best and why, in two sentences")
@@ -0,0 +1,298 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from TravelArtifacts import get_artifact_store, new_run_id
+from TravelCache import DEFAULT_CACHE_DIR
+from TravelTracing import tracer
+
+# Job states; "done" and "error" are final
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+
+@dataclass
+class Job:
+    """A queued or finished plan, as read back from the job queue."""
+
+    id: str
+    # The trip spec it was submitted with (TripSpec.from_dict fields plus "routing", "stream" and,
+    # to compare several destinations, "destinations"; "own_api_key" marks jobs submitted with the user's key)
+    spec: Dict[str, Any]
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    # Finished stages as StageResult.to_dict() records, keyed by stage name; when comparing destinations,
+    # by "<destination>/<stage>" plus "comparison"
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Text streamed so far by stages that are still running (only while the job runs)
+    streamed: Dict[str, str] = field(default_factory=dict)
+    # Jobs ahead of this one in the queue, while it is queued
+    position: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, ERROR)
+
+    def stage_results(self) -> Dict[str, Any]:
+        """Rebuild the finished stages as StageResults whose artifacts point at the job's stored outputs."""
+        from TravelPipeline import StageResult
+        store = get_artifact_store()
+        return {name: StageResult.from_dict(name.rpartition("/")[2], record, store=store,
+                                            run_id=record.get("run_id", self.id))
+                for name, record in self.stages.items()}
+
+
+class JobQueue:
+    """SQLite-backed queue of plans, executed by a pool of background worker threads.
+
+    Plans outlive the Streamlit session that submitted them: the session only keeps the job ID,
+    and any later session can read the job's progress and results back from the database.
+    One server process owns the queue file; jobs it was running when it stopped are re-queued
+    when it starts again.
+    """
+
+    def __init__(self, path: str, workers: int = 2, max_age: float = 7 * 24 * 3600):
+        """
+        Args:
+            path: Location of the SQLite database file.
+            workers: Plans run concurrently.
+            max_age: Finished jobs older than this many seconds are deleted on startup.
+        """
+        self.path = path
+        self.workers = workers
+        self.max_age = max_age
+        self.started = time.time()
+        self.busy_seconds = 0.0
+        # Start time of each job a worker is running
+        self._running: Dict[str, float] = {}
+        self._streams: Dict[str, Dict[str, str]] = {}
+        # API key each job was submitted with; only ever kept in memory, never written to the database
+        self._api_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                spec TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS job_stages (
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, stage)
+            )"""
+        )
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING))
+            self._conn.execute("DELETE FROM job_stages WHERE job_id IN (SELECT id FROM jobs WHERE status = ?)",
+                               (QUEUED,))
+            self._prune()
+
+        for number in range(workers):
+            threading.Thread(target=self._work, name=f"travel-job-{number}", daemon=True).start()
+
+    def submit(self, spec: Dict[str, Any], api_key: Optional[str] = None) -> str:
+        """
+        Queue a plan.
+
+        Args:
+            spec: The trip in TripSpec.from_dict form; `"routing": "tiered"` selects tiered model
+                routing, `"stream": True` keeps the text of running stages for `get`, and a
+                `"destinations"` list plans and compares each of them instead of `"destination"`.
+            api_key: The submitter's OpenAI API key; without one the job uses the server's OPENAI_API_KEY.
+                The key is not persisted, so a job requeued after a restart that needed one fails.
+
+        Returns:
+            The job ID, which is also the plan's run ID in the artifact store.
+        """
+        job_id = new_run_id()
+        if api_key:
+            spec = {**spec, "own_api_key": True}
+        with self._lock:
+            if api_key:
+                self._api_keys[job_id] = api_key
+            self._conn.execute("INSERT INTO jobs (id, spec, status, created_at) VALUES (?, ?, ?, ?)",
+                               (job_id, json.dumps(spec, default=str), QUEUED, time.time()))
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job with its finished stages and streamed text, or None if it is unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, spec, status, created_at, started_at, finished_at, error FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = Job(row[0], json.loads(row[1]), *row[2:])
+            job.stages = {stage: json.loads(result) for stage, result in self._conn.execute(
+                "SELECT stage, result FROM job_stages WHERE job_id = ?", (job_id,))}
+            job.streamed = dict(self._streams.get(job_id, {}))
+            if job.status == QUEUED:
+                job.position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, job.created_at)
+                ).fetchone()[0]
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report queue depth, wait times and worker utilization, for sizing the worker pool.
+
+        Returns:
+            Queued and running job counts, busy and total workers, the share of worker time spent
+            planning since startup, and the mean and p95 queue wait of the last 100 started jobs.
+        """
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            waits = sorted(row[0] for row in self._conn.execute(
+                "SELECT started_at - created_at FROM jobs WHERE started_at IS NOT NULL "
+                "ORDER BY started_at DESC LIMIT 100"))
+            now = time.time()
+            busy = len(self._running)
+            busy_seconds = self.busy_seconds + sum(now - started for started in self._running.values())
+        capacity = self.workers * (now - self.started)
+        return {
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "workers": self.workers,
+            "busy_workers": busy,
+            "utilization": busy_seconds / capacity if capacity else 0.0,
+            "wait_mean_s": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95_s": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+        }
+
+    def gauges(self) -> Dict[str, float]:
+        """The queue's stats as Prometheus gauge values."""
+        stats = self.stats()
+        return {
+            "travel_job_queue_depth": stats["queued"],
+            "travel_job_workers": stats["workers"],
+            "travel_job_workers_busy": stats["busy_workers"],
+            "travel_job_worker_utilization": stats["utilization"],
+            "travel_job_wait_p95_seconds": stats["wait_p95_s"],
+        }
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.max_age
+        self._conn.execute("DELETE FROM job_stages WHERE job_id IN "
+                           "(SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?)", (cutoff,))
+        self._conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,))
+
+    def _claim(self) -> Dict[str, Any]:
+        # Block until a job is queued, then mark the oldest one as running
+        with self._wakeup:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id, spec, created_at FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    break
+                self._wakeup.wait()
+            now = time.time()
+            self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, now, row[0]))
+            self._running[row[0]] = now
+        tracer.count("travel_job_wait_seconds_total", now - row[2])
+        return {"id": row[0], "spec": json.loads(row[1])}
+
+    def _work(self) -> None:
+        while True:
+            job = self._claim()
+            status, error = DONE, None
+            try:
+                self._execute(job["id"], job["spec"])
+            except Exception as e:
+                status, error = ERROR, str(e)
+            finished_at = time.time()
+            with self._lock:
+                self._conn.execute("UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                                   (status, finished_at, error, job["id"]))
+                self._streams.pop(job["id"], None)
+                self._api_keys.pop(job["id"], None)
+                self.busy_seconds += finished_at - self._running.pop(job["id"])
+            tracer.count("travel_jobs_total", status=status)
+
+    def _execute(self, job_id: str, spec: Dict[str, Any]) -> None:
+        with self._lock:
+            api_key = self._api_keys.get(job_id)
+        if spec.get("own_api_key") and api_key is None:
+            raise RuntimeError("The API key this plan was submitted with was lost when the server restarted. "
+                               "Please submit the plan again.")
+
+        # The planner (and crewai) is only imported once the first job runs, keeping app startup fast
+        from TravelAgents import TravelAgents
+        from TravelCompare import compare_destinations
+        from TravelPipeline import PlanningPipeline, TripSpec
+        from TravelRouting import RoutingPolicy
+
+        trip = TripSpec.from_dict(spec)
+        routing = RoutingPolicy.tiered(trip.model_name) if spec.get("routing") == "tiered" else None
+        streams = self._streams.setdefault(job_id, {}) if spec.get("stream") else None
+
+        def record(name, result):
+            stored = result.to_dict()
+            if result.artifact is not None and result.artifact.run_id != job_id:
+                stored["run_id"] = result.artifact.run_id
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO job_stages (job_id, stage, result) VALUES (?, ?, ?)",
+                                   (job_id, name, json.dumps(stored, default=str)))
+                if streams is not None:
+                    streams.pop(name, None)
+
+        def stream(name, event):
+            if event.kind == "token":
+                with self._lock:
+                    streams[name] = streams.get(name, "") + event.text
+
+        if spec.get("destinations"):
+            compare_destinations(
+                trip, spec["destinations"], routing=routing,
+                on_stage_complete=lambda destination, stage, result: record(
+                    stage.name if stage.name == "comparison" else f"{destination}/{stage.name}", result),
+                on_event=((lambda destination, event: stream(f"{destination}/{event.stage}", event))
+                          if streams is not None else None),
+                run_id=job_id, api_key=api_key)
+            return
+
+        pipeline = PlanningPipeline(TravelAgents(model_name=trip.model_name, routing=routing, api_key=api_key))
+        pipeline.run(trip, on_stage_complete=lambda stage, result, completed, total: record(stage.name, result),
+                     on_event=(lambda event: stream(event.stage, event)) if streams is not None else None,
+                     run_id=job_id)
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, starting its workers on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                os.getenv("TRAVEL_JOB_DB", os.path.join(DEFAULT_CACHE_DIR, "jobs.sqlite")),
+                workers=int(os.getenv("TRAVEL_JOB_WORKERS", 2)),
+                max_age=float(os.getenv("TRAVEL_JOB_MAX_AGE", 7 * 24 * 3600)),
+            )
+            tracer.add_gauges(_job_queue.gauges)
+        return _job_queue
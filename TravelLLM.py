@@ -0,0 +1,203 @@
+import hashlib
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import httpx
+import litellm
+from crewai import LLM
+from crewai.utilities.events import LLMStreamChunkEvent, crewai_event_bus
+from litellm.integrations.custom_logger import CustomLogger
+from TravelCache import LLM_SAMPLING_PARAMS, LLMResponseCache
+from TravelDeadline import FINALIZE_PROMPT, current_deadline
+from TravelRateLimit import provider_for_model, throttle_provider
+from TravelRouting import current_budget
+from TravelStreaming import current_sink
+from TravelTracing import Span, tracer
+
+
+class CachedLLM(LLM):
+    """CrewAI LLM that serves repeated completions from an LLMResponseCache."""
+
+    def __init__(self, model: str, cache: Optional[LLMResponseCache] = None, **kwargs):
+        """
+        Args:
+            model: The model name (e.g., "gpt-4o-mini").
+            cache: Response cache to consult; None disables caching.
+            **kwargs: Passed through to crewai.LLM.
+        """
+        # Completions are always streamed; the tokens are only forwarded when a stage is listening
+        kwargs.setdefault("stream", True)
+        super().__init__(model=model, **kwargs)
+        self.cache = cache
+
+    def sampling_params(self) -> Dict[str, Any]:
+        params = {name: getattr(self, name, None) for name in LLM_SAMPLING_PARAMS}
+        if self.response_format is not None:
+            params["response_format"] = getattr(self.response_format, "__name__", str(self.response_format))
+        return params
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+    ) -> Union[str, Any]:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        deadline = current_deadline.get()
+        if deadline is not None:
+            # The plan went ahead without an abandoned stage; its agent must not keep calling the model
+            deadline.check_cancelled()
+        if deadline is not None and deadline.should_finalize():
+            # The stage is close to its deadline: make the agent answer with what it has gathered
+            messages = messages + [{"role": "user", "content": FINALIZE_PROMPT}]
+        budget = current_budget.get()
+        if budget is not None:
+            # The stage's budget may send this call to a faster model than the agent was built with
+            model = budget.route(self.model, lambda: self._count_tokens(messages=messages))
+            if model != self.model:
+                return get_llm(model, api_key=self.api_key, cache=self.cache).call_model(
+                    messages, tools, callbacks, available_functions)
+        return self.call_model(messages, tools, callbacks, available_functions)
+
+    def call_model(
+        self,
+        messages: List[Dict[str, str]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+    ) -> Union[str, Any]:
+        """Call this client's own model, bypassing budget routing."""
+        budget = current_budget.get()
+        with tracer.span("llm", self.model, llm_calls=1) as span:
+            response = self._call(messages, tools, callbacks, available_functions, span)
+            tokens = None
+            if span is not None or (budget is not None and budget.counts_tokens):
+                tokens = (self._count_tokens(messages=messages),
+                          self._count_tokens(text=response) if isinstance(response, str) else 0)
+            if span is not None:
+                span.attributes["tokens_in"], span.attributes["tokens_out"] = tokens
+            if budget is not None:
+                budget.record(self.model, sum(tokens) if tokens else 0)
+            return response
+
+    def _call(self, messages: List[Dict[str, str]], tools: Optional[List[dict]], callbacks: Optional[List[Any]],
+              available_functions: Optional[Dict[str, Any]], span: Optional[Span]) -> Union[str, Any]:
+        # Function-calling responses execute tools, so only plain completions are cached
+        use_cache = (self.cache is not None and self.cache.is_enabled(self.model)
+                     and not tools and not available_functions)
+        if use_cache:
+            key = self.cache.make_key(self.model, messages, self.sampling_params())
+            cached = self.cache.get(key)
+            if span is not None:
+                span.attributes["cache_hit"] = cached is not None
+            if cached is not None:
+                sink = current_sink.get()
+                if sink is not None:
+                    sink.emit("token", cached)
+                return cached
+
+        # Only requests that actually reach the provider count against its rate limit
+        throttle_provider(provider_for_model(self.model))
+        # crewai streams the completion (its chunk events reach the stage's sink through
+        # _forward_stream_chunk) and reports the provider's usage to callbacks once it ends
+        response = super().call(messages, tools, list(callbacks or []) + [_UsageRecorder(span, messages)],
+                                available_functions)
+        if use_cache and isinstance(response, str) and response:
+            self.cache.set(key, response,
+                           tokens=self._count_tokens(messages=messages) + self._count_tokens(text=response))
+        return response
+
+    def _count_tokens(self, messages: Optional[List[Dict[str, str]]] = None, text: Optional[str] = None) -> int:
+        try:
+            return litellm.token_counter(model=self.model, messages=messages, text=text)
+        except Exception:
+            return 0
+
+
+def _field(obj: Any, name: str) -> Any:
+    # litellm reports usage as objects, crewai's streaming path as plain dicts
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+class _UsageRecorder(CustomLogger):
+    """Callback that records the provider-reported usage of one completion on the call's span."""
+
+    def __init__(self, span: Optional[Span], messages: List[Dict[str, str]]):
+        super().__init__()
+        self.span = span
+        self.messages = messages
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        # crewai passes its callbacks to litellm process-wide, so litellm may report another call's usage here
+        if self.span is None or (kwargs or {}).get("messages", self.messages) != self.messages:
+            return
+        # Prompt tokens the provider served from its prompt cache (OpenAI reports them, via litellm, in
+        # prompt_tokens_details); they show whether the shared prompt prefixes are being reused
+        details = _field(_field(response_obj, "usage"), "prompt_tokens_details")
+        if details is not None:
+            self.span.attributes["tokens_cached"] = _field(details, "cached_tokens") or 0
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _forward_stream_chunk(source: Any, event: LLMStreamChunkEvent) -> None:
+    # The event bus calls handlers in the thread making the call, so this is the calling stage's sink
+    sink = current_sink.get()
+    if isinstance(source, CachedLLM) and sink is not None:
+        sink.emit("token", event.chunk)
+
+
+_http_client: Optional[httpx.Client] = None
+_llm_pool: Dict[Tuple[str, str, int], CachedLLM] = {}
+_pool_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Return the process-wide keep-alive HTTP client used for every LLM request.
+
+    The client is installed as litellm's session, so all OpenAI clients litellm creates
+    (one per API key) share a single connection pool and skip repeated TLS handshakes.
+    """
+    global _http_client
+    with _pool_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("TRAVEL_HTTP_MAX_CONNECTIONS", 50)),
+                    max_keepalive_connections=int(os.getenv("TRAVEL_HTTP_MAX_KEEPALIVE", 20)),
+                    keepalive_expiry=float(os.getenv("TRAVEL_HTTP_KEEPALIVE_EXPIRY", 120)),
+                ),
+                timeout=httpx.Timeout(600.0, connect=10.0),
+            )
+            litellm.client_session = _http_client
+        return _http_client
+
+
+def get_llm(model_name: str, api_key: Optional[str] = None,
+            cache: Optional[LLMResponseCache] = None) -> CachedLLM:
+    """
+    Return the pooled LLM client for a model and API key, creating it on first use.
+
+    Clients hold no per-request state, so one instance is shared by every session using
+    the same model and key.
+
+    Args:
+        model_name: The model name.
+        api_key: The provider API key.
+        cache: Response cache for newly created clients.
+
+    Returns:
+        The shared CachedLLM.
+    """
+    get_http_client()
+    key_hash = hashlib.sha256((api_key or "").encode()).hexdigest()
+    pool_key = (model_name, key_hash, id(cache))
+    with _pool_lock:
+        llm = _llm_pool.get(pool_key)
+        if llm is None:
+            llm = CachedLLM(model=model_name, api_key=api_key, cache=cache)
+            _llm_pool[pool_key] = llm
+        return llm
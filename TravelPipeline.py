@@ -0,0 +1,607 @@
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from crewai import Crew, Task
+from TravelAgents import TravelAgents
+from TravelArtifacts import ArtifactRef, ArtifactStore, get_artifact_store, new_run_id
+from TravelBudget import BudgetBreakdown, BudgetEngine
+from TravelChunking import ChunkedItinerary, run_chunked_itinerary
+from TravelDeadline import DeadlinePolicy, StageDeadline, current_deadline
+from TravelTasks import TravelTasks
+from TravelCache import MemoryLRUCache
+from TravelHandoff import ContextBudget
+from TravelItinerary import Itinerary
+from TravelRouting import BudgetTracker, RoutingPolicy, current_budget
+from TravelStreaming import StageEvent, StageEventSink, current_sink, drain_events
+from TravelTracing import tracer, tracing_enabled
+
+
+@dataclass
+class TripSpec:
+    """The trip details entered in the sidebar."""
+
+    starting_point: str
+    destination: str
+    start_date: date
+    end_date: date
+    interests: List[str]
+    budget_level: str = "Moderate"
+    travel_style: str = "Moderate"
+    model_name: str = "gpt-4o-mini"
+
+    @property
+    def duration(self) -> int:
+        return (self.end_date - self.start_date).days
+
+    @property
+    def travel_date_info(self) -> str:
+        return (f"Travel dates: {self.start_date.strftime('%B %d, %Y')} to "
+                f"{self.end_date.strftime('%B %d, %Y')} ({self.duration} days)")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TripSpec":
+        """
+        Build a trip from a JSON-style record.
+
+        Dates may be given as `start_date`/`end_date` or as a two-element `dates` list, in ISO format.
+        The model may be given as `model` or `model_name`.
+        """
+        start_date, end_date = data.get("dates") or (data.get("start_date"), data.get("end_date"))
+        if not start_date or not end_date:
+            raise ValueError("Trip spec needs start and end dates")
+        interests = data.get("interests") or []
+        trip = cls(
+            starting_point=data["starting_point"],
+            destination=data["destination"],
+            start_date=_parse_date(start_date),
+            end_date=_parse_date(end_date),
+            interests=[interests] if isinstance(interests, str) else list(interests),
+            budget_level=data.get("budget_level", "Moderate"),
+            travel_style=data.get("travel_style", "Moderate"),
+            model_name=data.get("model") or data.get("model_name") or "gpt-4o-mini",
+        )
+        if trip.duration < 1:
+            raise ValueError("End date must be after start date.")
+        return trip
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "starting_point": self.starting_point,
+            "destination": self.destination,
+            "dates": [self.start_date.isoformat(), self.end_date.isoformat()],
+            "interests": list(self.interests),
+            "budget_level": self.budget_level,
+            "travel_style": self.travel_style,
+            "model": self.model_name,
+        }
+
+
+def _parse_date(value: Any) -> date:
+    return value if isinstance(value, date) else datetime.strptime(str(value), "%Y-%m-%d").date()
+
+
+@dataclass
+class PlanningStage:
+    """One node of the planning DAG."""
+
+    name: str
+    label: str
+    depends_on: Tuple[str, ...]
+    # Called with the tasks, the trip, and the text and structured data of the upstream stages
+    build_task: Callable[[TravelTasks, TripSpec, Dict[str, str], Dict[str, Any]], Task]
+    error_message: str
+    # TripSpec fields the stage's TravelTasks method consumes; together with the model and the
+    # upstream outputs they determine the stage output, and so key its memoized result
+    inputs: Tuple[str, ...] = ()
+    # TravelAgents role that runs the stage; selects its model in the routing policy
+    role: str = ""
+    # Post-processes the crew's output: called with the trip, upstream data and output text,
+    # returns the final output text and the stage's structured data
+    finalize: Optional[Callable[[TripSpec, Dict[str, Any], str], Tuple[str, Any]]] = None
+    # Plans long trips as an outline plus blocks of days run in parallel; called with the tasks, trip,
+    # upstream outputs and days per block, returns None to fall back to a single generation
+    run_chunked: Optional[Callable[[TravelTasks, TripSpec, Dict[str, str], int], Optional[ChunkedItinerary]]] = None
+
+
+@dataclass
+class StageResult:
+    """Output and timing of a finished stage."""
+
+    name: str
+    output: str
+    started_at: float
+    finished_at: float
+    error: Optional[str] = None
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    reused: bool = False
+    # Handle to the stored copy of the output, set once the run has queued it for storage
+    artifact: Optional[ArtifactRef] = None
+    # Structured form of the output (e.g. the Itinerary or BudgetBreakdown), when the stage produces one
+    data: Any = None
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the result as JSON-style values; structured data is converted to plain dicts."""
+        data = self.data
+        if hasattr(data, "model_dump"):
+            data = data.model_dump()
+        elif hasattr(data, "to_dict"):
+            data = data.to_dict()
+        return {
+            "output": self.output,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "metrics": self.metrics,
+            "reused": self.reused,
+            "data": data,
+        }
+
+    @classmethod
+    def from_dict(cls, name: str, record: Dict[str, Any], store: Optional[ArtifactStore] = None,
+                  run_id: Optional[str] = None) -> "StageResult":
+        """
+        Rebuild a result from `to_dict()` output.
+
+        Args:
+            name: The stage name.
+            record: The stored result.
+            store: Artifact store holding the output under `run_id`, to set `artifact`.
+            run_id: The run the output was stored under.
+
+        Returns:
+            The result; `data` stays in its plain dict form.
+        """
+        artifact = ArtifactRef(store, run_id, name) if store is not None and run_id else None
+        return cls(name, record["output"], record["started_at"], record["finished_at"], error=record.get("error"),
+                   metrics=record.get("metrics") or {}, reused=record.get("reused", False),
+                   artifact=artifact, data=record.get("data"))
+
+
+class StageMemo:
+    """Process-wide memo of successful stage results, keyed on exactly the inputs each stage consumes."""
+
+    def __init__(self, max_entries: int = 256):
+        self.results = MemoryLRUCache(max_entries)
+
+    @staticmethod
+    def make_key(stage: PlanningStage, trip: TripSpec, outputs: Dict[str, str], model: Optional[str] = None,
+                 options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Key a stage result on everything that determines it.
+
+        Args:
+            stage: The stage.
+            trip: The trip being planned.
+            outputs: Upstream outputs, before handoff compaction.
+            model: The model the stage runs on; defaults to the trip's model.
+            options: Pipeline settings that change the stage's prompts or how it runs (handoff
+                compaction, chunking).
+        """
+        inputs = {name: getattr(trip, name) for name in stage.inputs}
+        payload = {"stage": stage.name, "model": model or trip.model_name, "inputs": inputs, "upstream": outputs,
+                   "options": options or {}}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[StageResult]:
+        return self.results.get(key)
+
+    def set(self, key: str, result: StageResult) -> None:
+        # Answers cut short by a deadline are not worth reusing
+        if result.error is None and not result.metrics.get("deadline_hit"):
+            self.results.set(key, result)
+
+
+_stage_memo: Optional[StageMemo] = None
+_stage_memo_lock = threading.Lock()
+
+
+def get_stage_memo() -> StageMemo:
+    """Return the process-wide stage memo, creating it on first use."""
+    global _stage_memo
+    with _stage_memo_lock:
+        if _stage_memo is None:
+            _stage_memo = StageMemo()
+        return _stage_memo
+
+
+def _research_task(tasks: TravelTasks, trip: TripSpec, outputs: Dict[str, str], data: Dict[str, Any]) -> Task:
+    return tasks.destination_research_task(
+        destination=trip.destination,
+        starting_point=trip.starting_point,
+        interests=trip.interests,
+        duration=trip.duration,
+        travel_date_info=trip.travel_date_info
+    )
+
+
+def _itinerary_task(tasks: TravelTasks, trip: TripSpec, outputs: Dict[str, str], data: Dict[str, Any]) -> Task:
+    return tasks.itinerary_creation_task(
+        destination=trip.destination,
+        starting_point=trip.starting_point,
+        interests=trip.interests,
+        duration=trip.duration,
+        budget_level=trip.budget_level,
+        travel_style=trip.travel_style,
+        travel_date_info=trip.travel_date_info,
+        research_report=outputs["research"]
+    )
+
+
+def _recommendations_task(tasks: TravelTasks, trip: TripSpec, outputs: Dict[str, str], data: Dict[str, Any]) -> Task:
+    return tasks.local_recommendations_task(
+        destination=trip.destination,
+        interests=trip.interests,
+        research_report=outputs["research"]
+    )
+
+
+def _itinerary_breakdown(trip: TripSpec, data: Dict[str, Any]) -> Optional[BudgetBreakdown]:
+    itinerary = data.get("itinerary")
+    return BudgetEngine().breakdown(itinerary, trip.budget_level) if isinstance(itinerary, Itinerary) else None
+
+
+def _budget_task(tasks: TravelTasks, trip: TripSpec, outputs: Dict[str, str], data: Dict[str, Any]) -> Task:
+    # With a structured itinerary the costs are totalled locally and the LLM only writes savings tips
+    breakdown = _itinerary_breakdown(trip, data)
+    if breakdown is not None:
+        return tasks.budget_tips_task(
+            destination=trip.destination,
+            duration=trip.duration,
+            budget_level=trip.budget_level,
+            cost_summary=breakdown.summary()
+        )
+    return tasks.budget_optimization_task(
+        destination=trip.destination,
+        duration=trip.duration,
+        budget_level=trip.budget_level,
+        itinerary=outputs["itinerary"]
+    )
+
+
+def _finalize_budget(trip: TripSpec, data: Dict[str, Any], output: str) -> Tuple[str, Any]:
+    breakdown = _itinerary_breakdown(trip, data)
+    if breakdown is None:
+        return output, None
+    return f"{breakdown.to_markdown()}\n## Savings Tips\n\n{output}", breakdown
+
+
+STAGES: List[PlanningStage] = [
+    PlanningStage("research", "Researching destination...", (), _research_task,
+                  "Error occurred during research. Please try again.",
+                  inputs=("destination", "starting_point", "interests", "duration", "travel_date_info"),
+                  role="research"),
+    PlanningStage("itinerary", "Creating itinerary...", ("research",), _itinerary_task,
+                  "Error occurred during itinerary creation. Please try again.",
+                  inputs=("destination", "starting_point", "interests", "duration", "budget_level",
+                          "travel_style", "travel_date_info"),
+                  role="planning", run_chunked=run_chunked_itinerary),
+    PlanningStage("recommendations", "Finding local recommendations...", ("research",), _recommendations_task,
+                  "Error occurred during recommendations. Please try again.",
+                  inputs=("destination", "interests"), role="local_expert"),
+    PlanningStage("budget", "Optimizing budget...", ("itinerary",), _budget_task,
+                  "Error occurred during budget optimization. Please try again.",
+                  inputs=("destination", "duration", "budget_level"), role="budget", finalize=_finalize_budget),
+]
+
+
+class PlanningPipeline:
+    """Runs the planning stages as a DAG, starting each one as soon as its inputs are ready."""
+
+    def __init__(self, agents: TravelAgents, stages: Optional[List[PlanningStage]] = None,
+                 max_workers: Optional[int] = None, context_budget: Optional[ContextBudget] = None,
+                 compact_handoffs: bool = True, memo: Optional[StageMemo] = None, reuse_results: bool = True,
+                 artifact_store: Optional[ArtifactStore] = None, store_artifacts: bool = True,
+                 chunk_days: Optional[int] = None, deadlines: Optional[DeadlinePolicy] = None):
+        """
+        Args:
+            agents: The agent factory shared by every stage.
+            stages: The stage graph; defaults to the four standard planning stages.
+            max_workers: Thread pool size; defaults to one thread per stage.
+            context_budget: Compacts upstream outputs before they are pasted into downstream prompts.
+            compact_handoffs: Set to False to pass upstream outputs through verbatim.
+            memo: Store of earlier stage results; defaults to the process-wide memo.
+            reuse_results: Set to False to re-execute every stage.
+            artifact_store: Where stage outputs are saved; defaults to the process-wide store.
+            store_artifacts: Set to False to keep outputs in memory only.
+            chunk_days: Plan trips longer than this many days in parallel blocks of this size;
+                defaults to TRAVEL_ITINERARY_CHUNK_DAYS (unset = always plan in one generation).
+            deadlines: Plan latency SLO, split into stage deadlines; defaults to DeadlinePolicy.from_env().
+        """
+        self.agents = agents
+        self.tasks = TravelTasks(agents)
+        self.stages = stages if stages is not None else STAGES
+        self.max_workers = max_workers or len(self.stages)
+        if context_budget is None and compact_handoffs:
+            context_budget = ContextBudget(model_name=agents.model_name)
+        self.context_budget = context_budget
+        self.memo = (memo or get_stage_memo()) if reuse_results else None
+        self.artifact_store = (artifact_store or get_artifact_store()) if store_artifacts else None
+        if chunk_days is None and os.getenv("TRAVEL_ITINERARY_CHUNK_DAYS"):
+            chunk_days = int(os.environ["TRAVEL_ITINERARY_CHUNK_DAYS"])
+        self.chunk_days = chunk_days
+        self.deadlines = deadlines or DeadlinePolicy.from_env()
+        self._check_graph()
+
+    def _check_graph(self) -> None:
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Stage names must be unique")
+        resolved = set()
+        remaining = list(self.stages)
+        while remaining:
+            ready = [stage for stage in remaining if set(stage.depends_on) <= resolved]
+            if not ready:
+                raise ValueError(f"Unresolvable stage dependencies: {[stage.name for stage in remaining]}")
+            resolved.update(stage.name for stage in ready)
+            remaining = [stage for stage in remaining if stage not in ready]
+
+    def _chunks(self, stage: PlanningStage, trip: TripSpec) -> bool:
+        return stage.run_chunked is not None and bool(self.chunk_days) and trip.duration > self.chunk_days
+
+    def memo_options(self, stage: PlanningStage, trip: TripSpec) -> Dict[str, Any]:
+        """The pipeline settings that shape a stage's prompts, for its memo key."""
+        options: Dict[str, Any] = {}
+        if stage.depends_on and self.context_budget is not None:
+            budget = self.context_budget
+            options["handoff"] = {"tokens": budget.stage_budgets.get(stage.name),
+                                  "profile": budget.profiles.get(stage.name), "tokenizer": budget.model_name}
+        if self._chunks(stage, trip):
+            options["chunk_days"] = self.chunk_days
+        return options
+
+    def run_stage(self, stage: PlanningStage, trip: TripSpec, outputs: Dict[str, str],
+                  sink: Optional[StageEventSink] = None, data: Optional[Dict[str, Any]] = None,
+                  deadline: Optional[StageDeadline] = None) -> StageResult:
+        """
+        Build and execute a single stage in its own crew.
+
+        Args:
+            stage: The stage to run.
+            trip: The trip being planned.
+            outputs: Outputs of the stages it depends on.
+            sink: Receives streamed tokens and tool-call events, if streaming.
+            data: Structured data of the stages it depends on.
+            deadline: When the stage must finish; without one only the tool-call limit applies.
+
+        Returns:
+            The stage result; failures are captured rather than raised.
+        """
+        with tracer.span("stage", stage.name) as span:
+            result = self._execute_stage(stage, trip, outputs, sink, data or {},
+                                         deadline or StageDeadline(self.deadlines, None))
+            if span is not None:
+                span.error = result.error
+                span.attributes["model"] = result.metrics.get("effective_model")
+                span.attributes["downgraded"] = result.metrics.get("downgraded", False)
+                span.attributes["deadline_hit"] = result.metrics.get("deadline_hit")
+                for key in ("tokens_in", "tokens_out", "tokens_cached", "tool_calls", "llm_calls"):
+                    result.metrics[key] = span.attributes.get(key, 0)
+            return result
+
+    def _execute_stage(self, stage: PlanningStage, trip: TripSpec, outputs: Dict[str, str],
+                       sink: Optional[StageEventSink], data: Dict[str, Any], deadline: StageDeadline) -> StageResult:
+        started_at = time.time()
+        metrics: Dict[str, Any] = {}
+        token = current_sink.set(sink)
+        # Makes the agent answer early near the deadline and caps the stage's searches
+        deadline_token = current_deadline.set(deadline)
+        # Tracks the stage's LLM usage against its budget, downgrading to a faster model near the limit
+        budget = BudgetTracker(self.agents.routing, self.agents.routing.budget_for(stage.name),
+                               self.agents.model_for(stage.role) if stage.role else self.agents.model_name)
+        budget_token = current_budget.set(budget)
+        try:
+            if self.context_budget is not None and outputs:
+                outputs, handoffs = self.context_budget.compact_inputs(stage.name, outputs)
+                metrics["handoff_tokens_before"] = sum(h.tokens_before for h in handoffs.values())
+                metrics["handoff_tokens_after"] = sum(h.tokens_after for h in handoffs.values())
+            chunked = None
+            if self._chunks(stage, trip):
+                chunked = stage.run_chunked(self.tasks, trip, outputs, self.chunk_days)
+            if chunked is not None:
+                output, structured = chunked.itinerary.to_markdown(), chunked.itinerary
+                metrics.update(chunked.metrics())
+            else:
+                task = stage.build_task(self.tasks, trip, outputs, data)
+                if self.context_budget is not None:
+                    metrics["prompt_tokens"] = self.context_budget.count_tokens(task.description)
+                crew = Crew(agents=[task.agent], tasks=[task], verbose=not tracing_enabled(),
+                            step_callback=sink.on_step if sink else None)
+                crew_output = crew.kickoff()
+                output = str(crew_output) if not isinstance(crew_output, str) else crew_output
+                # Structured (Pydantic) output is kept as data and shown as its Markdown rendering
+                structured = getattr(crew_output, "pydantic", None)
+                if structured is not None and hasattr(structured, "to_markdown"):
+                    output = structured.to_markdown()
+            if stage.finalize is not None:
+                output, structured = stage.finalize(trip, data, output)
+            metrics.update(budget.metrics(), **deadline.metrics())
+            return StageResult(stage.name, output, started_at, time.time(), metrics=metrics, data=structured)
+        except Exception as e:
+            metrics.update(budget.metrics(), **deadline.metrics())
+            return StageResult(stage.name, stage.error_message, started_at, time.time(), error=str(e),
+                               metrics=metrics)
+        finally:
+            current_deadline.reset(deadline_token)
+            current_budget.reset(budget_token)
+            current_sink.reset(token)
+
+    def _degraded_result(self, stage: PlanningStage, trip: TripSpec, data: Dict[str, Any],
+                         deadline: StageDeadline, started_at: float, skipped_after: Tuple[str, ...] = ()
+                         ) -> StageResult:
+        """Stand-in result for a stage abandoned at its deadline (or skipped after an abandoned input)."""
+        if skipped_after:
+            note = (f"_This section was skipped because {', '.join(skipped_after)} could not be completed "
+                    f"in time. Please try again._")
+        else:
+            note = (f"_This section could not be completed within its time limit "
+                    f"({deadline.metrics().get('deadline_seconds', 0):.0f}s). Please try again._")
+        output, structured = note, None
+        if stage.finalize is not None:
+            # Whatever the stage derives without its LLM (e.g. the budget totals) is still shown
+            try:
+                output, structured = stage.finalize(trip, data, note)
+            except Exception:
+                output, structured = note, None
+        metrics = {"model": self.agents.model_for(stage.role) if stage.role else self.agents.model_name,
+                   "degraded": True, **deadline.metrics()}
+        if skipped_after:
+            metrics["deadline_hit"] = "skipped"
+        return StageResult(stage.name, output, started_at, time.time(), metrics=metrics, data=structured)
+
+    def run(self, trip: TripSpec,
+            on_stage_start: Optional[Callable[[PlanningStage], None]] = None,
+            on_stage_complete: Optional[Callable[[PlanningStage, StageResult, int, int], None]] = None,
+            on_event: Optional[Callable[[StageEvent], None]] = None,
+            run_id: Optional[str] = None
+            ) -> Dict[str, StageResult]:
+        """
+        Plan a trip, running independent stages concurrently.
+
+        Stages whose inputs match an earlier run are served from the memo instead of
+        re-executing; their results have `reused` set and the original duration in
+        `metrics["time_saved"]`. A stage still running at its deadline is abandoned and replaced by
+        a degraded result (`metrics["degraded"]`), so one slow stage cannot hold up the plan; the
+        stages depending on it are degraded too, without running. Each output is queued for the
+        artifact store under `run_id` as soon as its stage finishes, and `result.artifact` reads it
+        back lazily. Callbacks are invoked on the calling thread, so they may safely update
+        Streamlit elements.
+
+        Args:
+            trip: The trip to plan.
+            on_stage_start: Called with the stage when it is submitted.
+            on_stage_complete: Called with the stage, its result, and the completed/total stage counts.
+            on_event: Enables streaming; called with each LLM token and tool-call event as it is produced.
+            run_id: Identifies the plan in the artifact store; a new one is generated if omitted.
+
+        Returns:
+            Stage results keyed by stage name.
+        """
+        results: Dict[str, StageResult] = {}
+        pending = list(self.stages)
+        running: Dict[Future, PlanningStage] = {}
+        # Deadline, upstream data and start time of each running stage
+        submitted: Dict[Future, Tuple[StageDeadline, Dict[str, Any], float]] = {}
+        abandoned: List[PlanningStage] = []
+        events: "queue.Queue[StageEvent]" = queue.Queue()
+        memo_keys: Dict[str, Optional[str]] = {}
+        run_id = run_id or new_run_id()
+        run_metadata = {"trip": trip.to_dict()}
+
+        def complete(stage: PlanningStage, result: StageResult) -> None:
+            results[stage.name] = result
+            if result.metrics.get("deadline_hit"):
+                tracer.count("travel_stage_deadline_hits_total", stage=stage.name, hit=result.metrics["deadline_hit"])
+            if self.artifact_store is not None:
+                result.artifact = self.artifact_store.put(run_id, stage.name, result.output, run_metadata)
+            if on_stage_complete:
+                on_stage_complete(stage, result, len(results), len(self.stages))
+
+        offsets = self.deadlines.stage_offsets(self.stages)
+        plan_started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="travel-stage")
+        try:
+            with tracer.span("plan", trip.destination, model=trip.model_name, duration_days=trip.duration):
+                while pending or running:
+                    ready = [stage for stage in pending if all(dep in results for dep in stage.depends_on)]
+                    for stage in ready:
+                        pending.remove(stage)
+                        outputs = {dep: results[dep].output for dep in stage.depends_on}
+                        data = {dep: results[dep].data for dep in stage.depends_on}
+                        # An input was abandoned: the stage would only be working from a placeholder
+                        skipped_after = tuple(dep for dep in stage.depends_on if results[dep].metrics.get("degraded"))
+                        if skipped_after:
+                            complete(stage, self._degraded_result(stage, trip, data, StageDeadline(self.deadlines, None),
+                                                                  time.time(), skipped_after))
+                            continue
+                        memo_keys[stage.name] = StageMemo.make_key(
+                            stage, trip, outputs, self.agents.model_for(stage.role) if stage.role else None,
+                            self.memo_options(stage, trip)
+                        ) if self.memo else None
+                        memoized = self.memo.get(memo_keys[stage.name]) if self.memo else None
+                        if memoized is not None:
+                            now = time.time()
+                            complete(stage, StageResult(
+                                stage.name, memoized.output, now, now,
+                                metrics={**memoized.metrics, "time_saved": memoized.duration}, reused=True,
+                                data=memoized.data))
+                            continue
+                        if on_stage_start:
+                            on_stage_start(stage)
+                        sink = StageEventSink(stage.name, events) if on_event else None
+                        deadline = StageDeadline(
+                            self.deadlines, plan_started + offsets[stage.name] if stage.name in offsets else None)
+                        # Copy the context so stage spans are children of the plan span
+                        context = contextvars.copy_context()
+                        future = executor.submit(context.run, self.run_stage, stage, trip, outputs, sink, data, deadline)
+                        running[future] = stage
+                        submitted[future] = (deadline, data, time.time())
+
+                    # Reused stages may have unblocked their dependants without anything running
+                    if not running:
+                        continue
+
+                    # Wake up at the nearest stage deadline, and regularly while streaming to forward
+                    # events produced by the workers
+                    remaining = [left for left in (submitted[future][0].remaining() for future in running)
+                                 if left is not None]
+                    timeout = min(remaining + ([0.1] if on_event else []), default=None)
+                    done, _ = wait(running, timeout=None if timeout is None else max(timeout, 0),
+                                   return_when=FIRST_COMPLETED)
+                    if on_event:
+                        skipped = {stage.name for stage in abandoned}
+                        for event in drain_events(events):
+                            if event.stage not in skipped:
+                                on_event(event)
+                    for future in done:
+                        stage = running.pop(future)
+                        submitted.pop(future)
+                        result = future.result()
+                        if self.memo:
+                            self.memo.set(memo_keys[stage.name], result)
+                        complete(stage, result)
+                    for future in [future for future in running if (submitted[future][0].remaining() or 0) < 0]:
+                        # Out of time: stop waiting and let the rest of the plan go ahead without it
+                        stage = running.pop(future)
+                        deadline, data, started_at = submitted.pop(future)
+                        deadline.miss()
+                        abandoned.append(stage)
+                        complete(stage, self._degraded_result(stage, trip, data, deadline, started_at))
+        finally:
+            # Abandoned stages wind down on their own once they see the missed deadline
+            executor.shutdown(wait=not abandoned)
+            # Hand the agents back to the process-wide pool for the next plan, except those still in use
+            self.agents.release_agents(discard={stage.role for stage in abandoned})
+            if self.artifact_store is not None:
+                self.artifact_store.prune_async()
+
+        return results
+
+
+def plan_trip(trip: TripSpec, routing: Optional[RoutingPolicy] = None, **pipeline_options: Any
+              ) -> Dict[str, StageResult]:
+    """
+    Plan a trip without the Streamlit UI.
+
+    Args:
+        trip: The trip to plan.
+        routing: Per-role models and stage budgets; by default every stage uses the trip's model.
+        **pipeline_options: Passed to PlanningPipeline.
+
+    Returns:
+        Stage results keyed by stage name.
+    """
+    agents = TravelAgents(model_name=trip.model_name, routing=routing)
+    return PlanningPipeline(agents, **pipeline_options).run(trip)
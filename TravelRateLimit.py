@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` operations per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second.
+            capacity: Maximum burst size; defaults to one second's worth of tokens (at least 1).
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available without waiting."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until tokens are available and take them.
+
+        Args:
+            tokens: Number of tokens to take.
+            timeout: Maximum seconds to wait (None = wait indefinitely).
+
+        Returns:
+            True if the tokens were taken, False on timeout.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+_provider_limits: Dict[str, TokenBucket] = {}
+_provider_lock = threading.Lock()
+
+
+def provider_for_model(model_name: str) -> str:
+    """Return the provider prefix of a litellm model name ("openai" when there is none)."""
+    return model_name.split("/", 1)[0] if "/" in model_name else "openai"
+
+
+def set_provider_rate_limit(provider: str, requests_per_minute: Optional[float]) -> None:
+    """
+    Cap outbound LLM requests for a provider across the whole process.
+
+    Args:
+        provider: Provider name, e.g. "openai".
+        requests_per_minute: Allowed request rate; None removes the limit.
+    """
+    with _provider_lock:
+        if requests_per_minute is None:
+            _provider_limits.pop(provider, None)
+        else:
+            _provider_limits[provider] = TokenBucket(requests_per_minute / 60.0)
+
+
+def throttle_provider(provider: str) -> None:
+    """Block until the provider's rate limit (if any) allows another request."""
+    bucket = _provider_limits.get(provider)
+    if bucket is not None:
+        bucket.acquire()
@@ -0,0 +1,146 @@
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+# Faster (and cheaper) stand-in for each model, used when a stage is about to exceed its budget
+FASTER_MODELS: Dict[str, str] = {
+    "gpt-4o": "gpt-4o-mini",
+    "gpt-4-turbo": "gpt-4o-mini",
+    "gpt-4": "gpt-4o-mini",
+}
+
+
+@dataclass
+class StageBudget:
+    """Token and latency budget for one planning stage."""
+
+    # Prompt plus completion tokens across all of the stage's LLM calls (None = unlimited)
+    max_tokens: Optional[int] = None
+    # Wall-clock seconds for the whole stage (None = unlimited)
+    max_seconds: Optional[float] = None
+    # Fraction of either budget after which the remaining calls go to the faster model
+    downgrade_at: float = 0.75
+
+
+@dataclass
+class RoutingPolicy:
+    """Which model each agent role uses, and the budgets each stage runs under."""
+
+    default_model: str
+    # Agent role -> model; roles not listed use the default model
+    models: Dict[str, str] = field(default_factory=dict)
+    # Stage name -> budget; stages not listed are unbudgeted
+    budgets: Dict[str, StageBudget] = field(default_factory=dict)
+    # Model -> faster model to downgrade to
+    fallbacks: Dict[str, str] = field(default_factory=lambda: dict(FASTER_MODELS))
+
+    @classmethod
+    def single(cls, model_name: str) -> "RoutingPolicy":
+        """Every role uses `model_name` and no stage is budgeted."""
+        return cls(default_model=model_name)
+
+    @classmethod
+    def tiered(cls, model_name: str, fast_model: str = "gpt-4o-mini") -> "RoutingPolicy":
+        """
+        Only the itinerary planner uses `model_name`; research, local recommendations, budgeting and
+        destination comparisons use `fast_model`.
+
+        Each stage gets a token and latency budget sized for its usual output.
+        """
+        return cls(
+            default_model=model_name,
+            models={"research": fast_model, "planning": model_name, "local_expert": fast_model, "budget": fast_model,
+                    "comparison": fast_model},
+            budgets={
+                "research": StageBudget(max_tokens=12000, max_seconds=90),
+                "itinerary": StageBudget(max_tokens=24000, max_seconds=180),
+                "recommendations": StageBudget(max_tokens=12000, max_seconds=90),
+                "budget": StageBudget(max_tokens=12000, max_seconds=90),
+                "comparison": StageBudget(max_tokens=8000, max_seconds=60),
+            },
+        )
+
+    def model_for(self, role: str) -> str:
+        return self.models.get(role, self.default_model)
+
+    def budget_for(self, stage: str) -> Optional[StageBudget]:
+        return self.budgets.get(stage)
+
+    def faster_model(self, model: str) -> Optional[str]:
+        return self.fallbacks.get(model)
+
+
+class BudgetTracker:
+    """Tracks one running stage's LLM usage against its budget and decides when to downgrade."""
+
+    def __init__(self, policy: RoutingPolicy, budget: Optional[StageBudget], model: str):
+        """
+        Args:
+            policy: Provides the faster model to downgrade to.
+            budget: The stage's budget; None only records usage.
+            model: The model the stage's agent was assigned.
+        """
+        self.policy = policy
+        self.budget = budget
+        self.model = model
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.calls: Dict[str, int] = {}
+        self.downgraded = False
+        self._lock = threading.Lock()
+
+    @property
+    def counts_tokens(self) -> bool:
+        return self.budget is not None and self.budget.max_tokens is not None
+
+    def route(self, model: str, prompt_tokens: Callable[[], int]) -> str:
+        """
+        Choose the model for the stage's next LLM call.
+
+        Args:
+            model: The model the calling agent is bound to.
+            prompt_tokens: Returns the size of the call's prompt; only evaluated for token budgets.
+
+        Returns:
+            `model`, or its faster stand-in once the stage has used `downgrade_at` of its budget.
+        """
+        faster = self.policy.faster_model(model)
+        if self.budget is None or faster is None:
+            return model
+        with self._lock:
+            if not self.downgraded:
+                elapsed = time.monotonic() - self.started
+                if self.budget.max_seconds is not None and elapsed >= self.budget.max_seconds * self.budget.downgrade_at:
+                    self.downgraded = True
+                elif self.counts_tokens and \
+                        self.tokens + prompt_tokens() >= self.budget.max_tokens * self.budget.downgrade_at:
+                    self.downgraded = True
+            return faster if self.downgraded else model
+
+    def record(self, model: str, tokens: int = 0) -> None:
+        """Count a finished LLM call."""
+        with self._lock:
+            self.tokens += tokens
+            self.calls[model] = self.calls.get(model, 0) + 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the assigned and effective models, whether the stage was downgraded, and its token use."""
+        used: List[str] = list(self.calls)
+        metrics: Dict[str, Any] = {
+            "model": self.model,
+            "effective_model": used[-1] if used else self.model,
+            "downgraded": self.downgraded,
+            "llm_calls_by_model": dict(self.calls),
+        }
+        if self.counts_tokens:
+            metrics["budget_tokens_used"] = self.tokens
+            metrics["budget_tokens"] = self.budget.max_tokens
+        if self.budget is not None and self.budget.max_seconds is not None:
+            metrics["budget_seconds"] = self.budget.max_seconds
+        return metrics
+
+
+# Budget of the stage running on the current thread, if any
+current_budget: ContextVar[Optional[BudgetTracker]] = ContextVar("current_budget", default=None)
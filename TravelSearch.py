@@ -0,0 +1,358 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from duckduckgo_search.exceptions import RatelimitException, TimeoutException
+from TravelCache import normalize_query
+from TravelRateLimit import TokenBucket
+from TravelTracing import tracer
+
+
+class SearchUnavailableError(RuntimeError):
+    """Raised when a search cannot be served: the circuit is open or retries ran out."""
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Return True for errors that mean the search provider is throttling us."""
+    if isinstance(error, RatelimitException):
+        return True
+    message = str(error).lower()
+    return "ratelimit" in message or "rate limit" in message or "429" in message
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Return True for transient errors worth retrying (throttling and timeouts)."""
+    return is_rate_limit_error(error) or isinstance(error, (TimeoutException, TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls fail fast for
+    `reset_timeout` seconds; then a single trial call is let through, which closes the circuit on
+    success or re-opens it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit.
+            reset_timeout: Seconds the circuit stays open before a trial call is allowed.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may be made now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Half-open: only one trial call at a time
+            if self._trial_running:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_ignored(self) -> None:
+        """End a call whose outcome says nothing about the provider's health."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """Concurrency limit that adapts to errors with additive increase, multiplicative decrease (AIMD).
+
+    Every success raises the limit by 1/limit (about +1 per limit's worth of successful calls); every
+    throttling error halves it. The limit stays within [min_limit, max_limit].
+    """
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 16):
+        """
+        Args:
+            initial_limit: Starting number of concurrent calls.
+            min_limit: Lowest the limit can fall to.
+            max_limit: Highest the limit can grow to.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a concurrency slot.
+
+        Args:
+            timeout: Maximum seconds to wait (None = wait indefinitely).
+
+        Returns:
+            True if a slot was taken, False on timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._in_flight < int(self._limit), timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, throttled: bool = False) -> None:
+        """
+        Free a slot and adapt the limit to the call's outcome.
+
+        Args:
+            throttled: The call was rejected by the provider's rate limiting.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._limit = max(float(self.min_limit), self._limit / 2)
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution whose outcome they all share."""
+
+    def __init__(self):
+        # Key -> (done event, [result, error]) of the call currently running for it
+        self._calls: Dict[Hashable, Tuple[threading.Event, list]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run `fn`, or wait for the identical call already running and take its outcome.
+
+        Args:
+            key: Identifies identical calls.
+            fn: The call to make.
+
+        Returns:
+            The result, and whether it was shared from another caller's call.
+
+        Raises:
+            Whatever `fn` raised, in the caller that ran it and in every caller that waited on it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = (threading.Event(), [None, None])
+        done, outcome = call
+        if not leader:
+            done.wait()
+            if outcome[1] is not None:
+                raise outcome[1]
+            return outcome[0], True
+        try:
+            outcome[0] = fn()
+            return outcome[0], False
+        except BaseException as e:
+            outcome[1] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            done.set()
+
+
+class SearchClient:
+    """Process-wide DuckDuckGo client shared by every search tool.
+
+    Each call waits for the token-bucket rate limit and an adaptive concurrency slot, retries
+    throttling and timeout errors with jittered exponential backoff, and goes through a circuit
+    breaker so a throttled provider is not hammered by every agent at once. Identical searches
+    (same normalized query) made while one is already in flight wait for it and share its results.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: Optional[float] = None, max_retries: int = 3,
+                 backoff_base: float = 1.0, backoff_cap: float = 20.0,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None, breaker: Optional[CircuitBreaker] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Searches allowed per second.
+            burst: Maximum burst of searches; defaults to the token bucket's default.
+            max_retries: Retries after the first attempt for transient errors.
+            backoff_base: Base delay in seconds of the exponential backoff.
+            backoff_cap: Maximum backoff delay in seconds.
+            limiter: Concurrency limiter; a default adaptive limiter is created if omitted.
+            breaker: Circuit breaker; a default breaker is created if omitted.
+            sleep: Used to wait between retries.
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.coalesced = 0
+        # Guards the counters, which every searching thread updates
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def backoff(self, attempt: int) -> float:
+        """Return a full-jitter delay for the given retry attempt (0-based)."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def search(self, query: str, max_results: int, backend: Any) -> List[Dict[str, Any]]:
+        """
+        Run a text search.
+
+        Args:
+            query: The search query.
+            max_results: Number of results to request.
+            backend: Factory for the search session, e.g. `DDGS`.
+
+        Returns:
+            The raw result dicts.
+
+        Raises:
+            SearchUnavailableError: If the circuit is open or every attempt failed.
+        """
+        return self.search_shared(query, max_results, backend)[0]
+
+    def search_shared(self, query: str, max_results: int, backend: Any) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Run a text search, reporting whether its results came from an identical search already in flight.
+
+        Callers that store results (in the search cache or index) should only do so when they ran the
+        search themselves; the caller that ran it stores them under the same key.
+
+        Returns:
+            The raw result dicts, and whether they were shared from another caller's search.
+
+        Raises:
+            SearchUnavailableError: If the circuit is open or every attempt failed.
+        """
+        # Same key as the search cache: word order matters ("paris to tokyo" is not "tokyo to paris")
+        results, shared = self._flights.do((normalize_query(query), max_results, id(backend)),
+                                           lambda: self._search(query, max_results, backend))
+        if shared:
+            self._count("coalesced")
+            tracer.count("travel_search_coalesced_total")
+            span = tracer.current()
+            if span is not None:
+                span.attributes["coalesced"] = True
+        return list(results), shared
+
+    def _search(self, query: str, max_results: int, backend: Any) -> List[Dict[str, Any]]:
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise SearchUnavailableError("Search is temporarily unavailable (too many recent failures)")
+            self.bucket.acquire()
+            self.limiter.acquire()
+            throttled = False
+            try:
+                self._count("calls")
+                with backend() as ddgs:
+                    results = list(ddgs.text(query, max_results=max_results))
+            except Exception as e:
+                last_error = e
+                throttled = is_rate_limit_error(e)
+                if throttled:
+                    self._count("throttled")
+                if not is_retryable_error(e):
+                    # A problem with this search (e.g. a malformed query), not with the provider:
+                    # it must not open the circuit for everyone else
+                    self.breaker.record_ignored()
+                    raise SearchUnavailableError(f"Search failed: {e}") from e
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+                return results
+            finally:
+                self.limiter.release(throttled=throttled)
+            if attempt < self.max_retries:
+                self._count("retries")
+                self._sleep(self.backoff(attempt))
+        raise SearchUnavailableError(f"Search failed after {self.max_retries + 1} attempts: {last_error}") from last_error
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report call, retry, throttling and coalescing counters with the current limiter and breaker state."""
+        with self._lock:
+            counters = {name: getattr(self, name)
+                        for name in ("calls", "retries", "throttled", "rejected", "coalesced")}
+        return {
+            **counters,
+            "concurrency_limit": self.limiter.limit,
+            "circuit": self.breaker.state,
+        }
+
+
+_search_client: Optional[SearchClient] = None
+_search_client_lock = threading.Lock()
+
+
+def get_search_client() -> SearchClient:
+    """
+    Return the process-wide search client, creating it on first use.
+
+    The rate limit can be tuned with TRAVEL_SEARCH_RATE (searches per second) and
+    TRAVEL_SEARCH_BURST, and the concurrency ceiling with TRAVEL_SEARCH_MAX_CONCURRENCY.
+    """
+    global _search_client
+    with _search_client_lock:
+        if _search_client is None:
+            burst = os.getenv("TRAVEL_SEARCH_BURST")
+            _search_client = SearchClient(
+                rate=float(os.getenv("TRAVEL_SEARCH_RATE", 1.0)),
+                burst=float(burst) if burst else None,
+                limiter=AdaptiveConcurrencyLimiter(
+                    max_limit=int(os.getenv("TRAVEL_SEARCH_MAX_CONCURRENCY", 16))),
+            )
+        return _search_client
@@ -0,0 +1,50 @@
+import queue
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+
+@dataclass
+class StageEvent:
+    """An incremental update produced while a stage is running."""
+
+    stage: str
+    kind: str  # "token", "tool_call" or "tool_result"
+    text: str
+
+
+class StageEventSink:
+    """Collects events for one stage and forwards them to the pipeline's event queue.
+
+    Events are produced on worker threads; the pipeline drains the queue on the calling
+    thread, where it is safe to update Streamlit elements.
+    """
+
+    def __init__(self, stage: str, events: "queue.Queue[StageEvent]"):
+        self.stage = stage
+        self.events = events
+
+    def emit(self, kind: str, text: str) -> None:
+        self.events.put(StageEvent(self.stage, kind, text))
+
+    def on_step(self, step: Any) -> None:
+        """CrewAI step callback: reports tool calls and their results."""
+        tool = getattr(step, "tool", None)
+        if tool:
+            self.emit("tool_call", f"{tool}: {getattr(step, 'tool_input', '')}")
+        elif hasattr(step, "result") and not hasattr(step, "output"):
+            self.emit("tool_result", str(step.result))
+
+
+# Sink for the stage running on the current thread, if streaming is enabled
+current_sink: ContextVar[Optional[StageEventSink]] = ContextVar("current_sink", default=None)
+
+
+def drain_events(events: "queue.Queue[StageEvent]") -> List[StageEvent]:
+    """Return every event currently waiting in the queue without blocking."""
+    drained = []
+    while True:
+        try:
+            drained.append(events.get_nowait())
+        except queue.Empty:
+            return drained
@@ -1,6 +1,140 @@
 from crewai import Task
 from typing import List
 from TravelAgents import TravelAgents
+from TravelItinerary import DestinationComparison, Itinerary, ItineraryOutline
+import textwrap
+
+# Every task description starts with the task's static instructions and ends with what is specific
+# to the trip, so all plans send the same long prompt prefix and the provider can serve it from its
+# prompt cache. The instructions are assembled once, at import time.
+
+def _instructions(*blocks: str) -> str:
+    return "\n\n".join(textwrap.dedent(block).strip() for block in blocks)
+
+def _describe(instructions: str, *sections: str) -> str:
+    """Append the trip-specific sections to a task's static instructions."""
+    return "\n\n".join([instructions, *(section.strip() for section in sections if section)])
+
+def _trip_details(*lines: str, **details) -> str:
+    return "Trip details:\n" + "\n".join([f"{label.replace('_', ' ').capitalize()}: {value}"
+                                          for label, value in details.items() if value] + [line for line in lines if line])
+
+ITINERARY_ITEMS = _instructions("""
+    For each day, include as separate items:
+    - Morning activities
+    - Afternoon activities
+    - Evening activities
+    - Recommended dining options
+    - Transportation between locations
+    - The night's accommodation
+    """, """
+    Give every item an estimated cost per traveler at the trip's budget level, in one currency.
+    """)
+
+SAVINGS_AREAS = """
+    Provide specific recommendations for:
+    - Accommodation options at different price points
+    - Transportation cost-saving strategies
+    - Meal planning to save money
+    - Free or low-cost {alternatives}
+    - Local discount cards or passes
+    - Best times to visit paid attractions for discounts
+    - Money-saving tips specific to the destination
+    """
+
+RESEARCH_INSTRUCTIONS = _instructions("""
+    Research comprehensive information about the travel destination given in the trip details below.
+
+    Focus on the following areas:
+    - Main attractions and points of interest
+    - Local customs and cultural norms
+    - Typical weather conditions during the travel dates
+    - Transportation options within the destination
+    - Transportation from the starting point to the destination
+    - Safety considerations
+    - Language considerations
+    - Visa and entry requirements
+
+    Take the traveler's interests and the trip duration into account.
+    Provide a detailed report with all relevant information organized by category.
+    """)
+
+ITINERARY_INSTRUCTIONS = _instructions("""
+    Create a detailed day-by-day itinerary for the trip given in the trip details below.
+    Use the research report that follows them as a basis for your itinerary.
+    """, ITINERARY_ITEMS, """
+    Begin with travel details from the starting point to the destination.
+    Ensure the itinerary is realistic in terms of travel times and distances.
+    Balance the itinerary according to the traveler's preferred style.
+    Include the return journey to the starting point at the end of the trip.
+    """)
+
+OUTLINE_INSTRUCTIONS = _instructions("""
+    Outline the trip given in the trip details below, one entry per day.
+    Use the research report that follows them as a basis for your outline.
+
+    For each day, give the region the traveler spends it in, a theme and its main attractions.
+    Group nearby attractions on the same or consecutive days to keep travel times short.
+    Never assign the same attraction to two days.
+    Day 1 is the arrival from the starting point and the last day the return journey.
+    Do not plan the days in detail.
+    """)
+
+CHUNK_INSTRUCTIONS = _instructions("""
+    Create a detailed itinerary for one block of days of the trip given in the trip details below.
+    The whole trip has already been outlined; the outline and the days to plan follow the trip details.
+
+    Plan only the days of the block, following their outline entries.
+    Do not include attractions the outline assigns to other days.
+    """, ITINERARY_ITEMS, """
+    If the block starts on day 1, begin with travel details from the starting point to the destination.
+    If the block ends on the last day of the trip, include the return journey to the starting point on that day.
+    """)
+
+RECOMMENDATIONS_INSTRUCTIONS = _instructions("""
+    Provide authentic local recommendations for the destination given in the trip details below,
+    based on the traveler's interests. Use the research report that follows them as additional context.
+
+    Include recommendations for:
+    - Hidden gems and off-the-beaten-path attractions
+    - Local restaurants and street food
+    - Cultural experiences and interactions with locals
+    - Local markets and shopping opportunities
+    - Authentic local experiences
+    - Ways to avoid tourist traps
+
+    Explain why each recommendation is special and how it provides an authentic experience.
+    """)
+
+BUDGET_INSTRUCTIONS = _instructions("""
+    Optimize the travel budget for the trip given in the trip details below, at its budget level.
+    Use the itinerary that follows them as a reference.
+    """, SAVINGS_AREAS.format(alternatives="attractions and activities"), """
+    Create a detailed budget breakdown by category (accommodation, food, transportation, activities, etc.)
+    and provide a total estimated cost for the trip.
+    """)
+
+BUDGET_TIPS_INSTRUCTIONS = _instructions("""
+    Suggest how to save money on the trip given in the trip details below, at its budget level.
+    The itinerary's costs have already been calculated and follow the trip details.
+    """, SAVINGS_AREAS.format(alternatives="alternatives to the most expensive items"), """
+    Do not recalculate the totals or repeat the cost breakdown.
+    """)
+
+COMPARISON_INSTRUCTIONS = _instructions("""
+    Compare the candidate destinations of the trip given in the trip details below, so the traveler
+    can choose between them. Each destination has already been planned; a summary of each plan
+    follows the trip details, with its estimated cost, itinerary and how to get there.
+
+    For each destination, give:
+    - The typical travel time from the starting point, and how
+    - The three most distinctive experiences in its plan
+    - The kind of traveler or interest it suits best
+    - Its main drawback compared with the other destinations
+
+    Finish with a two-sentence recommendation that weighs cost, travel time and the traveler's interests.
+    Use only the plan summaries; do not search the web and do not restate the costs.
+    """)
 
 class TravelTasks:
     def __init__(self, agents: TravelAgents):
@@ -16,36 +150,21 @@ class TravelTasks:
             interests: List of traveler interests.
             duration: Trip duration in days.
             travel_date_info: Information about travel dates.
-            
+        
         Returns:
             A Task for destination research.
         """
         return Task(
-            description=f"""Research comprehensive information about {destination} as a travel destination.
-            Starting point: {starting_point}
-            {travel_date_info}
-
-            Focus on the following areas:
-            - Main attractions and points of interest
-            - Local customs and cultural norms
-            - Typical weather conditions during the travel dates
-            - Transportation options within the destination
-            - Transportation from {starting_point} to {destination}
-            - Safety considerations
-            - Language considerations
-            - Visa and entry requirements
-            
-            The traveler is interested in: {', '.join(interests)}
-            Trip duration: {duration} days
-            
-            Provide a detailed report with all relevant information organized by category.
-            """,
+            description=_describe(
+                RESEARCH_INSTRUCTIONS,
+                _trip_details(travel_date_info, destination=destination, starting_point=starting_point,
+                              interests=', '.join(interests), trip_duration=f"{duration} days")
+            ),
             agent=self.agents.create_research_agent(),
-            expected_output="A comprehensive report on the destination with all relevant travel information",
-            output_file="destination_research_report.txt"  # Optional: Save output to a file
+            expected_output="A comprehensive report on the destination with all relevant travel information"
         )
     
-    def itinerary_creation_task(self, destination: str, starting_point: str, interests: List[str], duration: int, 
+    def itinerary_creation_task(self, destination: str, starting_point: str, interests: List[str], duration: int,
                                 budget_level: str, travel_style: str, travel_date_info: str, research_report: str) -> Task:
         """
         Create a task for developing a travel itinerary.
@@ -59,38 +178,91 @@ class TravelTasks:
             travel_style: Travel style preference (e.g., "relaxed", "packed").
             travel_date_info: Information about travel dates.
             research_report: The research report from the previous task.
-            
+        
         Returns:
             A Task for itinerary creation.
         """
         return Task(
-            description=f"""Create a detailed day-by-day itinerary for a {duration}-day trip to {destination}.
-            
-            Starting from: {starting_point}
-            {travel_date_info}
-            Traveler interests: {', '.join(interests)}
-            Budget level: {budget_level}
-            Travel style: {travel_style}
-            
-            Use the following research as a basis for your itinerary:
-            {research_report}
-            
-            For each day, include:
-            - Morning activities
-            - Afternoon activities
-            - Evening activities
-            - Recommended dining options
-            - Estimated costs for activities and meals
-            - Transportation between locations
-            
-            Begin with travel details from {starting_point} to {destination}.
-            Ensure the itinerary is realistic in terms of travel times and distances.
-            Balance the itinerary according to the traveler's preferred style.
-            Include the return journey to {starting_point} at the end of the trip.
-            """,
+            description=_describe(
+                ITINERARY_INSTRUCTIONS,
+                _trip_details(travel_date_info, trip=f"{duration}-day trip to {destination}",
+                              starting_from=starting_point,
+                              interests=', '.join(interests), budget_level=budget_level, travel_style=travel_style),
+                f"Research report:\n{research_report}"
+            ),
             agent=self.agents.create_planning_agent(),
-            expected_output="A detailed day-by-day itinerary for the entire trip",
-            output_file="detailed_itinerary.txt"  # Optional: Save output to a file
+            expected_output="A detailed day-by-day itinerary for the entire trip, with every activity, meal, "
+                            "transfer and stay listed as an item with its estimated cost",
+            output_pydantic=Itinerary
+        )
+    
+    def itinerary_outline_task(self, destination: str, starting_point: str, interests: List[str], duration: int,
+                               travel_style: str, travel_date_info: str, research_report: str) -> Task:
+        """
+        Create a task for a one-line-per-day outline of a long trip.
+        
+        Args:
+            destination: The destination for the itinerary.
+            starting_point: The starting point of the journey.
+            interests: List of traveler interests.
+            duration: Trip duration in days.
+            travel_style: Travel style preference (e.g., "relaxed", "packed").
+            travel_date_info: Information about travel dates.
+            research_report: The research report from the previous task.
+        
+        Returns:
+            A Task for the itinerary outline.
+        """
+        return Task(
+            description=_describe(
+                OUTLINE_INSTRUCTIONS,
+                _trip_details(travel_date_info, trip=f"{duration}-day trip to {destination}",
+                              starting_from=starting_point,
+                              interests=', '.join(interests), travel_style=travel_style),
+                f"Research report:\n{research_report}"
+            ),
+            agent=self.agents.create_planning_agent(),
+            expected_output=f"An outline with the region, theme and highlights of each of the {duration} days",
+            output_pydantic=ItineraryOutline
+        )
+    
+    def itinerary_chunk_task(self, destination: str, starting_point: str, interests: List[str], duration: int,
+                             budget_level: str, travel_style: str, outline: str, first_day: int, last_day: int,
+                             instance: int = 0, retry: bool = False) -> Task:
+        """
+        Create a task for planning a block of days of a long trip in detail, following its outline.
+        
+        Args:
+            destination: The destination for the itinerary.
+            starting_point: The starting point of the journey.
+            interests: List of traveler interests.
+            duration: Trip duration in days.
+            budget_level: Budget level (e.g., "budget", "moderate", "luxury").
+            travel_style: Travel style preference (e.g., "relaxed", "packed").
+            outline: The outline of the whole trip.
+            first_day: First day of the block.
+            last_day: Last day of the block.
+            instance: Planning agent instance, so blocks planned concurrently use separate agents.
+            retry: The block's previous answer did not cover exactly its days; says so in the prompt.
+        
+        Returns:
+            A Task for the block's itinerary.
+        """
+        # The block's days come last, so the blocks of one trip also share the trip details and outline
+        return Task(
+            description=_describe(
+                CHUNK_INSTRUCTIONS,
+                _trip_details(trip=f"{duration}-day trip to {destination}", starting_from=starting_point,
+                              interests=', '.join(interests), budget_level=budget_level, travel_style=travel_style),
+                f"Outline of the whole trip:\n{outline}",
+                f"Plan days {first_day} to {last_day}.",
+                (f"Your previous answer did not match these days. Give exactly one entry for each day from "
+                 f"{first_day} to {last_day}, numbered {first_day} to {last_day}.") if retry else ""
+            ),
+            agent=self.agents.create_planning_agent(instance),
+            expected_output=f"A detailed itinerary for days {first_day} to {last_day}, with every activity, meal, "
+                            "transfer and stay listed as an item with its estimated cost",
+            output_pydantic=Itinerary
         )
     
     def local_recommendations_task(self, destination: str, interests: List[str], research_report: str) -> Task:
@@ -101,33 +273,21 @@ class TravelTasks:
             destination: The destination for recommendations.
             interests: List of traveler interests.
             research_report: The research report from the previous task.
-            
+        
         Returns:
             A Task for local recommendations.
         """
         return Task(
-            description=f"""Provide authentic local recommendations for {destination} based on 
-            the traveler's interests: {', '.join(interests)}.
-            
-            Use the following research as additional context:
-            {research_report}
-            
-            Include recommendations for:
-            - Hidden gems and off-the-beaten-path attractions
-            - Local restaurants and street food
-            - Cultural experiences and interactions with locals
-            - Local markets and shopping opportunities
-            - Authentic local experiences
-            - Ways to avoid tourist traps
-            
-            Explain why each recommendation is special and how it provides an authentic experience.
-            """,
+            description=_describe(
+                RECOMMENDATIONS_INSTRUCTIONS,
+                _trip_details(destination=destination, interests=', '.join(interests)),
+                f"Research report:\n{research_report}"
+            ),
             agent=self.agents.create_local_expert_agent(),
-            expected_output="A curated list of authentic local recommendations",
-            output_file="local_recommendations.txt"  # Optional: Save output to a file
+            expected_output="A curated list of authentic local recommendations"
         )
     
-    def budget_optimization_task(self, destination: str, duration: int, budget_level: str, 
+    def budget_optimization_task(self, destination: str, duration: int, budget_level: str,
                                 itinerary: str) -> Task:
         """
         Create a task for optimizing the travel budget.
@@ -137,30 +297,68 @@ class TravelTasks:
             duration: Trip duration in days.
             budget_level: Budget level (e.g., "budget", "moderate", "luxury").
             itinerary: The itinerary from the previous task.
-            
+        
         Returns:
             A Task for budget optimization.
         """
         return Task(
-            description=f"""Optimize the travel budget for a {duration}-day trip to {destination}
-            with a {budget_level} budget level.
-            
-            Use the following itinerary as a reference:
-            {itinerary}
-            
-            Provide specific recommendations for:
-            - Accommodation options at different price points
-            - Transportation cost-saving strategies
-            - Meal planning to save money
-            - Free or low-cost attractions and activities
-            - Local discount cards or passes
-            - Best times to visit paid attractions for discounts
-            - Money-saving tips specific to the destination
-            
-            Create a detailed budget breakdown by category (accommodation, food, transportation, activities, etc.)
-            and provide a total estimated cost for the trip.
-            """,
+            description=_describe(
+                BUDGET_INSTRUCTIONS,
+                _trip_details(trip=f"{duration}-day trip to {destination}", budget_level=budget_level),
+                f"Itinerary:\n{itinerary}"
+            ),
+            agent=self.agents.create_budget_optimization_agent(),
+            expected_output="A detailed budget optimization plan with specific recommendations and cost estimates"
+        )
+    
+    def budget_tips_task(self, destination: str, duration: int, budget_level: str, cost_summary: str) -> Task:
+        """
+        Create a task for money-saving advice on an itinerary whose costs are already totalled.
+        
+        Args:
+            destination: The destination for budget optimization.
+            duration: Trip duration in days.
+            budget_level: Budget level (e.g., "budget", "moderate", "luxury").
+            cost_summary: Cost totals and most expensive items from the budget engine.
+        
+        Returns:
+            A Task for savings recommendations.
+        """
+        return Task(
+            description=_describe(
+                BUDGET_TIPS_INSTRUCTIONS,
+                _trip_details(trip=f"{duration}-day trip to {destination}", budget_level=budget_level),
+                f"Calculated costs:\n{cost_summary}"
+            ),
             agent=self.agents.create_budget_optimization_agent(),
-            expected_output="A detailed budget optimization plan with specific recommendations and cost estimates",
-            output_file="budget_optimization_plan.txt"  # Optional: Save output to a file
+            expected_output="Specific money-saving recommendations for the trip"
+        )
+    
+    def destination_comparison_task(self, starting_point: str, interests: List[str], duration: int,
+                                    budget_level: str, travel_date_info: str, plan_summaries: str) -> Task:
+        """
+        Create a task for comparing finished plans for several destinations side by side.
+        
+        Args:
+            starting_point: The starting point of the journey.
+            interests: List of traveler interests.
+            duration: Trip duration in days.
+            budget_level: Budget level (e.g., "budget", "moderate", "luxury").
+            travel_date_info: Information about travel dates.
+            plan_summaries: Compact summary of each destination's plan.
+            
+        Returns:
+            A Task for the destination comparison.
+        """
+        return Task(
+            description=_describe(
+                COMPARISON_INSTRUCTIONS,
+                _trip_details(travel_date_info, trip=f"{duration}-day trip", starting_from=starting_point,
+                              interests=', '.join(interests), budget_level=budget_level),
+                f"Plan summaries:\n{plan_summaries}"
+            ),
+            agent=self.agents.create_comparison_agent(),
+            expected_output="One entry per destination with its travel time, highlights, best fit and main "
+                            "drawback, and a short recommendation",
+            output_pydantic=DestinationComparison
         )
\ No newline at end of file
@@ -1,15 +1,41 @@
 from duckduckgo_search import DDGS
 from typing import List, Dict, Any
 from crewai.tools import BaseTool
+import os
+import time
+from TravelCache import get_search_cache
+from TravelDeadline import current_deadline
+from TravelFetch import get_page_fetcher
+from TravelIndex import get_search_index
+from TravelSearch import SearchUnavailableError, get_search_client
+from TravelTracing import tracer
+
+NO_MORE_SEARCHES = ("No more searches are allowed for this task. Do not call this tool again; "
+                    "write your final answer with the information you already have.")
 
 class DuckDuckGoSearchTool(BaseTool):
     """Tool for searching DuckDuckGo."""
     
     name: str = "duckduckgo_search"
     description: str = "Search the web for information using DuckDuckGo"
+    max_results: int = 5
+    # Set use_cache=False to always go to the web, refresh_cache=True to re-run and overwrite cached entries
+    use_cache: bool = os.getenv("TRAVEL_SEARCH_CACHE", "on").lower() not in ("0", "off", "false")
+    refresh_cache: bool = False
+    # Factory for the search client; replaceable with a local stand-in for offline runs
+    backend: Any = DDGS
+    # Deep mode also fetches the top result pages and appends a digest of their most relevant passages
+    deep: bool = os.getenv("TRAVEL_SEARCH_DEEP", "off").lower() in ("1", "on", "true")
+    deep_pages: int = 3
+    # Page fetcher used in deep mode; defaults to the process-wide fetcher
+    fetcher: Any = None
+    # Answer from the local index of earlier results when it covers the query, and index every new result
+    use_index: bool = os.getenv("TRAVEL_SEARCH_INDEX", "on").lower() not in ("0", "off", "false")
+    # Search index to use; defaults to the process-wide index
+    index: Any = None
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
     
     def _run(self, query: str) -> str:
         """
@@ -21,12 +47,76 @@ class DuckDuckGoSearchTool(BaseTool):
         Returns:
             Formatted string of search results.
         """
-        try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=5))
-                return self.process_search_results(results)
-        except Exception as e:
-            return f"Error performing search: {str(e)}"
+        # Bound how long a stage can keep searching; only searches that reach the web count against its allowance
+        deadline = current_deadline.get()
+        if deadline is not None and deadline.refuse_tool_call():
+            return NO_MORE_SEARCHES
+        
+        with tracer.span("search", self.name, tool_calls=1) as span:
+            cache = get_search_cache() if self.use_cache else None
+            if cache is not None and not self.refresh_cache:
+                cached = cache.get(query, self.max_results)
+                if span is not None:
+                    span.attributes["cache_hit"] = cached is not None
+                if cached is not None:
+                    return self.format_results(query, cached)
+            
+            # Reworded or related searches are often answered by results other searches already found
+            index = (self.index or get_search_index()) if self.use_index else None
+            if index is not None and not self.refresh_cache:
+                local = index.lookup(query, self.max_results)
+                if span is not None:
+                    span.attributes["index_hit"] = local is not None
+                if local is not None:
+                    return "(From the local index of earlier searches)\n" + self.format_results(query, local)
+            
+            if deadline is not None and not deadline.allow_tool_call():
+                if span is not None:
+                    span.attributes["refused"] = True
+                return NO_MORE_SEARCHES
+            
+            try:
+                results, shared = get_search_client().search_shared(query, self.max_results, self.backend)
+            except SearchUnavailableError as e:
+                if span is not None:
+                    span.error = str(e)
+                # Serve an expired entry or partial local matches rather than nothing, and tell the agent not to keep retrying
+                stale = cache.get(query, self.max_results, allow_expired=True) if cache is not None else None
+                if stale is None and index is not None:
+                    stale = index.search(query, self.max_results) or None
+                if stale is not None:
+                    if span is not None:
+                        span.attributes["stale"] = True
+                    return "(Cached results; live search is temporarily unavailable)\n" + self.process_search_results(stale)
+                return (f"Search is temporarily unavailable ({e}). Do not retry the search; "
+                        "continue with the information you already have.")
+            
+            # Only real result sets are cached; empty answers are usually transient. Results shared
+            # from an identical search in flight are stored by the caller that ran it.
+            if cache is not None and results and not shared:
+                cache.set(query, self.max_results, results)
+            if index is not None and results and not shared:
+                index.add(query, results)
+            return self.format_results(query, results)
+    
+    def format_results(self, query: str, results: List[Dict[str, Any]]) -> str:
+        """
+        Format search results, adding a digest of the top pages in deep mode.
+        
+        Args:
+            query: The search query.
+            results: List of search results.
+            
+        Returns:
+            Formatted string of search results.
+        """
+        formatted_results = self.process_search_results(results)
+        if not self.deep or not results or "error" in results[0]:
+            return formatted_results
+        digest = (self.fetcher or get_page_fetcher()).digest(query, results[:self.deep_pages])
+        if not digest:
+            return formatted_results
+        return f"{formatted_results}Page extracts (most relevant passages):\n\n{digest}\n"
     
     def process_search_results(self, results: List[Dict[str, Any]]) -> str:
         """
@@ -48,6 +138,8 @@ class DuckDuckGoSearchTool(BaseTool):
         for i, result in enumerate(results, 1):
             formatted_results += f"{i}. {result.get('title', 'No title')}\n"
             formatted_results += f"   Link: {result.get('href', 'No link')}\n"
+            if "fetched_at" in result:
+                formatted_results += f"   Retrieved: {time.strftime('%Y-%m-%d', time.localtime(result['fetched_at']))}\n"
             formatted_results += f"   {result.get('body', 'No snippet')}\n\n"
         
         return formatted_results
@@ -55,5 +147,5 @@ class DuckDuckGoSearchTool(BaseTool):
 class SearchTools:
     """Tools for searching information on the web."""
     
-    def __init__(self):
-        self.duckduckgo_search = DuckDuckGoSearchTool()
\ No newline at end of file
+    def __init__(self, **search_options):
+        self.duckduckgo_search = DuckDuckGoSearchTool(**search_options)
\ No newline at end of file
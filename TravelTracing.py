@@ -0,0 +1,252 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Attributes of leaf spans (LLM calls and searches) that are summed into every enclosing span,
+# so stage and plan spans report their total tokens and tool calls
+ROLLUP_KINDS = ("llm", "search")
+ROLLUP_ATTRIBUTES = ("tokens_in", "tokens_out", "tokens_cached", "tool_calls", "llm_calls")
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+@dataclass
+class Span:
+    """A timed unit of work: a plan, a stage, an LLM call or a search."""
+
+    kind: str
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent: Optional["Span"] = field(default=None, repr=False)
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self, dict_factory=lambda items: {k: v for k, v in items if k != "parent"})
+        data["parent_id"] = self.parent.span_id if self.parent else None
+        data["duration"] = self.duration
+        return data
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Records spans and aggregates them into Prometheus-style metrics."""
+
+    def __init__(self, enabled: bool = False, trace_dir: Optional[str] = None, max_spans: int = 10000):
+        """
+        Args:
+            enabled: Record spans; when False every `span()` is a no-op.
+            trace_dir: Directory where each finished plan is written as a JSON trace file.
+            max_spans: Number of finished spans kept in memory for inspection.
+        """
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self._traces: Dict[str, List[Span]] = {}
+        # (kind, name) -> cumulative bucket counts, then sum and count as the last two items
+        self._histograms: Dict[Tuple[str, str], List[float]] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        # Callables returning current gauge values by metric name, read at every scrape
+        self._gauge_sources: List[Callable[[], Dict[str, float]]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Time a block of work as a child of the current span.
+
+        Exceptions are recorded on the span and re-raised.
+
+        Args:
+            kind: Span category ("plan", "stage", "llm", "search", ...).
+            name: Span name within the category.
+            **attributes: Initial span attributes.
+
+        Yields:
+            The span, or None when tracing is disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        current = Span(kind, name, parent.trace_id if parent else uuid.uuid4().hex, parent=parent,
+                       attributes=dict(attributes))
+        if parent is None:
+            with self._lock:
+                self._traces[current.trace_id] = []
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(current)
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def _finish(self, finished: Span) -> None:
+        finished.end = time.time()
+        with self._lock:
+            ancestor = finished.parent if finished.kind in ROLLUP_KINDS else None
+            while ancestor is not None:
+                for key in ROLLUP_ATTRIBUTES:
+                    if key in finished.attributes:
+                        ancestor.add(key, finished.attributes[key])
+                ancestor = ancestor.parent
+            self.spans.append(finished)
+            # Spans finishing after their root (e.g. from a thread it did not wait for) are not kept
+            if finished.trace_id in self._traces:
+                self._traces[finished.trace_id].append(finished)
+            histogram = self._histograms.setdefault((finished.kind, finished.name), [0] * (len(DURATION_BUCKETS) + 2))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if finished.duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += finished.duration
+            histogram[-1] += 1
+            labels = (("kind", finished.kind), ("name", finished.name))
+            self._count("travel_spans_total", labels)
+            if finished.error:
+                self._count("travel_span_errors_total", labels)
+            if finished.kind == "llm":
+                for direction in ("in", "out", "cached"):
+                    if f"tokens_{direction}" in finished.attributes:
+                        self._count("travel_llm_tokens_total", (("direction", direction),),
+                                    finished.attributes[f"tokens_{direction}"])
+            if finished.kind == "search":
+                self._count("travel_tool_calls_total", (("tool", finished.name),))
+            trace = self._traces.pop(finished.trace_id) if finished.parent is None else None
+        if trace is not None and self.trace_dir:
+            self.write_trace(trace)
+
+    def count(self, metric: str, amount: float = 1, **labels: str) -> None:
+        """Add to a labelled counter exported alongside the span metrics; a no-op when tracing is disabled."""
+        if self.enabled:
+            with self._lock:
+                self._count(metric, tuple(sorted(labels.items())), amount)
+
+    def add_gauges(self, source: Callable[[], Dict[str, float]]) -> None:
+        """Export the values `source` returns (metric name -> value) as gauges whenever metrics are rendered."""
+        with self._lock:
+            self._gauge_sources.append(source)
+
+    def _count(self, metric: str, labels: Tuple[Tuple[str, str], ...], amount: float = 1) -> None:
+        key = (metric, labels)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def write_trace(self, spans: List[Span]) -> str:
+        """Write one trace (all spans sharing a trace id) to `<trace_dir>/<trace_id>.json`."""
+        os.makedirs(self.trace_dir, exist_ok=True)
+        path = os.path.join(self.trace_dir, f"{spans[0].trace_id}.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump([span.to_dict() for span in spans], handle, indent=2, default=str)
+        return path
+
+    def render_prometheus(self) -> str:
+        """Render the aggregated metrics in the Prometheus text exposition format."""
+        lines = ["# HELP travel_span_duration_seconds Duration of plans, stages, LLM calls and searches.",
+                 "# TYPE travel_span_duration_seconds histogram"]
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            counters = dict(self._counters)
+            gauge_sources = list(self._gauge_sources)
+        for (kind, name), histogram in sorted(histograms.items()):
+            labels = f'kind="{kind}",name="{_escape(name)}"'
+            for bound, count in zip(DURATION_BUCKETS, histogram):
+                lines.append(f'travel_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'travel_span_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+            lines.append(f"travel_span_duration_seconds_sum{{{labels}}} {histogram[-2]}")
+            lines.append(f"travel_span_duration_seconds_count{{{labels}}} {histogram[-1]}")
+        declared = set()
+        for (metric, labels), value in sorted(counters.items()):
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}")
+        for source in gauge_sources:
+            for metric, value in sorted(source().items()):
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """
+        Serve `/metrics` in the Prometheus text format from a background thread.
+
+        Args:
+            port: TCP port to listen on.
+            host: Interface to bind.
+
+        Returns:
+            The running server.
+        """
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="travel-metrics", daemon=True).start()
+        return server
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+tracer = Tracer(
+    enabled=os.getenv("TRAVEL_TRACING", "off").lower() in ("1", "on", "true"),
+    trace_dir=os.getenv("TRAVEL_TRACE_DIR"),
+)
+
+
+def tracing_enabled() -> bool:
+    return tracer.enabled
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def ensure_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """Start the metrics endpoint once per process if tracing is on and TRAVEL_METRICS_PORT is set."""
+    global _metrics_server
+    port = os.getenv("TRAVEL_METRICS_PORT")
+    with _metrics_server_lock:
+        if _metrics_server is None and port and tracer.enabled:
+            _metrics_server = tracer.start_metrics_server(int(port))
+        return _metrics_server
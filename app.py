@@ -1,32 +1,60 @@
 import streamlit as st
+import json
 import os
-from crewai import Crew
 from dotenv import load_dotenv
-from TravelAgents import TravelAgents
-from TravelTasks import TravelTasks
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from TravelDeadline import deadline_summary
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Plans run in the server process's background job queue rather than in this script's thread, so
+# they survive reruns, refreshes and closed tabs. The queue imports crewai and the agent modules
+# only when its first plan starts, keeping the app's startup fast.
+@st.cache_resource
+def load_job_queue():
+    """Start the job queue and its workers once per server process."""
+    from TravelJobs import get_job_queue
+    return get_job_queue()
+
+@st.cache_resource
+def load_search_index():
+    """Open the local index of earlier search results, shared with the planners' search tools."""
+    from TravelIndex import get_search_index
+    return get_search_index()
+
+@st.cache_resource
+def start_metrics_server():
+    """Expose pipeline metrics for Prometheus when TRAVEL_TRACING and TRAVEL_METRICS_PORT are set."""
+    from TravelTracing import ensure_metrics_server
+    return ensure_metrics_server()
+
+start_metrics_server()
+
 st.title("🌍 AI Travel Planner")
 st.subheader("Plan your perfect trip with AI assistance")
 
 # Sidebar for user inputs
 with st.sidebar:
     st.header("OpenAI API Key")
+    # The key is handed to this session's jobs only; the process environment is shared by every session
     openai_api_key = st.text_input("Enter your OpenAI API key", type="password")
     
-    if openai_api_key:
-        os.environ["OPENAI_API_KEY"] = openai_api_key
-    
     # Check if API key is set
     if not openai_api_key and not os.getenv("OPENAI_API_KEY"):
         st.error("Please enter your OpenAI API key.")
     
     st.header("Trip Details")
     starting_point = st.text_input("Starting Point", placeholder="e.g., New York, USA")
-    destination = st.text_input("Destination", placeholder="e.g., Tokyo, Japan")
+    compare_mode = st.checkbox("Compare several destinations", value=False,
+                               help="Plans each destination in full, then compares cost, travel time and highlights side by side.")
+    if compare_mode:
+        destination_list = [line.strip() for line in st.text_area(
+            "Destinations", placeholder="One per line, e.g.\nTokyo, Japan\nSeoul, South Korea"
+        ).splitlines() if line.strip()]
+        destination = ", ".join(destination_list)
+    else:
+        destination = st.text_input("Destination", placeholder="e.g., Tokyo, Japan")
     
     # Travel dates
     st.subheader("Travel Dates")
@@ -69,10 +97,316 @@ with st.sidebar:
         index=0
     )
     
+    route_models = st.checkbox(
+        "Use a faster model for research, recommendations and budget",
+        value=False,
+        help="Only the itinerary uses the selected model; each stage switches to a faster model if it nears its time or token budget."
+    )
+    
+    stream_output = st.checkbox("Stream output as it is generated", value=True)
+    
     submit_button = st.button("Generate Travel Plan")
+    
+    queue_stats = load_job_queue().stats()
+    st.caption(f"Planner queue: {queue_stats['queued']} waiting, "
+               f"{queue_stats['busy_workers']}/{queue_stats['workers']} planners busy, "
+               f"p95 wait {queue_stats['wait_p95_s']:.0f}s")
+    
+    index_stats = load_search_index().stats()
+    st.caption(f"Search index: {index_stats['documents']} results ({index_stats['size_bytes'] / 1e6:.1f} MB), "
+               f"{index_stats['hit_rate']:.0%} of lookups answered locally, "
+               f"p95 lookup {index_stats['latency_p95_s'] * 1000:.0f} ms")
+
+# Destinations one comparison can plan (TravelCompare.MAX_DESTINATIONS)
+MAX_COMPARED_DESTINATIONS = 5
+
+# Completed plans are kept in the session, keyed by the inputs they were generated from, so
+# downloads, tab switches and other reruns redraw the plan instead of losing it
+MAX_SAVED_PLANS = 5
+# Seconds between redraws of a running plan; short enough for streamed tokens to read as a live stream
+JOB_POLL_SECONDS = 0.5
+if "plans" not in st.session_state:
+    st.session_state.plans = {}
+    st.session_state.current_plan = None
+    # The plan being generated; also kept in the URL, so a refreshed page picks it up again
+    st.session_state.current_job = st.query_params.get("job")
+plans = st.session_state.plans
+
+# The trip as submitted to the job queue (TripSpec.from_dict fields, plus the destinations to compare)
+trip_spec = {
+    "starting_point": starting_point,
+    "destination": destination,
+    "dates": [str(start_date), str(end_date)],
+    "interests": interests,
+    "budget_level": budget_level,
+    "travel_style": travel_style,
+    "model": model_name,
+    "routing": "tiered" if route_models else "single",
+}
+if compare_mode:
+    trip_spec["destinations"] = destination_list
+
+def spec_plan_key(spec):
+    return json.dumps({key: value for key, value in spec.items() if key not in ("stream", "own_api_key")},
+                      sort_keys=True)
+
+plan_key = spec_plan_key(trip_spec)
+
+def spec_summary(spec):
+    start, end = (date.fromisoformat(value) for value in spec["dates"])
+    return {
+        "starting_point": spec["starting_point"],
+        "destination": spec["destination"],
+        "start_date": start,
+        "end_date": end,
+        "duration": (end - start).days,
+        "budget_level": spec["budget_level"],
+        "travel_style": spec["travel_style"],
+    }
+
+def show_trip_summary(summary):
+    st.markdown(f"""
+    ## Trip Summary:
+    - **Starting Point**: {summary['starting_point']}
+    - **Destination**: {summary['destination']}
+    - **Travel Dates**: {summary['start_date'].strftime('%B %d, %Y')} to {summary['end_date'].strftime('%B %d, %Y')} ({summary['duration']} days)
+    - **Budget Level**: {summary['budget_level']}
+    - **Travel Style**: {summary['travel_style']}
+    """)
+
+def stage_tab_headers(summary):
+    return {
+        "research": f"Destination Overview: {summary['destination']}",
+        "itinerary": f"Your {summary['duration']}-Day Itinerary",
+        "recommendations": "Local Recommendations",
+        "budget": "Budget Optimization",
+    }
+
+def stored_output(stage_results, stage_name):
+    # Read the stage output back from this run's artifact store entry
+    result = stage_results[stage_name]
+    if result.artifact is None:
+        return result.output
+    try:
+        return result.artifact.read()
+    except KeyError:
+        return result.output
+
+def show_plan(plan):
+    """Draw a completed plan from session state."""
+    summary = plan["summary"]
+    show_trip_summary(summary)
+    st.success("Your travel plan is ready!")
+    if "comparison" not in plan:
+        show_stage_results(summary, plan["results"], plan["key"])
+        return
+    
+    # A comparison: the side-by-side table, then the full plan of the chosen destination
+    st.markdown(plan["comparison"].output)
+    if plan["comparison"].error:
+        st.error(f"Error in comparison task: {plan['comparison'].error}")
+    destination = st.selectbox("Show the full plan for", options=list(plan["destinations"]),
+                               key=f"destination-{plan['key']}")
+    show_stage_results({**summary, "destination": destination}, plan["destinations"][destination],
+                       f"{plan['key']}-{destination}")
+
+def show_stage_results(summary, stage_results, key):
+    """Draw the stage tabs, pipeline details and downloads of one destination's plan."""
+    reused_stages = [name for name, result in stage_results.items() if result.reused]
+    if reused_stages:
+        time_saved = sum(stage_results[name].metrics["time_saved"] for name in reused_stages)
+        st.info(f"Reused unchanged stages ({', '.join(reused_stages)}), saving about {time_saved:.0f} seconds.")
+    
+    deadlines = deadline_summary(stage_results)
+    if deadlines.get("missed"):
+        skipped = (f" Stages that depend on them were skipped too ({', '.join(deadlines['skipped'])})."
+                   if deadlines.get("skipped") else "")
+        st.warning(f"Some stages ran out of time ({', '.join(deadlines['missed'])}).{skipped} "
+                   "Generate the plan again to retry them.")
+    if deadlines.get("finalize"):
+        st.caption(f"Finished early to meet the time limit: {', '.join(deadlines['finalize'])}")
+    
+    headers = stage_tab_headers(summary)
+    tabs = st.tabs(["Destination Overview", "Itinerary", "Local Recommendations", "Budget"])
+    for tab, (stage_name, header) in zip(tabs, headers.items()):
+        with tab:
+            st.header(header)
+            if stage_results[stage_name].error:
+                st.error(f"Error in {stage_name} task: {stage_results[stage_name].error}")
+            st.write(stage_results[stage_name].output)
+            # The budget engine's per-category totals, when the itinerary was structured
+            data = stage_results[stage_name].data
+            by_category = data.get("by_category") if isinstance(data, dict) else getattr(data, "by_category", None)
+            if by_category:
+                st.bar_chart({category.title(): amount for category, amount in by_category.items() if amount})
+    
+    with st.expander("Pipeline details"):
+        st.table([
+            {
+                "Stage": name,
+                "Model": (f"{result.metrics['model']} → {result.metrics['effective_model']}"
+                          if result.metrics.get("downgraded") else result.metrics.get("model", "-")),
+                "Time (s)": round(result.duration, 1),
+                "Deadline (s)": result.metrics.get("deadline_seconds", "-"),
+                "Deadline hit": result.metrics.get("deadline_hit") or "-",
+                "Reused": "yes" if result.reused else "no",
+                "Handoff tokens (before)": result.metrics.get("handoff_tokens_before", "-"),
+                "Handoff tokens (after)": result.metrics.get("handoff_tokens_after", "-"),
+                "Prompt tokens": result.metrics.get("prompt_tokens", "-"),
+                "LLM tokens in/out": (f"{result.metrics['tokens_in']}/{result.metrics['tokens_out']}"
+                                      if "tokens_in" in result.metrics else "-"),
+                "Cached prompt tokens": result.metrics.get("tokens_cached", "-"),
+                "Tool calls": result.metrics.get("tool_calls", "-"),
+            }
+            for name, result in stage_results.items()
+        ])
+    
+    # Add download buttons for each section
+    downloads = [
+        ("Download Overview", "research", "destination_overview.txt"),
+        ("Download Itinerary", "itinerary", "travel_itinerary.txt"),
+        ("Download Recommendations", "recommendations", "local_recommendations.txt"),
+        ("Download Budget Plan", "budget", "budget_plan.txt"),
+    ]
+    for column, (label, stage_name, file_name) in zip(st.columns(4), downloads):
+        with column:
+            st.download_button(
+                label=label,
+                data=stored_output(stage_results, stage_name),
+                file_name=file_name,
+                mime="text/plain",
+                key=f"download-{key}-{stage_name}"
+            )
+
+def finished_plan(job):
+    """Turn a finished job into a saved plan."""
+    summary = spec_summary(job.spec)
+    spec = job.spec
+    plan = {
+        "key": spec_plan_key(spec),
+        "label": f"{' vs '.join(spec.get('destinations') or [spec['destination']])} from {spec['starting_point']}, "
+                 f"{summary['start_date'].strftime('%b %d')} ({summary['duration']} days, {spec['model']})",
+        "summary": summary,
+        "results": job.stage_results(),
+    }
+    # Plans with failed or time-limited stages are shown but not reused, so generating them again retries those stages
+    plan["complete"] = not any(result.error or result.metrics.get("degraded") for result in plan["results"].values())
+    if spec.get("destinations"):
+        # Comparison stages are stored as "<destination>/<stage>"
+        plan["comparison"] = plan["results"].pop("comparison")
+        plan["destinations"] = {
+            destination: {name[len(destination) + 1:]: result for name, result in plan["results"].items()
+                          if name.startswith(f"{destination}/")}
+            for destination in spec["destinations"]
+        }
+    return plan
+
+def show_job(job):
+    """Draw the progress of a queued or running plan; each stage fills its tab as soon as it has output."""
+    summary = spec_summary(job.spec)
+    show_trip_summary(summary)
+    headers = stage_tab_headers(summary)
+    destinations = job.spec.get("destinations") or []
+    # A comparison plans every destination and then compares them in one more stage
+    total = len(destinations) * len(headers) + 1 if destinations else len(headers)
+    
+    if job.status == "queued":
+        st.info(f"Waiting for a free planner ({job.position} plans ahead of yours)...")
+    elif destinations:
+        planned = [destination for destination in destinations
+                   if all(f"{destination}/{name}" in job.stages for name in headers)]
+        st.info(f"Planning: {len(job.stages)} of {total} sections ready. "
+                f"Destinations planned: {', '.join(planned) or 'none yet'}")
+    else:
+        running = [header for name, header in headers.items() if name not in job.stages]
+        st.info(f"Planning: {len(job.stages)} of {len(headers)} sections ready. "
+                f"Still working on: {', '.join(running)}")
+    st.progress(10 + int(90 * len(job.stages) / total))
+    st.caption("You can refresh or close this page; the plan keeps running and shows up when you return to this link.")
+    
+    prefix = ""
+    if destinations:
+        destination = st.selectbox("Show progress for", options=destinations, key=f"progress-{job.id}")
+        headers = stage_tab_headers({**summary, "destination": destination})
+        prefix = f"{destination}/"
+    tabs = st.tabs(["Destination Overview", "Itinerary", "Local Recommendations", "Budget"])
+    for tab, (stage_name, header) in zip(tabs, headers.items()):
+        record_name = prefix + stage_name
+        with tab:
+            st.header(header)
+            if record_name in job.stages:
+                if job.stages[record_name]["error"]:
+                    st.error(f"Error in {stage_name} task: {job.stages[record_name]['error']}")
+                st.write(job.stages[record_name]["output"])
+            elif job.streamed.get(record_name):
+                st.markdown(job.streamed[record_name])
+            else:
+                st.info("Waiting for earlier stages...")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_job(job_id):
+    """Redraw a queued or running plan in place, without rerunning the rest of the page, until it finishes."""
+    job = load_job_queue().get(job_id)
+    if job is None or job.finished:
+        # Rerun the whole page, which saves the finished plan and shows it
+        st.rerun()
+    show_job(job)
+
+def save_plan(plan):
+    plans[plan["key"]] = plans.pop(plan["key"], plan)
+    while len(plans) > MAX_SAVED_PLANS:
+        del plans[next(iter(plans))]
+    st.session_state.current_plan = plan["key"]
 
 # Main content area
-if not submit_button:
+if submit_button:
+    if not os.getenv("OPENAI_API_KEY") and not openai_api_key:
+        st.error("Please enter your OpenAI API key.")
+        st.stop()
+        
+    if not destination or not interests or not starting_point:
+        st.error("Please fill in all required fields (Starting Point, Destination, and Interests).")
+        st.stop()
+    
+    if compare_mode and not 2 <= len(set(destination_list)) <= MAX_COMPARED_DESTINATIONS:
+        st.error(f"Enter between 2 and {MAX_COMPARED_DESTINATIONS} different destinations to compare, one per line.")
+        st.stop()
+    
+    # The same inputs were already planned in this session: show that plan instead of generating it again
+    if plan_key in plans and plans[plan_key]["complete"]:
+        save_plan(plans[plan_key])
+    else:
+        st.session_state.current_job = load_job_queue().submit({**trip_spec, "stream": stream_output},
+                                                                 api_key=openai_api_key or None)
+        st.query_params["job"] = st.session_state.current_job
+    # Redraw from session state, so this run and every later rerun show the same page
+    st.rerun()
+
+if st.session_state.current_job:
+    job = load_job_queue().get(st.session_state.current_job)
+    if job is None or job.finished:
+        st.session_state.current_job = None
+        st.query_params.pop("job", None)
+        if job is not None and job.status == "error":
+            st.error(f"An error occurred: {job.error}")
+        elif job is not None:
+            save_plan(finished_plan(job))
+    else:
+        poll_job(job.id)
+        # The running plan takes the page until it finishes
+        st.stop()
+
+if st.session_state.current_plan in plans:
+    if len(plans) > 1:
+        recent_keys = list(reversed(plans))
+        st.session_state.current_plan = st.selectbox(
+            "Recent plans",
+            options=recent_keys,
+            index=recent_keys.index(st.session_state.current_plan),
+            format_func=lambda key: plans[key]["label"]
+        )
+    show_plan(plans[st.session_state.current_plan])
+else:
     st.info("Fill in your trip details and click 'Generate Travel Plan' to get started.")
     
     # Display example output
@@ -97,203 +431,6 @@ if not submit_button:
         
         *And so on...*
         """)
-else:
-    if not os.getenv("OPENAI_API_KEY") and not openai_api_key:
-        st.error("Please enter your OpenAI API key.")
-        st.stop()
-        
-    if not destination or not interests or not starting_point:
-        st.error("Please fill in all required fields (Starting Point, Destination, and Interests).")
-        st.stop()
-    
-    # Display progress
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    # Create agents, tasks and crew
-    try:
-        status_text.text("Initializing AI agents...")
-        progress_bar.progress(10)
-        
-        agents = TravelAgents(model_name=model_name)
-        tasks = TravelTasks(agents)
-        
-        status_text.text("Researching destination...")
-        progress_bar.progress(20)
-        
-        # Format travel dates for task description
-        travel_date_info = f"Travel dates: {start_date.strftime('%B %d, %Y')} to {end_date.strftime('%B %d, %Y')} ({duration} days)"
-        
-        # Create research task
-        research_task = tasks.destination_research_task(
-            destination=destination,
-            starting_point=starting_point,
-            interests=interests,
-            duration=duration,
-            travel_date_info=travel_date_info
-        )
-        
-        # Execute research task
-        travel_crew = Crew(
-            agents=[agents.create_research_agent()],
-            tasks=[research_task],
-            verbose=True
-        )
-        try:
-            crew_output = travel_crew.kickoff()
-            research_results = str(crew_output) if not isinstance(crew_output, str) else crew_output
-        except Exception as e:
-            st.error(f"Error in research task: {str(e)}")
-            research_results = "Error occurred during research. Please try again."
-        
-        status_text.text("Creating itinerary...")
-        progress_bar.progress(50)
-        
-        # Create itinerary task
-        itinerary_task = tasks.itinerary_creation_task(
-            destination=destination,
-            starting_point=starting_point,
-            interests=interests,
-            duration=duration,
-            budget_level=budget_level,
-            travel_style=travel_style,
-            travel_date_info=travel_date_info,
-            research_report=research_results
-        )
-        
-        # Execute itinerary task
-        travel_crew = Crew(
-            agents=[agents.create_planning_agent()],
-            tasks=[itinerary_task],
-            verbose=True
-        )
-        try:
-            crew_output = travel_crew.kickoff()
-            itinerary_results = str(crew_output) if not isinstance(crew_output, str) else crew_output
-        except Exception as e:
-            st.error(f"Error in itinerary task: {str(e)}")
-            itinerary_results = "Error occurred during itinerary creation. Please try again."
-        
-        status_text.text("Finding local recommendations...")
-        progress_bar.progress(70)
-        
-        # Create local recommendations task
-        local_recommendations_task = tasks.local_recommendations_task(
-            destination=destination,
-            interests=interests,
-            research_report=research_results
-        )
-        
-        # Execute local recommendations task
-        travel_crew = Crew(
-            agents=[agents.create_local_expert_agent()],
-            tasks=[local_recommendations_task],
-            verbose=True
-        )
-        try:
-            crew_output = travel_crew.kickoff()
-            recommendations_results = str(crew_output) if not isinstance(crew_output, str) else crew_output
-        except Exception as e:
-            st.error(f"Error in recommendations task: {str(e)}")
-            recommendations_results = "Error occurred during recommendations. Please try again."
-        
-        status_text.text("Optimizing budget...")
-        progress_bar.progress(90)
-        
-        # Create budget optimization task
-        budget_task = tasks.budget_optimization_task(
-            destination=destination,
-            duration=duration,
-            budget_level=budget_level,
-            itinerary=itinerary_results
-        )
-        
-        # Execute budget optimization task
-        travel_crew = Crew(
-            agents=[agents.create_budget_optimization_agent()],
-            tasks=[budget_task],
-            verbose=True
-        )
-        try:
-            crew_output = travel_crew.kickoff()
-            budget_results = str(crew_output) if not isinstance(crew_output, str) else crew_output
-        except Exception as e:
-            st.error(f"Error in budget task: {str(e)}")
-            budget_results = "Error occurred during budget optimization. Please try again."
-        
-        status_text.text("Finalizing your travel plan...")
-        progress_bar.progress(100)
-        
-        # Display results
-        st.success("Your travel plan is ready!")
-        
-        # Display trip summary at the top
-        st.markdown(f"""
-        ## Trip Summary:
-        - **Starting Point**: {starting_point}
-        - **Destination**: {destination}
-        - **Travel Dates**: {start_date.strftime('%B %d, %Y')} to {end_date.strftime('%B %d, %Y')} ({duration} days)
-        - **Budget Level**: {budget_level}
-        - **Travel Style**: {travel_style}
-        """)
-        
-        # Create tabs for different sections
-        tab1, tab2, tab3, tab4 = st.tabs(["Destination Overview", "Itinerary", "Local Recommendations", "Budget"])
-        
-        with tab1:
-            st.header(f"Destination Overview: {destination}")
-            st.write(research_results)
-        
-        with tab2:
-            st.header(f"Your {duration}-Day Itinerary")
-            st.write(itinerary_results)
-        
-        with tab3:
-            st.header("Local Recommendations")
-            st.write(recommendations_results)
-        
-        with tab4:
-            st.header("Budget Optimization")
-            st.write(budget_results)
-        
-        # Add download buttons for each section
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.download_button(
-                label="Download Overview",
-                data=research_results,
-                file_name="destination_overview.txt",
-                mime="text/plain"
-            )
-        
-        with col2:
-            st.download_button(
-                label="Download Itinerary",
-                data=itinerary_results,
-                file_name="travel_itinerary.txt",
-                mime="text/plain"
-            )
-        
-        with col3:
-            st.download_button(
-                label="Download Recommendations",
-                data=recommendations_results,
-                file_name="local_recommendations.txt",
-                mime="text/plain"
-            )
-        
-        with col4:
-            st.download_button(
-                label="Download Budget Plan",
-                data=budget_results,
-                file_name="budget_plan.txt",
-                mime="text/plain"
-            )
-        
-    except Exception as e:
-        st.error(f"An error occurred: {str(e)}")
-        st.stop()
 
 if __name__ == "__main__":
     st.sidebar.markdown("---")
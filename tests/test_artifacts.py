@@ -0,0 +1,76 @@
+import os
+import time
+
+import pytest
+
+from TravelArtifacts import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+def blobs(store):
+    return sorted(name for _, _, files in os.walk(os.path.join(store.root, "blobs")) for name in files)
+
+
+def test_output_can_be_read_back_before_and_after_the_write(store):
+    ref = store.put("run1", "itinerary", "# Tokyo\nDay 1", {"trip": {"destination": "Tokyo"}})
+
+    assert ref.read() == "# Tokyo\nDay 1"
+    store.flush()
+    assert store.read("run1", "itinerary") == "# Tokyo\nDay 1"
+    manifest = store.manifest("run1")
+    assert manifest["trip"] == {"destination": "Tokyo"}
+    assert manifest["artifacts"]["itinerary"]["size"] == len("# Tokyo\nDay 1")
+
+
+def test_identical_outputs_are_stored_once(store):
+    store.put("run1", "research", "Same report")
+    store.put("run2", "research", "Same report")
+    store.put("run2", "budget", "Different")
+    store.flush()
+
+    assert len(blobs(store)) == 2
+    assert store.read("run2", "research") == "Same report"
+
+
+def test_unknown_artifacts_raise_key_error(store):
+    store.put("run1", "research", "Report").read()
+
+    with pytest.raises(KeyError):
+        store.read("run1", "budget")
+    with pytest.raises(KeyError):
+        store.read("run2", "research")
+
+
+def test_old_runs_and_their_blobs_are_pruned(store, monkeypatch):
+    store.put("old", "research", "Old report")
+    store.put("old", "budget", "Shared budget")
+    store.flush()
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + store.max_age + 1)
+    store.put("new", "budget", "Shared budget")
+    store.flush()
+
+    assert store.prune() == {"runs": 1, "blobs": 1}
+    assert store.manifest("old") is None
+    assert store.read("new", "budget") == "Shared budget"
+    with pytest.raises(KeyError):
+        store.read("old", "research")
+
+
+def test_oldest_runs_are_pruned_to_fit_the_size_limit(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    now = time.time()
+    for offset, run_id in enumerate(("first", "second")):
+        monkeypatch.setattr(time, "time", lambda: now + offset)
+        store.put(run_id, "research", f"Report of the {run_id} run").read()
+    # Room for one run's blob but not two
+    sizes = [os.path.getsize(os.path.join(store.root, "blobs", name[:2], name)) for name in blobs(store)]
+    store.max_total_bytes = max(sizes) + min(sizes) // 2
+
+    assert store.prune() == {"runs": 1, "blobs": 1}
+    assert store.manifest("first") is None
+    assert store.read("second", "research") == "Report of the second run"
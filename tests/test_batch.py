@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+pytest.importorskip("crewai")
+
+import TravelBatch
+from TravelBatch import run_batch, trip_id
+from TravelPipeline import StageResult
+
+
+def spec(destination, **fields):
+    return {"starting_point": "New York", "destination": destination, "dates": ["2025-06-01", "2025-06-04"],
+            "interests": ["food"], **fields}
+
+
+@pytest.fixture
+def planned(monkeypatch):
+    """Plan trips without an LLM; "Nowhere" fails, "Slowtown" has a stage abandoned at its deadline."""
+    planned = []
+
+    def plan_trip(trip, routing=None):
+        planned.append(trip.destination)
+        if trip.destination == "Nowhere":
+            raise RuntimeError("no such place")
+        metrics = {"degraded": True} if trip.destination == "Slowtown" else {}
+        return {"itinerary": StageResult("itinerary", f"Plan for {trip.destination}", 0.0, 1.0, metrics=metrics)}
+
+    monkeypatch.setattr(TravelBatch, "plan_trip", plan_trip)
+    return planned
+
+
+def write_specs(path, *specs):
+    path.write_text("".join(json.dumps(record) + "\n" for record in specs) + "\n")
+    return str(path)
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_trip_ids_are_stable_hashes_unless_given():
+    assert trip_id(spec("Tokyo")) == trip_id(dict(reversed(list(spec("Tokyo").items()))))
+    assert trip_id(spec("Tokyo")) != trip_id(spec("Seoul"))
+    assert trip_id(spec("Tokyo", id="tokyo-june")) == "tokyo-june"
+
+
+def test_every_trip_gets_a_record(tmp_path, planned):
+    specs = write_specs(tmp_path / "trips.jsonl", spec("Tokyo"), spec("Nowhere"), spec("Slowtown"), spec("Tokyo"))
+    output = tmp_path / "results.jsonl"
+
+    counts = run_batch(specs, str(output), workers=2)
+
+    # The duplicate spec is planned once and counted as skipped
+    assert counts == {"ok": 1, "error": 1, "degraded": 1, "skipped": 1}
+    assert sorted(planned) == ["Nowhere", "Slowtown", "Tokyo"]
+    records = {record["spec"]["destination"]: record for record in read_records(output)}
+    assert records["Tokyo"]["stages"]["itinerary"]["output"] == "Plan for Tokyo"
+    assert records["Nowhere"]["error"] == "no such place"
+    assert records["Slowtown"]["degraded_stages"] == ["itinerary"]
+
+
+def test_rerun_only_plans_trips_that_did_not_succeed(tmp_path, planned):
+    specs = write_specs(tmp_path / "trips.jsonl", spec("Tokyo"), spec("Nowhere"), spec("Slowtown"))
+    output = tmp_path / "results.jsonl"
+    run_batch(specs, str(output))
+    planned.clear()
+
+    counts = run_batch(specs, str(output))
+
+    assert counts == {"ok": 0, "error": 1, "degraded": 1, "skipped": 1}
+    assert sorted(planned) == ["Nowhere", "Slowtown"]
+    assert len(read_records(output)) == 5
+
+
+def test_resume_ignores_a_partially_written_last_line(tmp_path, planned):
+    specs = write_specs(tmp_path / "trips.jsonl", spec("Tokyo"), spec("Seoul"))
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"id": trip_id(spec("Tokyo")), "status": "ok"}) + "\n"
+                      + '{"id": "' + trip_id(spec("Seoul")) + '", "stat')
+
+    counts = run_batch(specs, str(output))
+
+    assert counts["skipped"] == 1
+    assert planned == ["Seoul"]
+
+
+def test_without_resume_every_trip_is_planned_again(tmp_path, planned):
+    specs = write_specs(tmp_path / "trips.jsonl", spec("Tokyo"))
+    output = tmp_path / "results.jsonl"
+    run_batch(specs, str(output))
+
+    assert run_batch(specs, str(output), resume=False)["ok"] == 1
+    assert planned == ["Tokyo", "Tokyo"]
@@ -0,0 +1,70 @@
+import pytest
+
+from TravelBudget import BudgetEngine
+from TravelItinerary import Itinerary, ItineraryDay, ItineraryItem
+
+
+def itinerary(**days):
+    """An itinerary from "d<day>" -> [(category, name, cost)]."""
+    return Itinerary(destination="Tokyo", currency="JPY", days=[
+        ItineraryDay(day=int(key[1:]), title=key, items=[
+            ItineraryItem(category=category, name=name, estimated_cost=cost) for category, name, cost in items])
+        for key, items in days.items()
+    ])
+
+
+TRIP = itinerary(
+    d1=[("transport", "Narita Express", 3000), ("accommodation", "Hotel", 20000), ("meal", "Ramen", 1000)],
+    d2=[("activity", "Senso-ji Temple", 0), ("activity", "teamLab", 3800), ("meal", "Sushi", 6000)],
+    d3=[("accommodation", "Ryokan", 40000), ("other", "SIM card", 2000)],
+)
+
+
+def test_totals_by_category_and_day():
+    breakdown = BudgetEngine().breakdown(TRIP)
+
+    assert breakdown.total == 75800
+    assert breakdown.currency == "JPY"
+    assert breakdown.by_category == {"transport": 3000, "accommodation": 60000, "activity": 3800,
+                                     "meal": 7000, "other": 2000}
+    assert breakdown.by_day == {1: 24000, 2: 9800, 3: 42000}
+
+
+def test_days_are_totalled_whatever_their_order_and_numbering():
+    trip = itinerary(d5=[("meal", "Dinner", 50)], d2=[("meal", "Lunch", 20), ("meal", "Dinner", 30)])
+
+    assert BudgetEngine().breakdown(trip).by_day == {2: 50, 5: 50}
+
+
+def test_other_levels_rescale_each_category():
+    moderate = BudgetEngine().breakdown(TRIP, "Moderate")
+    budget = BudgetEngine().breakdown(TRIP, "Budget")
+
+    assert moderate.by_level["Moderate"] == pytest.approx(75800)
+    # Accommodation is 45% of its Moderate price at the Budget level, meals 55%
+    assert moderate.by_level["Budget"] == pytest.approx(0.7 * 3000 + 0.45 * 60000 + 0.7 * 3800
+                                                        + 0.55 * 7000 + 0.7 * 2000)
+    # Planned at the Budget level, the same costs are scaled up to the others
+    assert budget.by_level["Budget"] == pytest.approx(75800)
+    assert budget.by_level["Moderate"] == pytest.approx(3000 / 0.7 + 60000 / 0.45 + 3800 / 0.7
+                                                        + 7000 / 0.55 + 2000 / 0.7)
+
+
+def test_unknown_level_is_treated_as_moderate():
+    assert BudgetEngine().breakdown(TRIP, "Backpacker").budget_level == "Moderate"
+
+
+def test_most_expensive_items_skip_free_ones():
+    breakdown = BudgetEngine(top_items=3).breakdown(TRIP)
+
+    assert breakdown.top_items == [(3, "Ryokan", 40000), (1, "Hotel", 20000), (2, "Sushi", 6000)]
+    assert all(cost > 0 for _, _, cost in BudgetEngine(top_items=20).breakdown(TRIP).top_items)
+
+
+def test_empty_itinerary_totals_zero():
+    breakdown = BudgetEngine().breakdown(Itinerary(destination="Tokyo", days=[]))
+
+    assert breakdown.total == 0
+    assert breakdown.by_day == {}
+    assert breakdown.top_items == []
+    assert "Estimated total per traveler: **0 USD**" in breakdown.to_markdown()
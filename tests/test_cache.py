@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from TravelCache import PersistentLRUCache, SearchCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PersistentLRUCache(str(tmp_path / "cache.sqlite"), max_entries=3)
+
+
+def test_get_returns_stored_value_and_counts_hits(cache):
+    cache.set("a", "1")
+    assert cache.get("a") == "1"
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entry_is_a_miss_unless_allowed(cache, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("a", "1", ttl=10)
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.get("a", allow_expired=True) == "1"
+
+
+def test_default_ttl_applies_when_set_without_one(tmp_path, monkeypatch):
+    cache = PersistentLRUCache(str(tmp_path / "cache.sqlite"), default_ttl=5)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("a", "1")
+    monkeypatch.setattr(time, "time", lambda: now + 6)
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted(cache, monkeypatch):
+    clock = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+        clock[0] += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == "a"
+    clock[0] += 1
+    cache.set("d", "d")
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_evicted_before_live_ones(cache, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("stale", "x", ttl=1)
+    cache.set("a", "a")
+    cache.set("b", "b")
+    monkeypatch.setattr(time, "time", lambda: now + 2)
+    cache.set("c", "c")
+    assert len(cache) == 3
+    assert cache.get("stale", allow_expired=True) is None
+    assert [cache.get(key) for key in ("a", "b", "c")] == ["a", "b", "c"]
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    PersistentLRUCache(path, table="search").set("a", "1")
+    assert PersistentLRUCache(path, table="search").get("a") == "1"
+    assert PersistentLRUCache(path, table="pages").get("a") is None
+
+
+def test_invalid_table_name_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        PersistentLRUCache(str(tmp_path / "cache.sqlite"), table="cache; DROP TABLE x")
+
+
+def test_expired_entries_can_be_kept_for_revalidation(tmp_path, monkeypatch):
+    cache = PersistentLRUCache(str(tmp_path / "cache.sqlite"), max_entries=2, keep_expired=True)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("stale", "x", ttl=1)
+    monkeypatch.setattr(time, "time", lambda: now + 2)
+    cache.set("a", "a")
+    assert cache.get("stale") is None
+    assert cache.get("stale", allow_expired=True) == "x"
+    # Expired entries still leave by LRU order once the cache is full
+    monkeypatch.setattr(time, "time", lambda: now + 3)
+    assert cache.get("a") == "a"
+    cache.set("b", "b")
+    assert cache.get("stale", allow_expired=True) is None
+
+
+def test_search_cache_keys_on_the_normalized_query(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite"))
+    results = [{"title": "Shinkansen", "href": "https://example.com", "body": "2h15"}]
+    cache.set("Tokyo to  Kyoto train", 5, results)
+
+    assert cache.get(" tokyo to kyoto TRAIN", 5) == results
+    assert cache.get("kyoto to tokyo train", 5) is None
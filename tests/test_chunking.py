@@ -0,0 +1,115 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("crewai")
+
+import TravelChunking
+from TravelChunking import chunk_ranges, fit_block, merge_chunks, run_chunked_itinerary
+from TravelItinerary import Itinerary, ItineraryDay, ItineraryItem, ItineraryOutline, OutlineDay
+from TravelPipeline import TripSpec
+
+
+def block(*days, **activities):
+    """An itinerary with the given day numbers; `activities` maps "d<day>" to that day's activity names."""
+    return Itinerary(destination="Tokyo", days=[
+        ItineraryDay(day=day, title=f"Day {day}", items=[
+            ItineraryItem(category="activity", name=name) for name in activities.get(f"d{day}", [])
+        ] + [ItineraryItem(category="meal", name="Ramen")])
+        for day in days
+    ])
+
+
+def test_chunk_ranges_cover_the_trip_in_blocks():
+    assert chunk_ranges(7, 3) == [(1, 3), (4, 6), (7, 7)]
+    assert chunk_ranges(6, 3) == [(1, 3), (4, 6)]
+    assert chunk_ranges(2, 5) == [(1, 2)]
+
+
+def test_merge_drops_attractions_planned_by_an_earlier_block():
+    first = block(1, 2, d1=["Senso-ji Temple"], d2=["Meiji Shrine"])
+    second = block(3, 4, d3=["Visit the Senso-ji temple", "Ueno Park"], d4=["Ueno Park"])
+
+    merged, duplicates = merge_chunks("Tokyo", [first, second], [(1, 2), (3, 4)])
+
+    assert duplicates == [(3, "Visit the Senso-ji temple")]
+    assert [[item.name for item in day.items] for day in merged.days] == [
+        ["Senso-ji Temple", "Ramen"], ["Meiji Shrine", "Ramen"],
+        # A block may revisit its own attractions, and meals are never duplicates
+        ["Ueno Park", "Ramen"], ["Ueno Park", "Ramen"],
+    ]
+
+
+def test_merge_renumbers_a_block_that_restarts_at_day_one():
+    merged, _ = merge_chunks("Tokyo", [block(1, 2), block(2, 1)], [(1, 2), (3, 4)])
+
+    assert [day.day for day in merged.days] == [1, 2, 3, 4]
+    assert [day.title for day in merged.days] == ["Day 1", "Day 2", "Day 1", "Day 2"]
+
+
+def test_merge_rejects_blocks_with_missing_or_extra_days():
+    with pytest.raises(ValueError):
+        merge_chunks("Tokyo", [block(1, 2), block()], [(1, 2), (3, 4)])
+    with pytest.raises(ValueError):
+        merge_chunks("Tokyo", [block(1, 2, 3)], [(1, 2)])
+
+
+def test_fit_block_keeps_correct_blocks_as_they_are():
+    correct = block(4, 3)
+    assert fit_block(correct, 3, 4) is correct
+    assert fit_block(block(3), 3, 4) is None
+
+
+class FakeTasks:
+    """Builds outline and block tasks as plain records of what was asked for."""
+
+    def itinerary_outline_task(self, **kwargs):
+        return SimpleNamespace(kind="outline")
+
+    def itinerary_chunk_task(self, first_day, last_day, retry=False, **kwargs):
+        return SimpleNamespace(kind="chunk", days=(first_day, last_day), retry=retry)
+
+
+def run(monkeypatch, answer, outline_days=7):
+    """Run a 7-day trip in blocks of 3, with `answer(days, retry)` returning each block's itinerary."""
+    asked = []
+
+    def kickoff(task):
+        if task.kind == "outline":
+            return SimpleNamespace(pydantic=ItineraryOutline(days=[
+                OutlineDay(day=day, region="Tokyo", theme="Food") for day in range(1, outline_days + 1)]))
+        asked.append((task.days, task.retry))
+        return SimpleNamespace(pydantic=answer(task.days, task.retry))
+
+    monkeypatch.setattr(TravelChunking, "_kickoff", kickoff)
+    trip = TripSpec("New York", "Tokyo", date(2025, 6, 1), date(2025, 6, 8), ["food"])
+    return run_chunked_itinerary(FakeTasks(), trip, {"research": "notes"}, 3), asked
+
+
+def test_only_the_failed_block_is_planned_again(monkeypatch):
+    def answer(days, retry):
+        first, last = days
+        if days == (4, 6) and not retry:
+            return block(4, 5)
+        return block(*range(first, last + 1))
+
+    chunked, asked = run(monkeypatch, answer)
+
+    assert sorted(asked) == [((1, 3), False), ((4, 6), False), ((4, 6), True), ((7, 7), False)]
+    assert [day.day for day in chunked.itinerary.days] == list(range(1, 8))
+    assert chunked.metrics()["retried_chunks"] == 1
+
+
+def test_a_block_that_fails_its_retry_falls_back(monkeypatch):
+    chunked, asked = run(monkeypatch, lambda days, retry: block(7, 8) if days == (7, 7) else block(1, 2, 3))
+
+    assert chunked is None
+    assert sorted(asked)[-2:] == [((7, 7), False), ((7, 7), True)]
+
+
+def test_an_outline_with_the_wrong_number_of_days_falls_back(monkeypatch):
+    chunked, asked = run(monkeypatch, lambda days, retry: block(*range(days[0], days[1] + 1)), outline_days=5)
+
+    assert chunked is None
+    assert asked == []
@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("litellm")
+
+import TravelCompare
+from TravelArtifacts import ArtifactStore
+from TravelCompare import compare_destinations
+from TravelItinerary import Itinerary, ItineraryDay, ItineraryItem
+from TravelPipeline import StageResult, TripSpec
+
+TRIP = TripSpec("New York", "Tokyo", date(2025, 6, 1), date(2025, 6, 8), ["food"])
+STAGES = ("research", "itinerary", "recommendations", "budget")
+
+
+class FakeAgents:
+    def __init__(self, **kwargs):
+        pass
+
+    def release_agents(self, discard=()):
+        pass
+
+
+class FakePipeline:
+    """Plans each destination without an LLM and records what the comparison stage is given."""
+
+    comparisons = []
+
+    def __init__(self, agents, **options):
+        pass
+
+    def run(self, trip, on_stage_complete=None, on_event=None, run_id=None):
+        results = {}
+        for name in STAGES:
+            data = None
+            if name == "itinerary":
+                data = Itinerary(destination=trip.destination, days=[ItineraryDay(
+                    day=1, title=f"Arrival in {trip.destination}",
+                    items=[ItineraryItem(category="meal", name="Dinner", estimated_cost=40)])])
+            results[name] = StageResult(name, f"{name} for {trip.destination}", 0.0, 1.0, data=data)
+            if on_stage_complete:
+                on_stage_complete(TravelCompare.PlanningStage(name, "", (), None, ""), results[name],
+                                  len(results), len(STAGES))
+        return results
+
+    def run_stage(self, stage, trip, outputs):
+        FakePipeline.comparisons.append((stage.name, trip.destination, outputs["summaries"]))
+        return StageResult(stage.name, "compared", 0.0, 1.0)
+
+
+@pytest.fixture(autouse=True)
+def fakes(monkeypatch, tmp_path):
+    FakePipeline.comparisons = []
+    monkeypatch.setattr(TravelCompare, "TravelAgents", FakeAgents)
+    monkeypatch.setattr(TravelCompare, "PlanningPipeline", FakePipeline)
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    monkeypatch.setattr(TravelCompare, "get_artifact_store", lambda: store)
+
+
+def test_comparison_stage_reads_every_plan():
+    comparison = compare_destinations(TRIP, ["Tokyo", "Seoul", "Tokyo ", "Taipei"])
+
+    assert comparison.destinations == ["Tokyo", "Seoul", "Taipei"]
+    [(stage, destinations, summaries)] = FakePipeline.comparisons
+    assert (stage, destinations) == ("comparison", "Tokyo, Seoul, Taipei")
+    for destination in comparison.destinations:
+        assert f"## {destination}" in summaries
+        assert f"Arrival in {destination}" in summaries
+        assert comparison.digests[destination].cost == 40
+    assert "| Seoul | 40 USD |" in comparison.result.output
+
+
+def test_stages_are_reported_per_destination():
+    completed = []
+
+    compare_destinations(TRIP, ["Tokyo", "Seoul"],
+                         on_stage_complete=lambda destination, stage, result: completed.append(
+                             (destination, stage.name, result.output)))
+
+    assert sorted(completed[:-1]) == sorted((destination, name, f"{name} for {destination}")
+                                            for destination in ("Tokyo", "Seoul") for name in STAGES)
+    assert completed[-1][:2] == ("comparison", "comparison")
+
+
+def test_destination_count_is_checked():
+    with pytest.raises(ValueError):
+        compare_destinations(TRIP, ["Tokyo", "Tokyo "])
@@ -0,0 +1,54 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from TravelDeadline import DeadlinePolicy, StageCancelledError, StageDeadline
+
+
+def test_only_web_searches_use_the_allowance():
+    deadline = StageDeadline(DeadlinePolicy(max_tool_calls=2), None)
+
+    # Cache and index answers only check that the stage may still use tools
+    for _ in range(5):
+        assert not deadline.refuse_tool_call()
+    assert deadline.allow_tool_call()
+    assert deadline.allow_tool_call()
+    assert not deadline.allow_tool_call()
+    assert deadline.metrics()["tool_calls_refused"] == 1
+
+
+def test_tools_are_refused_once_the_stage_must_finalize():
+    policy = DeadlinePolicy(finalize_at=0.5)
+    deadline = StageDeadline(policy, time.monotonic() + 4, started=time.monotonic() - 6)
+
+    assert deadline.refuse_tool_call()
+    assert not deadline.allow_tool_call()
+    assert deadline.metrics()["deadline_hit"] == "finalize"
+
+
+def test_an_abandoned_stage_is_cancelled():
+    deadline = StageDeadline(DeadlinePolicy(), time.monotonic() + 60)
+    deadline.check_cancelled()
+
+    deadline.miss()
+
+    with pytest.raises(StageCancelledError):
+        deadline.check_cancelled()
+    assert deadline.refuse_tool_call()
+    assert deadline.hit == "missed"
+
+
+def test_slo_is_split_along_the_longest_path():
+    stages = [SimpleNamespace(name="research", depends_on=()),
+              SimpleNamespace(name="itinerary", depends_on=("research",)),
+              SimpleNamespace(name="recommendations", depends_on=("research",)),
+              SimpleNamespace(name="budget", depends_on=("itinerary",))]
+    offsets = DeadlinePolicy(slo_seconds=100).stage_offsets(stages)
+
+    # research -> itinerary -> budget is 0.3 + 0.45 + 0.25 = 1.0 of the SLO
+    assert offsets["research"] == pytest.approx(30)
+    assert offsets["itinerary"] == pytest.approx(75)
+    assert offsets["recommendations"] == pytest.approx(60)
+    assert offsets["budget"] == pytest.approx(100)
+    assert DeadlinePolicy(slo_seconds=None).stage_offsets(stages) == {}
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import httpx
+import pytest
+
+from TravelCache import PageCache
+from TravelFetch import PageFetcher, extract_main_text
+
+ARTICLE = """<html><head><title>Tokyo in Spring | Guide</title><script>var x = 1;</script></head>
+<body>
+<nav><a href="/">Home</a> <a href="/tokyo">Tokyo travel guides and city maps for every season</a></nav>
+<header>Subscribe to our newsletter for the latest travel deals and tips</header>
+<main>
+<h1>Tokyo</h1>
+<p>Cherry blossoms in Ueno Park usually peak in early April, drawing large crowds of picnickers.</p>
+<p>Share</p>
+<p>The Yamanote Line loops around central Tokyo and stops at Shinjuku, Shibuya and Ueno stations.</p>
+</main>
+<footer>Copyright 2025 Example Travel Media, all rights reserved worldwide.</footer>
+</body></html>"""
+
+
+def html_response(body, **headers):
+    return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8", **headers}, text=body)
+
+
+def fetcher(handler, **options):
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    return PageFetcher(client=client, **options)
+
+
+def test_extract_main_text_drops_page_chrome_and_short_blocks():
+    title, text = extract_main_text(ARTICLE)
+    assert title == "Tokyo in Spring | Guide"
+    assert text.split("\n\n") == [
+        "Cherry blossoms in Ueno Park usually peak in early April, drawing large crowds of picnickers.",
+        "The Yamanote Line loops around central Tokyo and stops at Shinjuku, Shibuya and Ueno stations.",
+    ]
+
+
+def test_digest_prefers_passages_matching_the_query():
+    pages = {
+        "https://a.example/": ARTICLE,
+        "https://b.example/": "<p>Hotels near Shinjuku station range from capsule hotels to luxury towers.</p>",
+    }
+    digest = fetcher(lambda request: html_response(pages[str(request.url)]), max_chars_per_page=100).digest(
+        "yamanote line stations", [{"href": url} for url in pages] + [{"href": "javascript:void(0)"}])
+    assert digest.startswith("Source: Tokyo in Spring | Guide\n   Link: https://a.example/")
+    assert "Yamanote Line" in digest
+    assert "Cherry blossoms" not in digest
+    assert "Hotels near Shinjuku" in digest
+
+
+def test_failed_and_non_html_pages_are_left_out():
+    def handler(request):
+        if request.url.host == "missing.example":
+            return httpx.Response(404)
+        if request.url.host == "pdf.example":
+            return httpx.Response(200, headers={"content-type": "application/pdf"}, content=b"%PDF")
+        return html_response(ARTICLE)
+
+    pages = fetcher(handler).fetch_many(["https://missing.example/", "https://pdf.example/", "https://ok.example/"])
+    assert [page.url for page in pages] == ["https://ok.example/"]
+
+
+def test_expired_pages_are_revalidated_with_their_etag(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return html_response(ARTICLE, etag='"v1"')
+
+    page_fetcher = fetcher(handler, cache=PageCache(str(tmp_path / "pages.sqlite"), ttl=0))
+    first = page_fetcher.fetch("https://a.example/")
+    second = page_fetcher.fetch("https://a.example/")
+    assert requests == [None, '"v1"']
+    assert not first.cached
+    assert second.cached
+    assert second.text == first.text
+
+
+def trickling_handler(calls):
+    # Sends the page a few bytes at a time: no single read is slow, the page as a whole is
+    def handler(request):
+        calls.append(str(request.url))
+
+        def body():
+            yield b"<p>" + b"x" * 50
+            for _ in range(40):
+                time.sleep(0.05)
+                yield b"x"
+            yield b"</p>"
+
+        return httpx.Response(200, headers={"content-type": "text/html"}, content=body())
+    return handler
+
+
+def test_a_page_is_abandoned_at_its_total_deadline():
+    page_fetcher = fetcher(trickling_handler([]), timeout=0.3)
+    started = time.monotonic()
+    assert page_fetcher.fetch("https://slow.example/") is None
+    assert time.monotonic() - started < 1.0
+
+
+def test_fetches_still_queued_at_the_deadline_are_cancelled():
+    calls = []
+    page_fetcher = fetcher(trickling_handler(calls), timeout=0.3, max_workers=1)
+    started = time.monotonic()
+    pages = page_fetcher.fetch_many([f"https://slow{number}.example/" for number in range(4)])
+    assert pages == []
+    assert time.monotonic() - started < 1.5
+    # The worker is free again: queued pages were not fetched after the batch gave up on them
+    assert page_fetcher._executor.submit(lambda: threading.current_thread().name).result(timeout=1)
+    assert calls == ["https://slow0.example/"]
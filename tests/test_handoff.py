@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("litellm")
+
+from TravelHandoff import ContextBudget, split_sections
+
+RESEARCH_REPORT = """**Tokyo, Japan Travel Report (April 18, 2025 - April 21, 2025)**
+
+1. **Main Attractions and Points of Interest:**
+   - **Senso-ji Temple:** The oldest temple in Tokyo, rich in history and culture.
+   - **Meiji Shrine:** A serene shrine surrounded by a lush forest.
+
+2. **Typical Weather Conditions:**
+   - April temperatures range from 10°C to 18°C.
+**Rain:**
+   - Expect 3 to 8 days of rain; carry an umbrella.
+
+3. **Transportation Options Within Tokyo:**
+**Trains:**
+   - The JR Yamanote Line loops around central Tokyo.
+**Taxis:**
+   - Readily available, though more expensive than public transport.
+
+4. **Local Customs and Cultural Norms:**
+   - Tipping is not customary in Japan.
+
+5. **Transportation from New York, USA to Tokyo, Japan:**
+   - Direct flights from JFK to Narita and Haneda take about 14 hours.
+"""
+
+
+def test_numbered_headings_split_the_report():
+    headings = [heading for heading, _ in split_sections(RESEARCH_REPORT)]
+    assert headings == ["", "Main Attractions and Points of Interest:", "Typical Weather Conditions:",
+                        "Transportation Options Within Tokyo:", "Local Customs and Cultural Norms:",
+                        "Transportation from New York, USA to Tokyo, Japan:"]
+
+
+def test_bold_sub_headings_stay_in_their_section():
+    sections = dict(split_sections(RESEARCH_REPORT))
+    assert "Yamanote Line" in sections["Transportation Options Within Tokyo:"]
+    assert "Readily available" in sections["Transportation Options Within Tokyo:"]
+    assert "umbrella" in sections["Typical Weather Conditions:"]
+
+
+def test_markdown_headings_split_the_report():
+    report = "Intro\n## Getting There\nFly into Narita.\n### Weather\nMild.\n"
+    assert split_sections(report) == [("", "Intro"), ("Getting There", "## Getting There\nFly into Narita."),
+                                      ("Weather", "### Weather\nMild.")]
+
+
+def test_itinerary_handoff_keeps_transport_and_weather_details():
+    result = ContextBudget().compact("itinerary", "research", RESEARCH_REPORT)
+    assert result.sections == ["Typical Weather Conditions:", "Transportation Options Within Tokyo:",
+                               "Transportation from New York, USA to Tokyo, Japan:"]
+    for detail in ("umbrella", "Yamanote Line", "Readily available", "JFK"):
+        assert detail in result.text
+    assert "Senso-ji" not in result.text
+    assert "Tipping" not in result.text
+    assert result.tokens_after < result.tokens_before
+
+
+def test_handoff_is_capped_at_the_stage_budget():
+    budget = ContextBudget(stage_budgets={"itinerary": 20})
+    result = budget.compact("itinerary", "research", RESEARCH_REPORT)
+    assert result.tokens_after <= 30
+    assert result.text.endswith("[...truncated]")
+
+
+def test_stages_without_a_profile_get_the_full_text():
+    result = ContextBudget().compact("research", "itinerary", RESEARCH_REPORT)
+    assert result.text == RESEARCH_REPORT
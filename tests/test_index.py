@@ -0,0 +1,52 @@
+import pytest
+
+from TravelIndex import SearchIndex, query_terms
+
+TOKYO_RESULTS = [
+    {"title": "Tokyo to Kyoto by Shinkansen", "href": "https://example.com/shinkansen",
+     "body": "The train from Tokyo to Kyoto takes just over two hours."},
+    {"title": "Tokyo to Kyoto train guide", "href": "https://example.com/guide",
+     "body": "Which Tokyo to Kyoto train ticket to buy and where to sit."},
+    {"title": "Cheapest way from Tokyo to Kyoto", "href": "https://example.com/cheap",
+     "body": "Night buses and the Tokyo to Kyoto train compared."},
+    {"title": "Tokyo Dome tours", "href": "https://example.com/dome",
+     "body": "Things to do around Tokyo Dome, including artisan markets."},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.sqlite"))
+    index.add("tokyo to kyoto train", TOKYO_RESULTS)
+    return index
+
+
+def test_terms_keep_the_query_order_and_drop_short_and_filler_words():
+    assert query_terms("Best way from Tokyo to Kyoto by train") == (
+        ["way", "tokyo", "kyoto", "train"], [("tokyo", "kyoto")])
+    assert query_terms("what to do") == ([], [])
+
+
+def test_reworded_search_is_answered_locally(index):
+    results = index.lookup("Trains Tokyo to Kyoto")
+
+    assert results is not None
+    assert {result["href"] for result in results} >= {"https://example.com/shinkansen", "https://example.com/guide"}
+    assert index.stats()["hits"] == 1
+
+
+def test_reversed_route_misses(index):
+    assert index.lookup("kyoto to tokyo train") is None
+    assert index.stats()["misses"] == 1
+
+
+def test_unrelated_queries_miss(index):
+    # "to" and "do" used to be covered by "tokyo" and "dome"
+    assert index.lookup("what to do") is None
+    # Short words only match whole words: "art" is not "artisan"
+    assert index.lookup("tokyo art") is None
+    assert index.lookup("osaka castle") is None
+
+
+def test_plural_terms_are_covered_by_their_stem(index):
+    assert [result["href"] for result in index.search("tokyo tours", limit=5)] == ["https://example.com/dome"]
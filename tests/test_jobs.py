@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+
+import pytest
+
+from TravelJobs import DONE, ERROR, QUEUED, RUNNING, JobQueue
+
+SPEC = {"starting_point": "New York", "destination": "Tokyo", "duration": 3}
+
+
+def wait_until_finished(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    # Stand in for the planner: record what each job ran with
+    executed = []
+
+    def execute(queue, job_id, spec):
+        with queue._lock:
+            api_key = queue._api_keys.get(job_id)
+        executed.append((job_id, spec, api_key))
+        if spec.get("fail"):
+            raise RuntimeError("planning failed")
+
+    monkeypatch.setattr(JobQueue, "_execute", execute)
+    return executed
+
+
+def test_submitted_job_runs_and_is_marked_done(tmp_path, executed):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), workers=1)
+    job_id = queue.submit(SPEC)
+    job = wait_until_finished(queue, job_id)
+    assert job.status == DONE
+    assert job.error is None
+    assert job.started_at >= job.created_at
+    assert executed == [(job_id, SPEC, None)]
+
+
+def test_failed_job_keeps_its_error(tmp_path, executed):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), workers=1)
+    job = wait_until_finished(queue, queue.submit({**SPEC, "fail": True}))
+    assert job.status == ERROR
+    assert job.error == "planning failed"
+
+
+def test_unknown_job_is_none(tmp_path, executed):
+    assert JobQueue(str(tmp_path / "jobs.sqlite"), workers=0).get("missing") is None
+
+
+def test_queued_jobs_report_their_position(tmp_path, executed):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), workers=0)
+    job_ids = []
+    for _ in range(3):
+        job_ids.append(queue.submit(SPEC))
+        time.sleep(0.001)
+    assert [queue.get(job_id).position for job_id in job_ids] == [0, 1, 2]
+    assert queue.stats()["queued"] == 3
+
+
+def test_jobs_run_oldest_first(tmp_path, executed):
+    path = str(tmp_path / "jobs.sqlite")
+    job_ids = []
+    for number in range(3):
+        job_ids.append(JobQueue(path, workers=0).submit({**SPEC, "duration": number + 1}))
+        time.sleep(0.001)
+    queue = JobQueue(path, workers=1)
+    for job_id in job_ids:
+        wait_until_finished(queue, job_id)
+    assert [job_id for job_id, _, _ in executed] == job_ids
+
+
+def test_api_key_is_passed_to_the_job_but_never_stored(tmp_path, executed):
+    path = tmp_path / "jobs.sqlite"
+    queue = JobQueue(str(path), workers=1)
+    job_id = queue.submit(SPEC, api_key="sk-user-secret")
+    job = wait_until_finished(queue, job_id)
+    assert executed == [(job_id, {**SPEC, "own_api_key": True}, "sk-user-secret")]
+    assert job.spec["own_api_key"] is True
+    assert job_id not in queue._api_keys
+    for file in tmp_path.iterdir():
+        assert b"sk-user-secret" not in file.read_bytes()
+
+
+def test_jobs_of_different_submitters_keep_their_own_keys(tmp_path, executed):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), workers=2)
+    first = queue.submit(SPEC, api_key="sk-first")
+    second = queue.submit(SPEC, api_key="sk-second")
+    server = queue.submit(SPEC)
+    for job_id in (first, second, server):
+        wait_until_finished(queue, job_id)
+    assert {job_id: api_key for job_id, _, api_key in executed} == {first: "sk-first", second: "sk-second",
+                                                                    server: None}
+
+
+def test_running_jobs_are_requeued_on_restart(tmp_path, executed):
+    path = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(path, workers=0)
+    job_id = queue.submit(SPEC)
+    queue._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+    queue._conn.execute("INSERT INTO job_stages (job_id, stage, result) VALUES (?, ?, ?)",
+                        (job_id, "research", json.dumps({"output": "partial"})))
+
+    restarted = JobQueue(path, workers=0)
+    job = restarted.get(job_id)
+    assert job.status == QUEUED
+    assert job.started_at is None
+    assert job.stages == {}
+
+
+def test_requeued_job_whose_key_was_lost_fails_with_a_resubmit_message(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    job_id = JobQueue(path, workers=0).submit(SPEC, api_key="sk-user")
+    # A new process does not have the key the job was submitted with
+    job = wait_until_finished(JobQueue(path, workers=1), job_id)
+    assert job.status == ERROR
+    assert "submit the plan again" in job.error
+
+
+def test_stats_track_worker_utilization(tmp_path, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(JobQueue, "_execute", lambda queue, job_id, spec: release.wait(5))
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), workers=2)
+    job_id = queue.submit(SPEC)
+    deadline = time.monotonic() + 5
+    while queue.stats()["busy_workers"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = queue.stats()
+    assert stats["running"] == 1
+    assert stats["busy_workers"] == 1
+    assert stats["workers"] == 2
+    release.set()
+    wait_until_finished(queue, job_id)
+    assert 0 < queue.stats()["utilization"] <= 1
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("litellm")
+
+import TravelLLM
+from TravelDeadline import DeadlinePolicy, StageCancelledError, StageDeadline, current_deadline
+from TravelLLM import CachedLLM
+
+
+def test_an_abandoned_stage_does_not_reach_the_provider(monkeypatch):
+    monkeypatch.setattr(TravelLLM, "throttle_provider", lambda provider: pytest.fail("called the provider"))
+    llm = CachedLLM("gpt-4o-mini", api_key="test")
+    deadline = StageDeadline(DeadlinePolicy(), None)
+    deadline.miss()
+    token = current_deadline.set(deadline)
+    try:
+        with pytest.raises(StageCancelledError):
+            llm.call("Plan a day in Tokyo")
+    finally:
+        current_deadline.reset(token)
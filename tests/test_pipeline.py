@@ -0,0 +1,189 @@
+import threading
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("crewai")
+
+import TravelPipeline
+from TravelDeadline import DeadlinePolicy, current_deadline
+from TravelHandoff import ContextBudget
+from TravelPipeline import PlanningPipeline, PlanningStage, StageMemo, TripSpec
+from TravelRouting import RoutingPolicy
+
+TRIP = TripSpec("New York", "Tokyo", date(2025, 6, 1), date(2025, 6, 8), ["food"])
+
+
+class FakeAgents:
+    """Just enough of TravelAgents for the pipeline: one model for every role."""
+
+    model_name = "gpt-4o-mini"
+
+    def __init__(self):
+        self.routing = RoutingPolicy.single(self.model_name)
+        self.released = []
+
+    def model_for(self, role):
+        return self.routing.model_for(role)
+
+    def release_agents(self, discard=()):
+        self.released.append(set(discard))
+
+
+class FakeCrew:
+    """Runs a task by echoing its description, after the task's `delay` seconds."""
+
+    runs = []
+    # Stage name -> the deadline its task ran under
+    deadlines = {}
+    lock = threading.Lock()
+
+    def __init__(self, agents, tasks, **kwargs):
+        self.task = tasks[0]
+
+    def kickoff(self):
+        with self.lock:
+            FakeCrew.runs.append((self.task.stage, time.monotonic()))
+            FakeCrew.deadlines[self.task.stage] = current_deadline.get()
+        if self.task.fail:
+            raise RuntimeError(f"{self.task.stage} failed")
+        time.sleep(self.task.delay)
+        return f"{self.task.stage}: {self.task.description}"
+
+
+@pytest.fixture(autouse=True)
+def fake_crew(monkeypatch):
+    FakeCrew.runs = []
+    FakeCrew.deadlines = {}
+    monkeypatch.setattr(TravelPipeline, "Crew", FakeCrew)
+    return FakeCrew
+
+
+def stage(name, depends_on=(), delay=0.0, fail=False, **options):
+    def build_task(tasks, trip, outputs, data):
+        upstream = " | ".join(outputs[dep] for dep in depends_on)
+        return SimpleNamespace(stage=name, description=f"{trip.destination} [{upstream}]", agent=None,
+                               delay=delay, fail=fail)
+    return PlanningStage(name, f"{name}...", tuple(depends_on), build_task, f"{name} error",
+                         inputs=("destination",), **options)
+
+
+def pipeline(stages, **options):
+    options.setdefault("memo", StageMemo())
+    options.setdefault("store_artifacts", False)
+    options.setdefault("compact_handoffs", False)
+    options.setdefault("deadlines", DeadlinePolicy(slo_seconds=None))
+    return PlanningPipeline(FakeAgents(), stages=stages, **options)
+
+
+def test_memo_serves_unchanged_stages_on_replanning():
+    memo = StageMemo()
+    stages = [stage("research"), stage("itinerary", ("research",))]
+    pipeline(stages, memo=memo).run(TRIP)
+    results = pipeline(stages, memo=memo).run(TRIP)
+    assert all(result.reused for result in results.values())
+    assert len(FakeCrew.runs) == 2
+
+
+def test_memo_misses_when_a_stage_input_changes():
+    memo = StageMemo()
+    stages = [stage("research"), stage("itinerary", ("research",))]
+    pipeline(stages, memo=memo).run(TRIP)
+    results = pipeline(stages, memo=memo).run(TripSpec("New York", "Kyoto", TRIP.start_date, TRIP.end_date, []))
+    assert not any(result.reused for result in results.values())
+
+
+def test_memo_misses_when_the_handoff_settings_change():
+    pytest.importorskip("litellm")
+    memo = StageMemo()
+    stages = [stage("research"), stage("itinerary", ("research",))]
+    pipeline(stages, memo=memo, compact_handoffs=True).run(TRIP)
+    results = pipeline(stages, memo=memo,
+                       context_budget=ContextBudget(stage_budgets={"itinerary": 50})).run(TRIP)
+    assert results["research"].reused
+    assert not results["itinerary"].reused
+
+
+def test_memo_key_depends_on_the_handoff_and_chunk_settings():
+    itinerary = stage("itinerary", ("research",), run_chunked=lambda tasks, trip, outputs, days: None)
+    trip = TripSpec("New York", "Tokyo", date(2025, 6, 1), date(2025, 6, 15), [])
+
+    def key(**options):
+        plan = pipeline([stage("research"), itinerary], **options)
+        return StageMemo.make_key(itinerary, trip, {"research": "report"}, options=plan.memo_options(itinerary, trip))
+
+    assert key() == key(chunk_days=30)
+    assert key(chunk_days=7) != key()
+    assert key(chunk_days=7) != key(chunk_days=5)
+    assert key(context_budget=ContextBudget(stage_budgets={"itinerary": 100})) != key()
+    assert (key(context_budget=ContextBudget(stage_budgets={"itinerary": 100}))
+            != key(context_budget=ContextBudget(stage_budgets={"itinerary": 200})))
+
+
+def test_failed_and_deadline_hit_results_are_not_memoized():
+    memo = StageMemo()
+    stages = [stage("research", fail=True)]
+    pipeline(stages, memo=memo).run(TRIP)
+    results = pipeline(stages, memo=memo).run(TRIP)
+    assert results["research"].error == "research failed"
+    assert not results["research"].reused
+    assert len(FakeCrew.runs) == 2
+
+
+def test_independent_stages_run_concurrently():
+    stages = [stage("research", delay=0.2), stage("recommendations", delay=0.2)]
+    started = time.monotonic()
+    results = pipeline(stages, max_workers=2).run(TRIP)
+    assert time.monotonic() - started < 0.35
+    assert set(results) == {"research", "recommendations"}
+
+
+def test_stages_wait_for_their_dependencies_and_read_their_outputs():
+    stages = [stage("itinerary", ("research",)), stage("research", delay=0.1),
+              stage("budget", ("itinerary", "research"))]
+    completed = []
+    results = pipeline(stages).run(TRIP, on_stage_complete=lambda stage, result, done, total:
+                                   completed.append((stage.name, done, total)))
+    assert completed == [("research", 1, 3), ("itinerary", 2, 3), ("budget", 3, 3)]
+    assert [name for name, _ in FakeCrew.runs] == ["research", "itinerary", "budget"]
+    assert results["itinerary"].output == "itinerary: Tokyo [research: Tokyo []]"
+    assert results["budget"].output.endswith("| research: Tokyo []]")
+
+
+def test_a_failed_stage_does_not_stop_the_plan():
+    stages = [stage("research", fail=True), stage("recommendations"), stage("itinerary", ("research",))]
+    results = pipeline(stages).run(TRIP)
+    assert results["research"].error == "research failed"
+    assert results["research"].output == "research error"
+    # Dependants still run, from the failed stage's error message
+    assert results["itinerary"].output == "itinerary: Tokyo [research error]"
+    assert results["recommendations"].error is None
+
+
+def test_a_stage_past_its_deadline_is_abandoned_with_its_dependants():
+    stages = [stage("research"), stage("slow", delay=1.0), stage("after", ("slow",)),
+              stage("budget", ("research",), finalize=lambda trip, data, output: (f"totals; {output}", None))]
+    policy = DeadlinePolicy(slo_seconds=0.4, shares={"research": 1, "slow": 1, "after": 1, "budget": 1})
+    started = time.monotonic()
+    results = pipeline(stages, deadlines=policy).run(TRIP)
+    assert time.monotonic() - started < 0.8
+    assert results["slow"].metrics["degraded"]
+    assert results["slow"].metrics["deadline_hit"] == "missed"
+    assert "could not be completed within its time limit" in results["slow"].output
+    assert results["after"].metrics["deadline_hit"] == "skipped"
+    assert "skipped because slow could not be completed" in results["after"].output
+    assert "after" not in FakeCrew.deadlines
+    # The rest of the plan is unaffected, and the abandoned stage is told to stop
+    assert results["budget"].output == "totals; budget: Tokyo [research: Tokyo []]"
+    assert FakeCrew.deadlines["slow"].missed
+    assert not FakeCrew.deadlines["research"].missed
+
+
+def test_stages_within_their_deadline_finish_normally():
+    stages = [stage("research", delay=0.05), stage("itinerary", ("research",))]
+    results = pipeline(stages, deadlines=DeadlinePolicy(slo_seconds=5)).run(TRIP)
+    assert not any(result.metrics.get("degraded") for result in results.values())
+    assert results["itinerary"].metrics["deadline_hit"] is None
+    assert 0 < results["research"].metrics["deadline_seconds"] < results["itinerary"].metrics["deadline_seconds"]
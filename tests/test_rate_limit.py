@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from TravelRateLimit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_refills_at_its_rate_without_exceeding_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.try_acquire(2)
+    clock.now += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now += 60
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire()
+
+
+def test_default_capacity_is_one_second_of_tokens():
+    assert TokenBucket(rate=5).capacity == 5
+    assert TokenBucket(rate=0.5).capacity == 1
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_acquire_gives_up_when_the_wait_exceeds_the_timeout(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.acquire()
+    assert not bucket.acquire(timeout=0.5)
+
+
+def test_acquire_waits_for_a_refill():
+    bucket = TokenBucket(rate=20, capacity=1)
+    assert bucket.try_acquire()
+    started = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - started >= 0.04
+
+
+def test_concurrent_acquirers_never_take_more_than_the_bucket_holds(clock):
+    bucket = TokenBucket(rate=1, capacity=10)
+    taken = []
+    threads = [threading.Thread(target=lambda: taken.append(bucket.try_acquire())) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert taken.count(True) == 10
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from TravelRouting import BudgetTracker, RoutingPolicy, StageBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def test_single_policy_uses_one_model_without_budgets():
+    policy = RoutingPolicy.single("gpt-4o")
+
+    assert policy.model_for("planning") == policy.model_for("research") == "gpt-4o"
+    assert policy.budget_for("itinerary") is None
+
+
+def test_tiered_policy_keeps_the_planner_on_the_selected_model():
+    policy = RoutingPolicy.tiered("gpt-4o")
+
+    assert policy.model_for("planning") == "gpt-4o"
+    assert {policy.model_for(role) for role in ("research", "local_expert", "budget", "comparison")} == {"gpt-4o-mini"}
+    assert policy.budget_for("itinerary").max_tokens == 24000
+
+
+def test_token_budget_downgrades_before_the_call_that_would_cross_it(clock):
+    tracker = BudgetTracker(RoutingPolicy.single("gpt-4o"), StageBudget(max_tokens=1000), "gpt-4o")
+
+    assert tracker.route("gpt-4o", lambda: 400) == "gpt-4o"
+    tracker.record("gpt-4o", 600)
+    # 600 used + 200 prompt reaches 75% of the budget
+    assert tracker.route("gpt-4o", lambda: 200) == "gpt-4o-mini"
+    tracker.record("gpt-4o-mini", 300)
+    # Once downgraded the stage stays on the faster model
+    assert tracker.route("gpt-4o", lambda: 0) == "gpt-4o-mini"
+    assert tracker.metrics() == {
+        "model": "gpt-4o", "effective_model": "gpt-4o-mini", "downgraded": True,
+        "llm_calls_by_model": {"gpt-4o": 1, "gpt-4o-mini": 1}, "budget_tokens_used": 900, "budget_tokens": 1000,
+    }
+
+
+def test_time_budget_downgrades_late_calls(clock):
+    tracker = BudgetTracker(RoutingPolicy.single("gpt-4o"), StageBudget(max_seconds=100), "gpt-4o")
+
+    clock.now += 70
+    assert tracker.route("gpt-4o", lambda: pytest.fail("tokens are not counted without a token budget")) == "gpt-4o"
+    clock.now += 5
+    assert tracker.route("gpt-4o", lambda: 0) == "gpt-4o-mini"
+    assert tracker.metrics()["budget_seconds"] == 100
+
+
+def test_unbudgeted_stages_and_models_without_a_fallback_are_not_downgraded(clock):
+    policy = RoutingPolicy.single("gpt-4o")
+    unbudgeted = BudgetTracker(policy, None, "gpt-4o")
+    fastest = BudgetTracker(policy, StageBudget(max_tokens=10), "gpt-4o-mini")
+
+    assert unbudgeted.route("gpt-4o", lambda: 10 ** 6) == "gpt-4o"
+    assert not unbudgeted.counts_tokens
+    assert fastest.route("gpt-4o-mini", lambda: 10 ** 6) == "gpt-4o-mini"
+    assert not fastest.downgraded
@@ -0,0 +1,175 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("duckduckgo_search")
+
+from TravelSearch import AdaptiveConcurrencyLimiter, CircuitBreaker, SearchClient, SearchUnavailableError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def test_limiter_grows_additively_on_success():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+    for _ in range(2):
+        assert limiter.acquire()
+        limiter.release()
+    # 2 + 1/2 + 1/2.5 = 2.9
+    assert limiter.limit == 2
+    for _ in range(3):
+        assert limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 3
+
+
+def test_limiter_halves_on_throttling_but_not_below_its_minimum():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=3)
+    assert limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    assert limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 3
+
+
+def test_limiter_stays_under_its_maximum():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    for _ in range(20):
+        assert limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 2
+
+
+def test_limiter_blocks_past_its_limit_until_a_slot_is_released():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    assert limiter.acquire()
+    assert not limiter.acquire(timeout=0.01)
+    threading.Timer(0.05, limiter.release).start()
+    assert limiter.acquire(timeout=1)
+    assert limiter.in_flight == 1
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_lets_one_trial_call_through_after_the_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_call_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 9
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_breaker_ignored_outcome_ends_a_trial_call_without_closing_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_ignored()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+class FailingBackend:
+    """Search session stand-in whose searches raise the given error."""
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, max_results):
+        self.calls += 1
+        raise self.error
+
+
+def test_bad_queries_do_not_open_the_circuit():
+    client = SearchClient(rate=1000, breaker=CircuitBreaker(failure_threshold=2), sleep=lambda seconds: None)
+    backend = FailingBackend(ValueError("malformed query"))
+    for _ in range(5):
+        with pytest.raises(SearchUnavailableError):
+            client.search("bad query", 5, backend)
+    assert backend.calls == 5
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.stats()["retries"] == 0
+
+
+def test_timeouts_are_retried_and_open_the_circuit():
+    client = SearchClient(rate=1000, max_retries=2, breaker=CircuitBreaker(failure_threshold=3),
+                          sleep=lambda seconds: None)
+    backend = FailingBackend(TimeoutError("timed out"))
+    with pytest.raises(SearchUnavailableError):
+        client.search("museums in tokyo", 5, backend)
+    assert backend.calls == 3
+    assert client.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(SearchUnavailableError):
+        client.search("museums in tokyo", 5, backend)
+    assert backend.calls == 3
+    stats = client.stats()
+    assert (stats["calls"], stats["retries"], stats["rejected"]) == (3, 2, 1)
+
+
+def test_counters_are_exact_under_concurrent_searches():
+    class Backend(FailingBackend):
+        def text(self, query, max_results):
+            return []
+
+    client = SearchClient(rate=1000, limiter=AdaptiveConcurrencyLimiter(initial_limit=16, max_limit=16))
+    backend = Backend(None)
+    threads = [threading.Thread(target=lambda n=n: [client.search(f"query {n} {i}", 5, backend) for i in range(50)])
+               for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.stats()["calls"] == 400
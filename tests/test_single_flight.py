@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("duckduckgo_search")
+
+from TravelSearch import SearchClient, SingleFlight
+
+
+def test_concurrent_calls_with_the_same_key_run_once():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return "result"
+
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(flights.do("key", fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(outcomes, key=lambda outcome: outcome[1]) == [("result", False)] + [("result", True)] * 4
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flights = SingleFlight()
+    release = threading.Event()
+    thread = threading.Thread(target=flights.do, args=("slow", lambda: release.wait(1)))
+    thread.start()
+    assert flights.do("fast", lambda: "result") == ("result", False)
+    release.set()
+    thread.join()
+
+
+def test_error_is_raised_in_every_waiting_caller():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(1)
+        raise RuntimeError("backend down")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("key", fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ["backend down", "backend down"]
+
+
+def test_key_is_released_once_the_call_finishes():
+    flights = SingleFlight()
+    assert flights.do("key", lambda: 1) == (1, False)
+    assert flights.do("key", lambda: 2) == (2, False)
+
+
+class SlowBackend:
+    """Search session stand-in that holds every search open until released."""
+
+    def __init__(self):
+        self.queries = []
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, max_results):
+        with self._lock:
+            self.queries.append(query)
+        self.release.wait(1)
+        return [{"title": query, "href": f"https://example.com/{len(self.queries)}", "body": ""}]
+
+
+def search_concurrently(client, backend, queries):
+    outcomes = {}
+
+    def search(query):
+        outcomes[query] = client.search_shared(query, 5, backend)
+
+    threads = [threading.Thread(target=search, args=(query,)) for query in queries]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_search_client_coalesces_queries_differing_only_in_case_and_spacing():
+    client, backend = SearchClient(rate=100), SlowBackend()
+    outcomes = search_concurrently(client, backend, ["Museums in Tokyo", "museums  in tokyo "])
+    assert len(backend.queries) == 1
+    assert sorted(shared for _, shared in outcomes.values()) == [False, True]
+    assert client.stats()["coalesced"] == 1
+
+
+def test_search_client_does_not_coalesce_reversed_routes():
+    client, backend = SearchClient(rate=100), SlowBackend()
+    outcomes = search_concurrently(client, backend, ["flights paris to tokyo", "flights tokyo to paris"])
+    assert sorted(backend.queries) == ["flights paris to tokyo", "flights tokyo to paris"]
+    assert not any(shared for _, shared in outcomes.values())
+    assert client.stats()["coalesced"] == 0
+
+
+def test_search_client_does_not_coalesce_different_result_counts():
+    client, backend = SearchClient(rate=100), SlowBackend()
+    outcomes = {}
+
+    def search(max_results):
+        outcomes[max_results] = client.search_shared("museums in tokyo", max_results, backend)
+
+    threads = [threading.Thread(target=search, args=(count,)) for count in (3, 10)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    assert len(backend.queries) == 2
+    assert not any(shared for _, shared in outcomes.values())
@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("duckduckgo_search")
+
+import TravelTools
+from TravelDeadline import DeadlinePolicy, StageDeadline, current_deadline
+from TravelTools import DuckDuckGoSearchTool
+
+RESULTS = [{"title": "Tokyo food guide", "href": "https://example.com/food", "body": "Ramen and sushi"}]
+
+
+class FakeCache:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def get(self, query, max_results, allow_expired=False):
+        return self.entries.get(query)
+
+    def set(self, query, max_results, results):
+        self.entries[query] = results
+
+
+class FakeClient:
+    def __init__(self):
+        self.queries = []
+
+    def search_shared(self, query, max_results, backend):
+        self.queries.append(query)
+        return RESULTS, False
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(TravelTools, "get_search_cache", lambda: FakeCache({"tokyo food": RESULTS}))
+    monkeypatch.setattr(TravelTools, "get_search_client", lambda: client)
+    return client
+
+
+def search(queries, deadline):
+    tool = DuckDuckGoSearchTool(use_index=False)
+    token = current_deadline.set(deadline)
+    try:
+        return [tool._run(query) for query in queries]
+    finally:
+        current_deadline.reset(token)
+
+
+def test_cached_searches_do_not_use_the_stage_allowance(client):
+    deadline = StageDeadline(DeadlinePolicy(max_tool_calls=1), None)
+
+    answers = search(["tokyo food", "tokyo food", "tokyo temples", "tokyo food", "kyoto temples"], deadline)
+
+    assert client.queries == ["tokyo temples"]
+    assert answers[:4] == [TravelTools.DuckDuckGoSearchTool().process_search_results(RESULTS)] * 4
+    assert answers[4] == TravelTools.NO_MORE_SEARCHES
+    assert deadline.metrics()["tool_calls_refused"] == 1
+
+
+def test_an_abandoned_stage_cannot_search(client):
+    deadline = StageDeadline(DeadlinePolicy(), None)
+    deadline.miss()
+
+    assert search(["tokyo food", "kyoto temples"], deadline) == [TravelTools.NO_MORE_SEARCHES] * 2
+    assert client.queries == []